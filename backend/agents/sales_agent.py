@@ -1,7 +1,6 @@
 # sales_agent.py
-from services.mistral_api import query_mistral
-from services.rag_service import RAGService
-import json
+from services.mistral_api import query_mistral_within, query_mistral_within_async, stream_mistral_within
+from services.components import get_rag_service
 import re
 
 
@@ -13,19 +12,24 @@ class SalesAgent:
     - Passes control to KYC agent for customer identity verification.
     """
 
-    def __init__(self, data_path="./data/customers.json"):
-        print("[DEBUG] Initializing SalesAgent...")
-        self.rag = RAGService(data_path)
-
-        with open(data_path, "r") as f:
-            self.customers = json.load(f)
+    def __init__(self, rag=None):
+        # The RAG model/index is shared process-wide; a SalesAgent only
+        # holds its own conversation state.
+        self.rag = rag or get_rag_service()
 
         # Track loan details and purpose
         self.stage = "start"  # start → ask_amount → ask_tenure → ask_purpose → confirm
         # self.context["name"] will be set by MasterAgent if user is logged in.
         self.context = {"amount": None, "tenure": None, "purpose": None, "name": None} 
 
-        print("[DEBUG] SalesAgent loaded with", len(self.customers), "customers.")
+    # -----------------------------------------------------
+    def to_state(self) -> dict:
+        """Serializable conversation state (see MasterAgent.snapshot)."""
+        return {"stage": self.stage, "context": dict(self.context)}
+
+    def load_state(self, state: dict):
+        self.stage = state["stage"]
+        self.context = dict(state["context"])
 
     # -----------------------------------------------------
     def extract_loan_details(self, user_message: str):
@@ -79,9 +83,55 @@ class SalesAgent:
         
         return round(base_rate, 2)
 
+    def confirmation_template(self) -> str:
+        """The KYC hand-off message, rendered locally from the sales context."""
+        name = self.context.get("name") or "Customer"
+        purpose = self.context["purpose"]
+        return (
+            f"Dear {name}, Thank you for reaching out to Tata Capital for your {purpose} loan needs. "
+            f"We understand you're seeking a loan of ₹{self.context['amount']:,} for a term of {self.context['tenure']} years. "
+            "It's important to note that our interest rates typically range from 8.5% to 13%, which may vary based on your profile and credit score. "
+            "To move forward, we kindly ask you to proceed immediately with the identity verification (KYC) process, "
+            "as this will help us evaluate your profile and finalize your application. "
+            f"Looking forward to assisting you with your {purpose} loan needs. "
+            "Best regards, FinWise - Tata Capital AI Sales Assistant"
+        )
+
     # -----------------------------------------------------
+    # LLM replies use the LLM text if it arrives within LLM_BUDGET_MS,
+    # otherwise the locally rendered template.
     def handle_sales(self, user_message: str):
         """Main handler for the loan sales stage."""
+        response, next_stage, prompt = self._advance(user_message)
+        if prompt is not None:
+            response = query_mistral_within(prompt, fallback=response)
+        return response, next_stage
+
+    async def handle_sales_async(self, user_message: str):
+        """`handle_sales` with the LLM call awaited instead of blocking."""
+        response, next_stage, prompt = self._advance(user_message)
+        if prompt is not None:
+            response = await query_mistral_within_async(prompt, fallback=response)
+        return response, next_stage
+
+    def stream_sales(self, user_message: str):
+        """
+        Streaming `handle_sales`: returns (response, next_stage, chunks).
+        For LLM replies `response` is None and `chunks` is an async
+        iterator of tokens; fixed replies come back whole with chunks=None.
+        """
+        response, next_stage, prompt = self._advance(user_message)
+        if prompt is not None:
+            return None, next_stage, stream_mistral_within(prompt, fallback=response)
+        return response, next_stage, None
+
+    # -----------------------------------------------------
+    def _advance(self, user_message: str):
+        """
+        Advance the sales state machine by one message.
+        Returns (response, next_stage, prompt); when `prompt` is set the
+        reply should come from the LLM and `response` is its local fallback.
+        """
         msg = user_message.strip()
         print(f"\n[DEBUG] SalesAgent stage='{self.stage}' | message='{msg}'")
 
@@ -101,7 +151,7 @@ class SalesAgent:
             return (
                 "Great! Let's begin your loan application.\n"
                 "Please tell me how much loan amount you are looking for.",
-                None
+                None, None
             )
 
         # -------------------------------------------------
@@ -110,7 +160,7 @@ class SalesAgent:
         elif self.stage == "ask_amount":
             if not amount:
                 print("[DEBUG] No valid amount found.")
-                return f"{prefix}Please enter your desired loan amount in ₹.", None
+                return f"{prefix}Please enter your desired loan amount in ₹.", None, None
 
             self.context["amount"] = amount
             self.stage = "ask_tenure"
@@ -119,7 +169,7 @@ class SalesAgent:
             return (
                 f"Got it! ₹{amount:,} noted.\n"
                 "How many years would you like the repayment tenure to be?",
-                None
+                None, None
             )
 
         # -------------------------------------------------
@@ -130,7 +180,7 @@ class SalesAgent:
                 print("[DEBUG] No valid tenure found.")
                 return (
                     f"{prefix}Please mention the repayment period (e.g., 3 years, 5 years).",
-                    None
+                    None, None
                 )
 
             self.context["tenure"] = tenure
@@ -141,7 +191,7 @@ class SalesAgent:
                 f"Great! ₹{self.context['amount']:,} for {tenure} years noted.\n"
                 "Now, may I ask — what is the primary purpose of this loan? "
                 "(e.g., education, home, car, business, wedding, medical, debt consolidation, personal)",
-                None
+                None, None
             )
 
         # -------------------------------------------------
@@ -152,7 +202,7 @@ class SalesAgent:
                 print("[DEBUG] No purpose provided.")
                 return (
                     f"{prefix}Could you please tell me the purpose of your loan?",
-                    None
+                    None, None
                 )
 
             self.context["purpose"] = msg.strip()
@@ -160,6 +210,10 @@ class SalesAgent:
 
             print(f"[DEBUG] Transition to 'confirm' | purpose={self.context['purpose']}")
 
+            # Local rendering of the reply the prompt asks for: served as-is
+            # when the LLM misses its latency budget or fails.
+            template = self.confirmation_template()
+
             # --- BEGIN UPDATED PROMPT ---
             prompt = f"""
             You are a professional Tata Capital AI Sales Assistant, named FinWise, acting as a bank officer.
@@ -172,13 +226,13 @@ class SalesAgent:
 
             Generate a response that follows this **exact** structure and formatting (use line breaks and capitalization as shown), substituting the values for the variables:
             
-            Dear {self.context['name']}, Thank you for reaching out to Tata Capital for your {self.context['purpose']} loan needs. We understand you're seeking a loan of ₹{self.context['amount']:,} for a term of {self.context['tenure']} years. It's important to note that our interest rates typically range from 8.5% to 13%, which may vary based on your profile and credit score. To move forward, we kindly ask you to proceed immediately with the identity verification (KYC) process, as this will help us evaluate your profile and finalize your application. Looking forward to assisting you with your {self.context['purpose']} loan needs. Best regards, FinWise - Tata Capital AI Sales Assistant
+            {template}
             
             Ensure the entire response is a single, complete block of text that matches the required output line-by-line, with no extra text or explanations.
             """
             # --- END UPDATED PROMPT ---
 
-            return query_mistral(prompt), "kyc"
+            return template, "kyc", prompt
 
         # -------------------------------------------------
         # STEP 5 — Final confirmation (fallback)
@@ -189,9 +243,9 @@ class SalesAgent:
                 f"Perfect! Loan amount ₹{self.context['amount']:,} "
                 f"for {self.context['tenure']} years (Purpose: {self.context['purpose']}) is confirmed.\n"
                 "Let's proceed with KYC verification.",
-                "kyc"
+                "kyc", None
             )
 
         # -------------------------------------------------
         print("[DEBUG] Fallback reached")
-        return "I didn't quite understand — could you rephrase?", None
\ No newline at end of file
+        return "I didn't quite understand — could you rephrase?", None, None
\ No newline at end of file
@@ -1,8 +1,8 @@
 from utils.pdf_generator import generate_sanction_pdf, calculate_emi
 from services.crm_api import get_customer_kyc
-from services.credit_api import get_credit_score
+from services.credit_api import get_credit_score, get_credit_score_by_id
+from services.loan_outbox import get_loan_outbox
 from pathlib import Path
-import requests
 
 
 class SanctionAgent:
@@ -42,7 +42,6 @@ class SanctionAgent:
         # 2️⃣ Fetch CRM + Credit data
         # -------------------------------
         customer = get_customer_kyc(name)
-        credit_score = get_credit_score(name)
 
         if not customer:
             return (f"❌ Customer '{name}' not found in CRM.", None)
@@ -51,6 +50,10 @@ class SanctionAgent:
         if isinstance(customer, list):
             customer = customer[0]
 
+        credit_score = get_credit_score_by_id(customer["id"]) if customer.get("id") is not None else None
+        if credit_score is None:
+            credit_score = get_credit_score(name)
+
         # -------------------------------
         # 3️⃣ Loan parameters
         # -------------------------------
@@ -120,18 +123,9 @@ class SanctionAgent:
 
     # --------------------------------------------------
     def save_loan_to_offers(self, user_id: int, loan: dict):
-        """Persist sanctioned loan via offer_mart_server."""
+        """Record the sanctioned loan in the outbox; a background worker delivers it to Offer Mart."""
         try:
-            response = requests.post(
-                f"http://localhost:8002/user/{user_id}/loans",
-                json=loan
-            )
-            if response.status_code == 200:
-                print(f"[INFO] Loan saved for user {user_id}")
-            else:
-                print(
-                    f"[WARN] Failed to save loan for user {user_id}: "
-                    f"{response.status_code} | {response.text}"
-                )
+            outbox_id = get_loan_outbox().enqueue(user_id, loan)
+            print(f"[INFO] Loan for user {user_id} queued for Offer Mart (outbox #{outbox_id})")
         except Exception as e:
-            print(f"[ERROR] Error saving loan: {e}")
+            print(f"[ERROR] Error queuing loan: {e}")
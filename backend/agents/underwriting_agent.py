@@ -1,4 +1,4 @@
-from services.credit_api import get_credit_score
+from services.credit_api import get_credit_score, get_credit_score_by_id
 from services.crm_api import get_customer_kyc
 from utils.pdf_generator import calculate_emi
 
@@ -27,8 +27,10 @@ class UnderwritingAgent:
         salary = customer.get("salary", 0)
         pre_limit = customer.get("preapproved_limit", 0)
 
-        # 1. Get credit score
-        score = customer.get("credit_score") or get_credit_score(name)
+        # 1. Get credit score (cached / bureau, by CRM id when we have one)
+        score = get_credit_score_by_id(customer["id"]) if customer.get("id") is not None else None
+        if score is None:
+            score = customer.get("credit_score") or get_credit_score(name)
 
         # --- Reject low score ---
         if score < 700:
@@ -26,6 +26,15 @@ class VerificationAgent:
         self.matches = []
         self.step = "awaiting_name"
 
+    def to_state(self) -> dict:
+        """Serializable KYC state (see MasterAgent.snapshot)."""
+        return {"step": self.step, "temp_data": dict(self.temp_data), "matches": list(self.matches)}
+
+    def load_state(self, state: dict):
+        self.step = state["step"]
+        self.temp_data = dict(state["temp_data"])
+        self.matches = list(state["matches"])
+
     # ... (collect_step, start_kyc, start_kyc_for_profile are mostly untouched) ...
 
     def collect_step(self, msg: str):
@@ -1,14 +1,22 @@
-from fastapi import FastAPI, UploadFile, File, Path as FPath
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Header, Path as FPath
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 
 from routers.crm import router as crm_router
 from routers.offer_mart import router as offer_mart_router
 from services.crm_api import get_customer_by_id
-from agents.master_agent import MasterAgent
+from services.loan_outbox import get_loan_outbox
+from services.components import get_rag_service, persist_rag_service
+from services.session_manager import is_valid_session_id, session_manager_from_env
+from services.state_store import StaleRevisionError
+from services.executor import run_blocking, shutdown_executor
+from services.mistral_api import budget_stats, close_mistral_client, get_mistral_client, get_prompt_cache
+from services.stage_metrics import stage_metrics
 
 from pathlib import Path
+import json
+import re
 import shutil
 from pydantic import BaseModel
 from typing import Optional, Dict
@@ -32,6 +40,7 @@ app.add_middleware(
     allow_credentials=False,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # ============================================================
@@ -42,10 +51,31 @@ app.include_router(crm_router)
 app.include_router(offer_mart_router)
 
 # ============================================================
-# 🧠 SINGLE GLOBAL AGENT (NO SESSIONS)
+# 📮 BACKGROUND WORKERS + SHARED COMPONENTS
 # ============================================================
 
-agent = MasterAgent()
+@app.on_event("startup")
+def start_background_workers():
+    get_loan_outbox().start()
+    # load the shared embedding model + FAISS index before the first session
+    get_rag_service()
+
+
+@app.on_event("shutdown")
+async def stop_background_workers():
+    get_loan_outbox().stop()
+    # off the event loop; saves the index as-is (HNSW delta included), no rebuild
+    await run_blocking(persist_rag_service)
+    close_mistral_client()
+    shutdown_executor()
+
+# ============================================================
+# 🧠 PER-SESSION AGENTS
+# ============================================================
+# Each conversation gets its own MasterAgent, keyed by the session id the
+# client sends back (X-Session-Id header or `session_id` field).
+
+sessions = session_manager_from_env()
 
 # ============================================================
 # 💾 STORAGE
@@ -71,16 +101,43 @@ app.mount("/sanctions", StaticFiles(directory=SANCTION_DIR), name="sanctions")
 class ChatRequest(BaseModel):
     message: str
     customer: Optional[Dict] = None
+    session_id: Optional[str] = None
+
+
+async def _get_session(session_id: Optional[str]):
+    """Look up / create a session; client-supplied ids must be server-issued uuid4s."""
+    if session_id and not is_valid_session_id(session_id):
+        raise HTTPException(status_code=400, detail="Invalid session id")
+    # session lookup/persistence may hit the state store → agent pool
+    return await run_blocking(sessions.get_session, session_id)
+
+
+async def _touch(session):
+    """Persist the turn; a concurrent turn on another worker wins → 409, client resends."""
+    try:
+        await run_blocking(sessions.touch, session)
+    except StaleRevisionError as e:
+        print(f"[WARN] {e}")
+        raise HTTPException(status_code=409, detail="This conversation was updated elsewhere, please resend.")
 
 
 @app.post("/chat")
-async def handle_chat(payload: ChatRequest):
-    response = agent.handle_message(
-        payload.message,
-        payload.customer
-    )
+async def handle_chat(payload: ChatRequest, x_session_id: Optional[str] = Header(None)):
+    session = await _get_session(payload.session_id or x_session_id)
+    async with session.lock:
+        response = await session.agent.handle_message_async(
+            payload.message,
+            payload.customer
+        )
+        # snapshot + revision bump belong to this turn: keep them under the lock
+        await _touch(session)
+
+    return _chat_payload(session, response)
 
+
+def _chat_payload(session, response: dict) -> dict:
     return {
+        "session_id": session.id,
         "message": response.get("response"),
         "stage": response.get("stage"),
         "awaitingSalarySlip": response.get("awaitingSalarySlip", False),
@@ -89,6 +146,47 @@ async def handle_chat(payload: ChatRequest):
         "file": response.get("file"),
     }
 
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.post("/chat/stream")
+async def handle_chat_stream(payload: ChatRequest, x_session_id: Optional[str] = Header(None)):
+    """
+    Server-sent-event variant of /chat: `delta` events carry LLM tokens as
+    they arrive, a final `done` event carries the same body /chat returns.
+    Non-LLM stages send just the `done` event. The stream always ends with
+    `done` or, if the turn failed, an `error` event.
+    """
+    session = await _get_session(payload.session_id or x_session_id)
+
+    async def events():
+        done = None
+        try:
+            async with session.lock:
+                async for event in session.agent.handle_message_stream(payload.message, payload.customer):
+                    if event["event"] == "delta":
+                        yield _sse("delta", {"text": event["text"]})
+                    else:
+                        done = _chat_payload(session, event["response"])
+                await _touch(session)
+        except Exception as e:
+            print(f"[ERROR] /chat/stream failed for session {session.id}: {e}")
+            yield _sse("error", {"session_id": session.id, "message": "Something went wrong, please try again."})
+            return
+        if done is None:
+            print(f"[ERROR] /chat/stream: no final response for session {session.id}")
+            yield _sse("error", {"session_id": session.id, "message": "Something went wrong, please try again."})
+            return
+        yield _sse("done", done)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", "X-Session-Id": session.id},
+    )
+
 # ============================================================
 # 👤 CUSTOMER PROFILE
 # ============================================================
@@ -107,31 +205,72 @@ async def get_customer_profile(customer_id: int):
 # 📤 FILE UPLOAD HELPERS
 # ============================================================
 
-def save_and_process_file(file: UploadFile):
-    file_path = UPLOAD_DIR / file.filename
-
+def _write_upload(file: UploadFile, file_path: Path):
     with open(file_path, "wb") as buffer:
         shutil.copyfileobj(file.file, buffer)
 
-    return agent.handle_file_upload(str(file_path))
+
+def _safe_filename(filename: Optional[str]) -> str:
+    name = re.sub(r"[^A-Za-z0-9._-]", "_", Path(filename or "").name).lstrip(".")
+    return name[-100:] or "upload"
+
+
+async def save_and_process_file(file: UploadFile, session_id: Optional[str]):
+    session = await _get_session(session_id)
+    # keep concurrent uploads from different sessions apart on disk; the id
+    # is a validated uuid and the client's file name is reduced to a safe suffix
+    file_path = UPLOAD_DIR / f"{session.id}_{_safe_filename(file.filename)}"
+    await run_blocking(_write_upload, file, file_path)
+
+    async with session.lock:
+        # OCR + verification are CPU-bound → agent pool
+        response = await run_blocking(session.agent.handle_file_upload, str(file_path))
+        await _touch(session)
+
+    return {"session_id": session.id, **response}
 
 # ============================================================
 # 📎 FILE UPLOAD ENDPOINTS
 # ============================================================
 
 @app.post("/upload-pan")
-async def upload_pan(file: UploadFile = File(...)):
-    return save_and_process_file(file)
+async def upload_pan(file: UploadFile = File(...), session_id: Optional[str] = Form(None), x_session_id: Optional[str] = Header(None)):
+    return await save_and_process_file(file, session_id or x_session_id)
 
 
 @app.post("/upload-aadhaar")
-async def upload_aadhaar(file: UploadFile = File(...)):
-    return save_and_process_file(file)
+async def upload_aadhaar(file: UploadFile = File(...), session_id: Optional[str] = Form(None), x_session_id: Optional[str] = Header(None)):
+    return await save_and_process_file(file, session_id or x_session_id)
 
 
 @app.post("/upload-salary-slip")
-async def upload_salary_slip(file: UploadFile = File(...)):
-    return save_and_process_file(file)
+async def upload_salary_slip(file: UploadFile = File(...), session_id: Optional[str] = Form(None), x_session_id: Optional[str] = Header(None)):
+    return await save_and_process_file(file, session_id or x_session_id)
+
+
+@app.get("/sessions/stats")
+async def session_stats():
+    return sessions.stats()
+
+
+@app.get("/chat/stage-stats")
+async def chat_stage_stats():
+    return stage_metrics.stats()
+
+
+@app.get("/chat/llm-stats")
+async def chat_llm_stats():
+    cache = get_prompt_cache()
+    return {
+        **get_mistral_client().stats(),
+        "prompt_cache": cache.stats() if cache else None,
+        "latency_budget": budget_stats(),
+    }
+
+
+@app.get("/chat/rag-stats")
+async def chat_rag_stats():
+    return get_rag_service().stats()
 
 # ============================================================
 # 📥 DOWNLOAD SANCTION LETTER
@@ -1,9 +1,25 @@
-from fastapi import APIRouter, HTTPException
+import itertools
+import json
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
-from services.crm_api import get_all_customers, sign_up, authenticate
+from services.credit_api import credit_cache_stats, bureau_stats
+from services.crm_api import iter_customers, get_customer_by_name, get_credit_scores, sign_up, authenticate
 
 router = APIRouter(prefix="/crm", tags=["CRM"])
 
+# Returned when no `fields=` projection is given.
+DEFAULT_FIELDS = (
+    "id", "name", "age", "city", "phone", "email", "salary",
+    "preapproved_limit", "existing_loans", "credit_score",
+)
+# KYC identifiers are only returned when asked for explicitly.
+KYC_FIELDS = ("pan_number", "aadhaar_number")
+# Never leaves the service.
+HIDDEN_FIELDS = {"password_hash"}
+
 class SignUpIn(BaseModel):
     name: str
     age: int
@@ -21,16 +37,78 @@ class LoginIn(BaseModel):
     password: str
 
 
+class CreditScoresIn(BaseModel):
+    ids: list[int]
+
+
+def _parse_fields(fields: Optional[str]) -> tuple:
+    if not fields:
+        return DEFAULT_FIELDS
+    allowed = set(DEFAULT_FIELDS) | set(KYC_FIELDS)
+    requested = tuple(f.strip() for f in fields.split(",") if f.strip())
+    unknown = [f for f in requested if f not in allowed or f in HIDDEN_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return requested
+
+
+def _project(customer: dict, fields: tuple) -> dict:
+    return {f: customer.get(f) for f in fields}
+
+
 @router.get("/customers")
-def get_all_customers_endpoint():
-    return get_all_customers()
+def get_all_customers_endpoint(
+    cursor: int = Query(0, ge=0, description="Return customers with id greater than this"),
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Page size (default: everything after `cursor`)"),
+    fields: Optional[str] = Query(None, description="Comma-separated projection, e.g. id,name,city"),
+    city: Optional[str] = None,
+    min_salary: Optional[int] = None,
+    max_salary: Optional[int] = None,
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+):
+    """
+    Projected customer listing — a plain JSON list, as before.
+
+    - without `limit`: every customer after `cursor`, streamed record by record
+    - with `limit`: one page; if more follow, the `X-Next-Cursor` response
+      header holds the value to pass as `cursor` for the next page
+    - `format=ndjson` → one customer per line instead of a JSON array
+    """
+    projection = _parse_fields(fields)
+    rows = iter_customers(cursor, city, min_salary, max_salary, batch_size=min(limit or 500, 500))
+    media_type = "application/x-ndjson" if format == "ndjson" else "application/json"
+
+    if limit:
+        # one extra row tells us whether another page exists; a page is
+        # small, so it is built up front and the cursor can go in a header
+        page = list(itertools.islice(rows, limit + 1))
+        headers = {}
+        if len(page) > limit:
+            page = page[:limit]
+            headers["X-Next-Cursor"] = str(page[-1]["id"])
+        projected = [_project(c, projection) for c in page]
+        if format == "ndjson":
+            body = "".join(json.dumps(c) + "\n" for c in projected)
+            return Response(body, media_type=media_type, headers=headers)
+        return JSONResponse(projected, headers=headers)
+
+    if format == "ndjson":
+        return StreamingResponse((json.dumps(_project(c, projection)) + "\n" for c in rows), media_type=media_type)
+
+    def body():
+        yield "["
+        for i, c in enumerate(rows):
+            yield ("," if i else "") + json.dumps(_project(c, projection))
+        yield "]"
+
+    return StreamingResponse(body(), media_type=media_type)
 
 
 @router.get("/customers/{name}")
-def get_customer_by_name(name: str):
-    for c in get_all_customers():
-        if c["name"].lower() == name.lower():
-            return c
+def get_customer_by_name_endpoint(name: str, fields: Optional[str] = None):
+    customer = get_customer_by_name(name)
+    if customer:
+        return _project(customer, _parse_fields(fields))
     return {"error": f"Customer '{name}' not found."}
 
 
@@ -49,3 +127,22 @@ def login_endpoint(payload: LoginIn):
     if not user:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     return {"success": True, "customer": user}
+
+
+@router.post("/credit-scores")
+def credit_scores_endpoint(payload: CreditScoresIn):
+    scores = get_credit_scores(payload.ids)
+    return {
+        "scores": scores,
+        "missing": [i for i in payload.ids if i not in scores],
+    }
+
+
+@router.get("/credit-scores/cache-stats")
+def credit_cache_stats_endpoint():
+    return credit_cache_stats()
+
+
+@router.get("/credit-bureau/stats")
+def bureau_stats_endpoint():
+    return bureau_stats()
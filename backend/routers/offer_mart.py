@@ -1,6 +1,7 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Header
 from pydantic import BaseModel
 from services.offer_api import get_user_loans, add_user_loan
+from services.loan_outbox import get_loan_outbox
 
 router = APIRouter(prefix="/offer-mart", tags=["Offer Mart"])
 
@@ -22,8 +23,14 @@ def get_loans(user_id: int):
 
 
 @router.post("/user/{user_id}/loans")
-def add_loan(user_id: int, loan: Loan):
+def add_loan(user_id: int, loan: Loan, idempotency_key: str | None = Header(None)):
+    # a retried POST carrying the same Idempotency-Key gets the loan stored the first time
     return {
         "message": "Loan added",
-        "loan": add_user_loan(user_id, loan.dict())
+        "loan": add_user_loan(user_id, loan.dict(), idempotency_key)
     }
+
+
+@router.get("/outbox/stats")
+def outbox_stats():
+    return get_loan_outbox().stats()
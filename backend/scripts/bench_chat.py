@@ -0,0 +1,128 @@
+"""
+End-to-end /chat throughput benchmark: drives many concurrent conversations
+through greeting → amount → tenure → purpose (the LLM turn) against a
+running backend, for offline capacity planning.
+
+Usage (from backend/):
+    uvicorn scripts.mock_mistral:app --port 8020 &
+    MISTRAL_BASE_URL=http://localhost:8020 SESSION_STORE=memory uvicorn main:app --port 8000 &
+    python -m scripts.bench_chat --conversations 500 --concurrency 100
+    python -m scripts.bench_chat --stream          # measure /chat/stream TTFB too
+
+Every conversation (in every run) asks for a different amount, so prompts
+don't share prompt-cache entries unless --repeat is given.
+"""
+import argparse
+import asyncio
+import random
+import time
+
+import httpx
+
+SCRIPT = ["yes", "{amount}", "{tenure} years", "{purpose}"]
+PURPOSES = ["education", "home", "car", "business", "wedding", "medical", "personal"]
+
+
+def _pct(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(p * len(values)))] * 1000, 1)
+
+
+def _summary(values) -> str:
+    return f"p50={_pct(values, 0.5)}ms p95={_pct(values, 0.95)}ms p99={_pct(values, 0.99)}ms n={len(values)}"
+
+
+async def _llm_turn_stream(client, message, session_id, result):
+    started = time.perf_counter()
+    first = None
+    async with client.stream("POST", "/chat/stream", json={"message": message},
+                             headers={"X-Session-Id": session_id}) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if first is None and line.startswith("data:"):
+                first = time.perf_counter() - started
+    result["ttfb"].append(first if first is not None else time.perf_counter() - started)
+    return time.perf_counter() - started
+
+
+async def _conversation(client, index, args, result):
+    amount = 50000 if args.repeat else args.base_amount + index
+    values = {"amount": amount, "tenure": 1 + index % 5, "purpose": PURPOSES[index % len(PURPOSES)]}
+    session_id = None
+    for turn, template in enumerate(SCRIPT):
+        message = template.format(**values)
+        llm_turn = turn == len(SCRIPT) - 1
+        started = time.perf_counter()
+        try:
+            if llm_turn and args.stream:
+                elapsed = await _llm_turn_stream(client, message, session_id, result)
+            else:
+                headers = {"X-Session-Id": session_id} if session_id else {}
+                response = await client.post("/chat", json={"message": message}, headers=headers)
+                response.raise_for_status()
+                session_id = response.json()["session_id"]
+                elapsed = time.perf_counter() - started
+        except httpx.HTTPError as e:
+            result["errors"] += 1
+            result["error_types"][type(e).__name__] = result["error_types"].get(type(e).__name__, 0) + 1
+            return
+        result["llm" if llm_turn else "plain"].append(elapsed)
+    result["completed"] += 1
+
+
+async def run(args):
+    result = {"plain": [], "llm": [], "ttfb": [], "completed": 0, "errors": 0, "error_types": {}}
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits) as client:
+        before = (await client.get("/chat/llm-stats")).json()
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def bounded(i):
+            async with semaphore:
+                await _conversation(client, i, args, result)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(bounded(i) for i in range(args.conversations)))
+        elapsed = time.perf_counter() - started
+        after = (await client.get("/chat/llm-stats")).json()
+
+    turns = len(result["plain"]) + len(result["llm"])
+    print(f"[INFO] {result['completed']}/{args.conversations} conversations in {elapsed:.2f}s "
+          f"(concurrency {args.concurrency}, {'stream' if args.stream else 'json'})")
+    print(f"[INFO] throughput: {result['completed'] / elapsed:.1f} conversations/s, {turns / elapsed:.1f} turns/s")
+    print(f"[INFO] non-LLM turns: {_summary(result['plain'])}")
+    print(f"[INFO] LLM turn:      {_summary(result['llm'])}")
+    if args.stream:
+        print(f"[INFO] LLM TTFB:      {_summary(result['ttfb'])}")
+    if result["errors"]:
+        print(f"[WARN] {result['errors']} conversation(s) failed: {result['error_types']}")
+
+    delta = {k: after[k] - before[k] for k in ("calls", "retries", "failures", "rate_limited", "timeouts")}
+    budget = {k: after["latency_budget"][k] - before["latency_budget"][k]
+              for k in ("llm", "fallback_timeout", "fallback_error", "template_only")}
+    print(f"[INFO] upstream: {delta}")
+    print(f"[INFO] latency budget ({after['latency_budget']['budget_ms']:.0f}ms): {budget}")
+    if after.get("prompt_cache") and before.get("prompt_cache"):
+        hits = after["prompt_cache"]["hits"] - before["prompt_cache"]["hits"]
+        misses = after["prompt_cache"]["misses"] - before["prompt_cache"]["misses"]
+        print(f"[INFO] prompt cache: {hits} hits / {misses} misses this run")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--conversations", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--stream", action="store_true", help="send the LLM turn to /chat/stream")
+    parser.add_argument("--repeat", action="store_true", help="identical prompts (exercise the prompt cache)")
+    args = parser.parse_args()
+    # fresh amounts per run so earlier runs don't pre-warm the prompt cache
+    args.base_amount = random.randrange(10_000, 9_000_000, 10_000)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
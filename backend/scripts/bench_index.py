@@ -0,0 +1,164 @@
+"""
+Recall-vs-latency benchmark for the RAG index options (flat / HNSW / IVF)
+on generated customer data, to pick RAG_INDEX and its knobs per
+deployment size.
+
+Every option is built through services.vector_index.build_index (the code
+path RAGService uses) and scored against the exact flat index:
+recall@k, single-query p50/p99, batched queries/s, build time and
+serialized size.
+
+Usage (from backend/):
+    python -m scripts.bench_index --records 20000
+    python -m scripts.bench_index --records 1000000 --embed random   # scale test, no model
+    python -m scripts.bench_index --hnsw-m 16 32 --ef-search 16 64 256 --nprobe 1 8 32
+"""
+import argparse
+import random
+import time
+
+import faiss
+import numpy as np
+
+from services.rag_service import MODEL_NAME, POLICY_CHUNKS, customer_chunk
+from services.vector_index import build_index, index_spec_from_env, ivf_nlist
+
+FIRST = ["Aarav", "Vivaan", "Aditya", "Diya", "Ananya", "Ishaan", "Kavya", "Rohan", "Saanvi", "Arjun",
+         "Meera", "Kabir", "Nisha", "Vikram", "Priya", "Rahul", "Sneha", "Karan", "Pooja", "Aman"]
+LAST = ["Sharma", "Verma", "Iyer", "Reddy", "Patel", "Gupta", "Nair", "Mehta", "Singh", "Das"]
+CITIES = ["Mumbai", "Delhi", "Pune", "Chennai", "Kolkata", "Bangalore", "Hyderabad", "Jaipur", "Lucknow",
+          "Ahmedabad", "Kochi", "Indore", "Nagpur", "Surat", "Bhopal"]
+QUESTIONS = [
+    "What is the pre-approved limit for {name}?",
+    "Which customers from {city} have a pre-approved limit near ₹{amount}?",
+    "Does {name} from {city} qualify for a loan of ₹{amount}?",
+]
+
+
+def generate_chunks(n: int) -> list:
+    chunks = []
+    for _ in range(n):
+        name = f"{random.choice(FIRST)} {random.choice(LAST)}"
+        chunks.append(customer_chunk(name, {
+            "city": random.choice(CITIES),
+            "preapproved_limit": random.randrange(50_000, 2_000_000, 5_000),
+            "existing_loans": random.randrange(0, 4),
+            "credit_score": random.randrange(300, 900),
+        }))
+    return chunks + POLICY_CHUNKS
+
+
+def generate_queries(n: int) -> list:
+    return [
+        random.choice(QUESTIONS).format(
+            name=f"{random.choice(FIRST)} {random.choice(LAST)}", city=random.choice(CITIES),
+            amount=random.randrange(10_000, 5_000_000, 5_000))
+        for _ in range(n)
+    ]
+
+
+def embed(args):
+    if args.embed == "random":
+        # sentence embeddings are clustered, unit-length and of low intrinsic
+        # dimension; isotropic noise would make every approximate index look bad
+        rng = np.random.default_rng(0)
+        latent_dim = min(32, args.dim)
+        projection = rng.standard_normal((latent_dim, args.dim)).astype("float32")
+        centers = rng.standard_normal((max(16, args.records // 500), latent_dim)).astype("float32")
+
+        def sample(n):
+            picks = rng.integers(0, len(centers), n)
+            latent = centers[picks] + 0.5 * rng.standard_normal((n, latent_dim))
+            vectors = latent @ projection + 0.05 * rng.standard_normal((n, args.dim))
+            return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype("float32")
+
+        return sample(args.records), sample(args.queries)
+
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(MODEL_NAME)
+    started = time.perf_counter()
+    data = model.encode(generate_chunks(args.records), batch_size=256, show_progress_bar=False)
+    queries = model.encode(generate_queries(args.queries), batch_size=256, show_progress_bar=False)
+    print(f"[INFO] embedded {len(data)} chunks + {len(queries)} queries in {time.perf_counter() - started:.1f}s")
+    return np.ascontiguousarray(data, dtype="float32"), np.ascontiguousarray(queries, dtype="float32")
+
+
+def measure(index, queries: np.ndarray, k: int, truth: np.ndarray = None) -> dict:
+    latencies = []
+    for q in queries[: min(len(queries), 500)]:
+        started = time.perf_counter()
+        index.search(q.reshape(1, -1), k)
+        latencies.append(time.perf_counter() - started)
+    latencies.sort()
+
+    started = time.perf_counter()
+    _, found = index.search(queries, k)
+    batch_qps = len(queries) / (time.perf_counter() - started)
+
+    recall = 1.0
+    if truth is not None:
+        recall = np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)])
+    return {
+        "recall": recall,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p99_ms": latencies[min(len(latencies) - 1, int(0.99 * len(latencies)))] * 1000,
+        "batch_qps": batch_qps,
+    }, found
+
+
+def _row(name, build_s, size_mb, m):
+    print(f"{name:<28} {m['recall']:>8.4f} {m['p50_ms']:>8.3f} {m['p99_ms']:>8.3f} "
+          f"{m['batch_qps']:>10.0f} {build_s:>8.2f} {size_mb:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("-k", type=int, default=3)
+    parser.add_argument("--embed", choices=["model", "random"], default="model")
+    parser.add_argument("--dim", type=int, default=384, help="vector size for --embed random")
+    parser.add_argument("--hnsw-m", type=int, nargs="+", default=[16, 32])
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[16, 32, 64, 128])
+    parser.add_argument("--nlist", type=int, default=0, help="IVF lists (0 = ~4·√n)")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--threads", type=int, default=0, help="faiss OpenMP threads (0 = default)")
+    args = parser.parse_args()
+    if args.threads:
+        faiss.omp_set_num_threads(args.threads)
+
+    data, queries = embed(args)
+    ids = np.arange(len(data), dtype="int64")
+    base = index_spec_from_env()
+    print(f"[INFO] {len(data)} vectors × {data.shape[1]} dims, {len(queries)} queries, k={args.k}")
+    print(f"{'index':<28} {'recall':>8} {'p50_ms':>8} {'p99_ms':>8} {'batch_qps':>10} {'build_s':>8} {'size_mb':>9}")
+
+    def build(spec):
+        started = time.perf_counter()
+        index = build_index(data, ids, spec)
+        return index, time.perf_counter() - started, faiss.serialize_index(index).nbytes / 1e6
+
+    flat, build_s, size_mb = build(dict(base, kind="flat", codec="none"))
+    m, truth = measure(flat, queries, args.k)
+    _row("flat (exact)", build_s, size_mb, m)
+    del flat
+
+    for hnsw_m in args.hnsw_m:
+        index, build_s, size_mb = build(dict(base, kind="hnsw", hnsw_m=hnsw_m))
+        for ef in args.ef_search:
+            faiss.downcast_index(index.index).hnsw.efSearch = ef
+            m, _ = measure(index, queries, args.k, truth)
+            _row(f"hnsw M={hnsw_m} efSearch={ef}", build_s, size_mb, m)
+        del index
+
+    spec = dict(base, kind="ivf", nlist=args.nlist)
+    index, build_s, size_mb = build(spec)
+    for nprobe in args.nprobe:
+        index.nprobe = min(nprobe, index.nlist)
+        m, _ = measure(index, queries, args.k, truth)
+        _row(f"ivf nlist={ivf_nlist(spec, len(data))} nprobe={index.nprobe}", build_s, size_mb, m)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+In-process RAGService.retrieve throughput benchmark: N threads issue
+queries concurrently through the micro-batching query encoder, for a range
+of concurrency levels.
+
+Usage (from backend/):
+    python -m scripts.bench_rag
+    python -m scripts.bench_rag --concurrency 1 8 32 --queries 2000
+    python -m scripts.bench_rag --unique 0.2     # 80% repeated questions (LRU hits)
+    RAG_BATCH_SIZE=1 RAG_QUERY_CACHE_SIZE=0 python -m scripts.bench_rag   # baseline
+"""
+import argparse
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from services.crm_api import get_all_customers
+from services.rag_service import RAGService
+
+TEMPLATES = [
+    "What is the pre-approved limit for customers in {city}?",
+    "Can I get a loan of {amount} rupees?",
+    "Which customers from {city} have a pre-approved limit above {amount}?",
+    "Do I need salary slip verification for {amount}?",
+]
+CITIES = ["Mumbai", "Delhi", "Pune", "Chennai", "Kolkata", "Bangalore", "Hyderabad", "Jaipur"]
+
+
+def _queries(n: int, unique: float) -> list:
+    distinct = max(1, int(n * unique))
+    pool = [
+        random.choice(TEMPLATES).format(city=random.choice(CITIES), amount=random.randrange(10_000, 5_000_000))
+        for _ in range(distinct)
+    ]
+    queries = [pool[i % distinct] for i in range(n)]
+    random.shuffle(queries)
+    return queries
+
+
+def _pct(values, p):
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(p * len(values)))] * 1000, 2)
+
+
+def run_level(rag: RAGService, concurrency: int, queries: list):
+    before = rag.encoder.stats()
+    latencies = []
+
+    def one(query):
+        started = time.perf_counter()
+        rag.retrieve(query)
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, queries))
+    elapsed = time.perf_counter() - started
+
+    after = rag.encoder.stats()
+    batches = after["batches"] - before["batches"]
+    encoded = after["batched_queries"] - before["batched_queries"]
+    hits = (after["cache"]["hits"] - before["cache"]["hits"]) if after["cache"] else 0
+    print(f"[INFO] concurrency {concurrency:>4}: {len(queries) / elapsed:8.1f} queries/s  "
+          f"p50={_pct(latencies, 0.5)}ms p99={_pct(latencies, 0.99)}ms  "
+          f"batches={batches} avg_batch={encoded / batches if batches else 0:.1f} cache_hits={hits}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--queries", type=int, default=1000, help="queries per concurrency level")
+    parser.add_argument("--unique", type=float, default=1.0, help="fraction of distinct queries")
+    args = parser.parse_args()
+
+    rag = RAGService(records=get_all_customers())
+    rag.retrieve("warm up")   # load the model outside the measurement
+    for concurrency in args.concurrency:
+        # fresh queries per level so earlier levels don't pre-warm the LRU
+        run_level(rag, concurrency, _queries(args.queries, args.unique))
+    print(f"[INFO] encoder: {rag.encoder.stats()}")
+
+
+if __name__ == "__main__":
+    main()
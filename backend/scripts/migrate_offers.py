@@ -0,0 +1,17 @@
+"""
+One-off migration of data/offers.json to the current layout
+(`Loans` → `loans`, ids for id-less loans, persisted `next_loan_seq`).
+
+Usage (from backend/):
+    python -m scripts.migrate_offers
+"""
+from services.offer_store import OFFERS_FILE, migrate_legacy_loans
+
+
+def main():
+    changed = migrate_legacy_loans(OFFERS_FILE)
+    print(f"[INFO] Migrated {OFFERS_FILE.name}: {changed} user(s) updated")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Local stand-in for the external credit bureau, for load-testing underwriting
+without a network.
+
+Usage (from backend/):
+    BUREAU_LATENCY_MS=120 BUREAU_JITTER_MS=40 BUREAU_ERROR_RATE=0.02 \
+        uvicorn scripts.mock_bureau:app --port 8010
+
+    CREDIT_BUREAU_URL=http://localhost:8010 uvicorn main:app
+
+Environment:
+    BUREAU_LATENCY_MS   mean response latency (default 50)
+    BUREAU_JITTER_MS    uniform ± jitter around the mean (default 0)
+    BUREAU_ERROR_RATE   fraction of requests answered with HTTP 503 (default 0)
+"""
+import asyncio
+import os
+import random
+
+from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel
+
+from services.credit_api import calculate_credit_score
+
+LATENCY_MS = float(os.getenv("BUREAU_LATENCY_MS", "50"))
+JITTER_MS = float(os.getenv("BUREAU_JITTER_MS", "0"))
+ERROR_RATE = float(os.getenv("BUREAU_ERROR_RATE", "0"))
+
+app = FastAPI(title="Mock Credit Bureau")
+
+
+class ScoreIn(BaseModel):
+    id: int | None = None
+    name: str | None = None
+    age: int | None = None
+    salary: float | None = None
+    existing_loans: int | None = None
+
+
+@app.post("/v1/score")
+async def score(payload: ScoreIn):
+    delay = max(0.0, LATENCY_MS + random.uniform(-JITTER_MS, JITTER_MS)) / 1000
+    await asyncio.sleep(delay)
+    if random.random() < ERROR_RATE:
+        raise HTTPException(status_code=503, detail="Bureau temporarily unavailable")
+    customer = {k: v for k, v in payload.model_dump().items() if v is not None}
+    return {"id": payload.id, "score": calculate_credit_score(customer)}
+
+
+@app.get("/health")
+async def health():
+    return {"status": "ok", "latency_ms": LATENCY_MS, "jitter_ms": JITTER_MS, "error_rate": ERROR_RATE}
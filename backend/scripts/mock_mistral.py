@@ -0,0 +1,127 @@
+"""
+Local stand-in for the Mistral chat-completions API, for load-testing /chat
+without paying for tokens.
+
+Usage (from backend/):
+    MOCK_MISTRAL_LATENCY_MS=600 MOCK_MISTRAL_DIST=lognormal MOCK_MISTRAL_429_RATE=0.05 \
+        uvicorn scripts.mock_mistral:app --port 8020
+
+    MISTRAL_BASE_URL=http://localhost:8020 uvicorn main:app
+
+Environment:
+    MOCK_MISTRAL_LATENCY_MS   mean latency of a full completion (default 500)
+    MOCK_MISTRAL_JITTER_MS    spread: ± range for uniform, std-dev for normal,
+                              ignored for fixed/exponential (default 0)
+    MOCK_MISTRAL_DIST         fixed | uniform | normal | exponential | lognormal
+                              (default fixed; lognormal uses JITTER/LATENCY as sigma)
+    MOCK_MISTRAL_ERROR_RATE   fraction answered with HTTP 503 (default 0)
+    MOCK_MISTRAL_429_RATE     fraction answered with HTTP 429 (default 0)
+    MOCK_MISTRAL_RETRY_AFTER  Retry-After seconds sent with 429s (default 1)
+
+Replies echo the "Dear ..." line of the prompt when there is one (that is
+what the sales prompt asks the model to return); streaming requests spread
+the latency evenly over the tokens.
+"""
+import asyncio
+import json
+import math
+import os
+import random
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+LATENCY_MS = float(os.getenv("MOCK_MISTRAL_LATENCY_MS", "500"))
+JITTER_MS = float(os.getenv("MOCK_MISTRAL_JITTER_MS", "0"))
+DIST = os.getenv("MOCK_MISTRAL_DIST", "fixed").strip().lower()
+ERROR_RATE = float(os.getenv("MOCK_MISTRAL_ERROR_RATE", "0"))
+RATE_LIMIT_RATE = float(os.getenv("MOCK_MISTRAL_429_RATE", "0"))
+RETRY_AFTER = os.getenv("MOCK_MISTRAL_RETRY_AFTER", "1")
+
+app = FastAPI(title="Mock Mistral")
+counters = {"requests": 0, "streams": 0, "errors": 0, "rate_limited": 0}
+
+
+def _latency() -> float:
+    """One completion latency in seconds, drawn from the configured distribution."""
+    mean = LATENCY_MS
+    if DIST == "uniform":
+        ms = random.uniform(mean - JITTER_MS, mean + JITTER_MS)
+    elif DIST == "normal":
+        ms = random.gauss(mean, JITTER_MS)
+    elif DIST == "exponential":
+        ms = random.expovariate(1 / mean) if mean > 0 else 0
+    elif DIST == "lognormal":
+        sigma = JITTER_MS / mean if mean > 0 else 0
+        ms = random.lognormvariate(math.log(mean) - sigma ** 2 / 2, sigma) if mean > 0 else 0
+    else:
+        ms = mean
+    return max(0.0, ms) / 1000
+
+
+def _reply(prompt: str) -> str:
+    for line in prompt.splitlines():
+        if line.strip().startswith("Dear "):
+            return line.strip()
+    return "This is a mock completion."
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    counters["requests"] += 1
+
+    roll = random.random()
+    if roll < RATE_LIMIT_RATE:
+        counters["rate_limited"] += 1
+        return JSONResponse({"message": "Requests rate limit exceeded"}, status_code=429,
+                            headers={"Retry-After": RETRY_AFTER})
+    if roll < RATE_LIMIT_RATE + ERROR_RATE:
+        counters["errors"] += 1
+        return JSONResponse({"message": "Service unavailable"}, status_code=503)
+
+    prompt = "\n".join(m.get("content", "") for m in body.get("messages", []))
+    text = _reply(prompt)
+    tokens = [w + " " for w in text.split(" ")]
+    tokens[-1] = tokens[-1].rstrip()
+    usage = {
+        "prompt_tokens": len(prompt.split()),
+        "completion_tokens": len(tokens),
+        "total_tokens": len(prompt.split()) + len(tokens),
+    }
+    base = {"id": f"mock-{counters['requests']}", "object": "chat.completion", "created": int(time.time()),
+            "model": body.get("model", "mistral-tiny")}
+    latency = _latency()
+
+    if not body.get("stream"):
+        await asyncio.sleep(latency)
+        return {
+            **base,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+            "usage": usage,
+        }
+
+    counters["streams"] += 1
+    per_token = latency / len(tokens)
+
+    async def events():
+        for token in tokens:
+            await asyncio.sleep(per_token)
+            chunk = {**base, "object": "chat.completion.chunk",
+                     "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]}
+            yield f"data: {json.dumps(chunk)}\n\n"
+        final = {**base, "object": "chat.completion.chunk",
+                 "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}], "usage": usage}
+        yield f"data: {json.dumps(final)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@app.get("/health")
+async def health():
+    return {
+        "status": "ok", "latency_ms": LATENCY_MS, "jitter_ms": JITTER_MS, "dist": DIST,
+        "error_rate": ERROR_RATE, "rate_limit_rate": RATE_LIMIT_RATE, **counters,
+    }
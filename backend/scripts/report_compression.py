@@ -0,0 +1,66 @@
+"""
+Memory-vs-recall report for the compressed RAG index codecs
+(RAG_INDEX_CODEC = sq8 / sq4 / pq) against the exact float32 flat index.
+
+Each (index, codec) pair is built through services.vector_index.build_index
+on generated customer data (see scripts.bench_index) and reports bytes per
+vector, total serialized size, compression vs. flat float32, recall@k
+against exact search and single-query latency.
+
+Usage (from backend/):
+    python -m scripts.report_compression --records 20000
+    python -m scripts.report_compression --records 200000 --embed random --pq-m 96 48 24
+    python -m scripts.report_compression --kinds flat hnsw --codecs none sq8
+"""
+import argparse
+import time
+
+import faiss
+import numpy as np
+
+from scripts.bench_index import embed, measure
+from services.vector_index import CODECS, INDEX_KINDS, build_index, code_size, describe, index_spec_from_env
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("-k", type=int, default=3)
+    parser.add_argument("--embed", choices=["model", "random"], default="model")
+    parser.add_argument("--dim", type=int, default=384, help="vector size for --embed random")
+    parser.add_argument("--kinds", nargs="+", choices=INDEX_KINDS, default=list(INDEX_KINDS))
+    parser.add_argument("--codecs", nargs="+", choices=CODECS, default=list(CODECS))
+    parser.add_argument("--pq-m", type=int, nargs="+", default=[96, 48], help="PQ code bytes per vector")
+    args = parser.parse_args()
+
+    data, queries = embed(args)
+    n, dim = data.shape
+    ids = np.arange(n, dtype="int64")
+    base = index_spec_from_env()
+
+    exact = build_index(data, ids, dict(base, kind="flat", codec="none"))
+    baseline_mb = faiss.serialize_index(exact).nbytes / 1e6
+    _, truth = measure(exact, queries, args.k)
+    del exact
+
+    print(f"[INFO] {n} vectors × {dim} dims, {len(queries)} queries, k={args.k}; "
+          f"baseline flat float32 = {baseline_mb:.1f} MB")
+    print(f"{'index':<40} {'B/vec':>6} {'size_mb':>9} {'saved':>7} {'recall':>8} {'lost':>7} {'p50_ms':>8} {'build_s':>8}")
+    for kind in args.kinds:
+        for codec in args.codecs:
+            for pq_m in (args.pq_m if codec == "pq" else [base["pq_m"]]):
+                spec = dict(base, kind=kind, codec=codec, pq_m=pq_m)
+                started = time.perf_counter()
+                index = build_index(data, ids, spec)
+                build_s = time.perf_counter() - started
+                size_mb = faiss.serialize_index(index).nbytes / 1e6
+                m, _ = measure(index, queries, args.k, truth)
+                print(f"{describe(spec):<40} {code_size(spec, dim):>6} {size_mb:>9.1f} "
+                      f"{baseline_mb / size_mb:>6.1f}× {m['recall']:>8.4f} {1 - m['recall']:>7.4f} "
+                      f"{m['p50_ms']:>8.3f} {build_s:>8.2f}")
+                del index
+
+
+if __name__ == "__main__":
+    main()
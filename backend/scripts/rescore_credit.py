@@ -0,0 +1,20 @@
+"""
+Nightly rescoring of the whole customer book.
+
+Usage (from backend/):
+    python -m scripts.rescore_credit
+"""
+import time
+
+from services.crm_api import rescore_all_customers
+
+
+def main():
+    start = time.perf_counter()
+    changed = rescore_all_customers()
+    elapsed = time.perf_counter() - start
+    print(f"[INFO] Rescored customer book in {elapsed:.2f}s — {changed} scores changed")
+
+
+if __name__ == "__main__":
+    main()
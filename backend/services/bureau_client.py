@@ -0,0 +1,159 @@
+import asyncio
+import threading
+import time
+
+import httpx
+
+
+class CircuitBreaker:
+    """
+    closed → (failure_threshold consecutive failures) → open
+    open → (reset_timeout seconds) → half_open: one trial call
+    half_open → success: closed | failure: open again
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = "half_open"
+                self._trial_in_flight = False
+            if self.state == "half_open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+
+class BureauClient:
+    """
+    Pooled async client for an external credit bureau.
+
+    - one `httpx.AsyncClient` (keep-alive pool) living on a private event
+      loop thread, so both sync callers (`score`) and async callers
+      (`score_async`) share the same connections
+    - concurrent lookups for the same customer are coalesced into one call
+    - every call is bounded by `timeout`; failures feed a circuit breaker
+    - on timeout, error or open circuit the `fallback(customer)` score is
+      used; `lookup()` says which one the caller got
+
+    Bureau contract: POST {base_url}/v1/score with the customer's scoring
+    inputs → {"score": int}.
+    """
+
+    def __init__(self, base_url: str, fallback, timeout: float = 0.8, max_connections: int = 100,
+                 failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.base_url = base_url.rstrip("/")
+        self.fallback = fallback
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.counters = {"calls": 0, "coalesced": 0, "failures": 0, "fallbacks": 0}
+
+        self._inflight = {}
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="bureau-client", daemon=True)
+        self._thread.start()
+        self._client = asyncio.run_coroutine_threadsafe(self._make_client(), self._loop).result()
+
+    async def _make_client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=httpx.Timeout(self.timeout),
+            limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections),
+        )
+
+    # ──────────────────────────────────────────────────────
+    # RUNS ON THE CLIENT LOOP
+    # ──────────────────────────────────────────────────────
+    async def _fetch(self, customer: dict) -> int:
+        payload = {k: customer.get(k) for k in ("id", "name", "age", "salary", "existing_loans")}
+        response = await self._client.post("/v1/score", json=payload)
+        response.raise_for_status()
+        return int(response.json()["score"])
+
+    async def _score(self, customer: dict) -> tuple:
+        key = customer.get("id", customer.get("name"))
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.counters["coalesced"] += 1
+            return await asyncio.shield(pending)
+
+        future = self._loop.create_future()
+        self._inflight[key] = future
+        try:
+            score = await self._call(customer)
+            future.set_result(score)
+            return score
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            del self._inflight[key]
+
+    async def _call(self, customer: dict) -> tuple:
+        if not self.breaker.allow():
+            self.counters["fallbacks"] += 1
+            return self.fallback(customer), True
+        self.counters["calls"] += 1
+        try:
+            score = await asyncio.wait_for(self._fetch(customer), self.timeout)
+        except Exception as e:
+            self.breaker.record_failure()
+            self.counters["failures"] += 1
+            self.counters["fallbacks"] += 1
+            print(f"[WARN] Credit bureau call failed ({type(e).__name__}); using local score")
+            return self.fallback(customer), True
+        self.breaker.record_success()
+        return score, False
+
+    # ──────────────────────────────────────────────────────
+    # PUBLIC API
+    # ──────────────────────────────────────────────────────
+    def lookup(self, customer: dict) -> tuple:
+        """Blocking lookup → (score, is_fallback), safe to call from any worker thread."""
+        return asyncio.run_coroutine_threadsafe(self._score(customer), self._loop).result()
+
+    def score(self, customer: dict) -> int:
+        """Blocking lookup of the score alone."""
+        return self.lookup(customer)[0]
+
+    async def score_async(self, customer: dict) -> int:
+        """Awaitable lookup from another event loop (e.g. FastAPI's)."""
+        score, _ = await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(self._score(customer), self._loop))
+        return score
+
+    def stats(self) -> dict:
+        return {
+            **self.counters,
+            "in_flight": len(self._inflight),
+            "circuit": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+        }
+
+    def close(self):
+        asyncio.run_coroutine_threadsafe(self._client.aclose(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
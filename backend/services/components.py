@@ -0,0 +1,72 @@
+import threading
+
+
+class ComponentRegistry:
+    """
+    Process-wide registry of heavyweight, read-mostly components.
+
+    Each component is built once on first use (double-checked, one lock
+    per key so unrelated components don't wait on each other) and then
+    shared by every session.
+    """
+
+    def __init__(self):
+        self._components = {}
+        self._locks = {}
+        self._guard = threading.Lock()
+
+    def get(self, key: str, factory):
+        component = self._components.get(key)
+        if component is not None:
+            return component
+        with self._guard:
+            lock = self._locks.setdefault(key, threading.Lock())
+        with lock:
+            if key not in self._components:
+                self._components[key] = factory()
+            return self._components[key]
+
+    def peek(self, key: str):
+        """The component if it was already built, without building it."""
+        return self._components.get(key)
+
+    def loaded(self) -> list:
+        return sorted(self._components)
+
+
+registry = ComponentRegistry()
+
+
+def _build_rag_service():
+    from services.crm_api import get_all_customers, subscribe_customer_changes
+    from services.rag_service import RAGService
+
+    # build from the store (fresher than customers.json under the journal /
+    # sqlite engines), then follow its writes incrementally
+    rag = RAGService(records=get_all_customers())
+    subscribe_customer_changes(rag.on_customer_change)
+    return rag
+
+
+def get_rag_service():
+    """Shared RAGService: one model + one FAISS index per process."""
+    return registry.get("rag", _build_rag_service)
+
+
+def persist_rag_service():
+    """Flush incremental RAG updates to disk (no-op if the index was never loaded)."""
+    rag = registry.peek("rag")
+    if rag is not None:
+        rag.persist()
+
+
+def get_underwriting_agent():
+    from agents.underwriting_agent import UnderwritingAgent
+
+    return registry.get("underwriting_agent", UnderwritingAgent)
+
+
+def get_sanction_agent():
+    from agents.sanction_agent import SanctionAgent
+
+    return registry.get("sanction_agent", SanctionAgent)
@@ -1,8 +1,9 @@
+import os
 import random
-import json
-from pathlib import Path
-
-CUSTOMERS_PATH = Path(__file__).resolve().parent.parent / "data" / "customers.json"
+import threading
+import numpy as np
+from services.cache import LRUCache
+from services.customer_store import get_customer_store
 
 def calculate_credit_score(customer: dict) -> int:
     """Calculate credit score based on customer's credit history and profile."""
@@ -12,18 +13,118 @@ def calculate_credit_score(customer: dict) -> int:
     base -= max(0, customer.get("age", 30) - 60)  # Penalty for age over 60
     return max(300, min(900, base))
 
-_credit_cache = {}
 
-def get_credit_score(name: str) -> int:
-    if name not in _credit_cache:
-        try:
-            customers = json.load(open(CUSTOMERS_PATH))
-            for c in customers:
-                if c["name"] == name:
-                    _credit_cache[name] = calculate_credit_score(c)
-                    break
+def score_batch(customers: list) -> np.ndarray:
+    """
+    Vectorized `calculate_credit_score` over many customers in one pass.
+    Returns an int array aligned with `customers`.
+    """
+    n = len(customers)
+    loans = np.fromiter((c.get("existing_loans", 0) for c in customers), dtype=np.float64, count=n)
+    salary = np.fromiter((c.get("salary", 0) for c in customers), dtype=np.float64, count=n)
+    age = np.fromiter((c.get("age", 30) for c in customers), dtype=np.float64, count=n)
+
+    base = 750.0 - loans * 25
+    base += np.minimum(np.floor_divide(salary, 10000), 10) * 10
+    base -= np.maximum(0, age - 60)
+    return np.clip(base, 300, 900).astype(np.int64)
+
+
+# Bounded, id-keyed score cache. crm_api refreshes/invalidates entries on
+# every write that changes scoring inputs.
+_credit_cache = LRUCache(
+    maxsize=int(os.getenv("CREDIT_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("CREDIT_CACHE_TTL", "3600")),
+)
+
+# Locally calculated stand-ins for a bureau score (bureau down / circuit
+# open) are only cached this long, so real scores return soon after recovery.
+CREDIT_FALLBACK_TTL = float(os.getenv("CREDIT_FALLBACK_TTL", "30"))
+
+
+# ──────────────────────────────────────────────────────────
+# EXTERNAL BUREAU (optional)
+# ──────────────────────────────────────────────────────────
+# With CREDIT_BUREAU_URL set, cache misses are scored by the bureau and
+# calculate_credit_score becomes the fallback (timeouts / open circuit).
+_bureau = None
+_bureau_lock = threading.Lock()
+
+
+def get_bureau_client():
+    global _bureau
+    url = os.getenv("CREDIT_BUREAU_URL")
+    if not url:
+        return None
+    if _bureau is None:
+        with _bureau_lock:
+            if _bureau is None:
+                from services.bureau_client import BureauClient
+
+                _bureau = BureauClient(
+                    url,
+                    fallback=calculate_credit_score,
+                    timeout=float(os.getenv("CREDIT_BUREAU_TIMEOUT", "0.8")),
+                    max_connections=int(os.getenv("CREDIT_BUREAU_MAX_CONNECTIONS", "100")),
+                    failure_threshold=int(os.getenv("CREDIT_BUREAU_FAILURE_THRESHOLD", "5")),
+                    reset_timeout=float(os.getenv("CREDIT_BUREAU_RESET_TIMEOUT", "30")),
+                )
+    return _bureau
+
+
+def get_credit_score_by_id(cid: int):
+    """Return the (cached) credit score for a customer id, or None if unknown."""
+    score = _credit_cache.get(cid)
+    if score is None:
+        customer = get_customer_store().get(cid)
+        if customer is None:
+            return None
+        bureau = get_bureau_client()
+        if bureau is None:
+            score = calculate_credit_score(customer)
+            _credit_cache.set(cid, score)
+        else:
+            score, is_fallback = bureau.lookup(customer)
+            if is_fallback:
+                _credit_cache.set(cid, score, ttl=CREDIT_FALLBACK_TTL)
             else:
-                _credit_cache[name] = 750  # Default if not found
-        except:
-            _credit_cache[name] = random.randint(650, 850)  # Fallback
-    return _credit_cache[name]
+                _credit_cache.set(cid, score)
+    return score
+
+
+def get_credit_score(name: str) -> int:
+    """Credit score for the customer with this exact name (750 if unknown)."""
+    try:
+        matches = get_customer_store().find_by_name(name)
+    except Exception:
+        return random.randint(650, 850)  # Fallback
+    if not matches:
+        return 750  # Default if not found (not cached)
+    return get_credit_score_by_id(matches[0]["id"])
+
+
+def refresh_credit_score(customer: dict):
+    """
+    Recompute and cache the score for a freshly written customer record.
+    With a bureau configured the entry is only dropped (returns None): the
+    next read asks the bureau instead of caching a local estimate.
+    """
+    if get_bureau_client() is not None:
+        _credit_cache.invalidate(customer["id"])
+        return None
+    score = calculate_credit_score(customer)
+    _credit_cache.set(customer["id"], score)
+    return score
+
+
+def invalidate_credit_score(cid: int):
+    _credit_cache.invalidate(cid)
+
+
+def credit_cache_stats() -> dict:
+    return _credit_cache.stats()
+
+
+def bureau_stats() -> dict:
+    bureau = get_bureau_client()
+    return bureau.stats() if bureau else {"enabled": False}
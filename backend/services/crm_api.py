@@ -1,18 +1,24 @@
-import json
-from pathlib import Path
-from services.credit_api import get_credit_score, calculate_credit_score
+from services.credit_api import calculate_credit_score, score_batch, refresh_credit_score, invalidate_credit_score
+from services.customer_store import CUSTOMERS_PATH, get_customer_store
 
-# Path to CRM database
-CUSTOMERS_PATH = Path(__file__).resolve().parent.parent / "data" / "customers.json"
 
-def _load_customers():
-    """Internal function to load CRM data."""
-    try:
-        with open(CUSTOMERS_PATH, "r") as f:
-            return json.load(f)
-    except FileNotFoundError:
-        print(f"[ERROR] customers.json not found at {CUSTOMERS_PATH}")
-        return []
+# ──────────────────────────────────────────────────────────
+# 0. CHANGE FEED (derived views, e.g. the RAG index)
+# ──────────────────────────────────────────────────────────
+_subscribers = []
+
+
+def subscribe_customer_changes(callback):
+    """Register `callback(event, customer)`; event is "upsert" or "remove"."""
+    _subscribers.append(callback)
+
+
+def _publish(event: str, customer: dict):
+    for callback in list(_subscribers):
+        try:
+            callback(event, customer)
+        except Exception as e:
+            print(f"[WARN] Customer change subscriber failed: {e}")
 
 
 # ──────────────────────────────────────────────────────────
@@ -22,7 +28,22 @@ def get_all_customers():
     """
     Returns full raw customer list for matching name, age, city, phone, salary.
     """
-    return _load_customers()
+    return get_customer_store().all()
+
+
+def iter_customers(after_id: int = 0, city: str = None, min_salary: int = None, max_salary: int = None, batch_size: int = 500):
+    """
+    Lazily yield customers in id order, starting after `after_id`.
+    Fetches `batch_size` records at a time so callers can stream
+    the whole book without holding it in memory.
+    """
+    store = get_customer_store()
+    while True:
+        page = store.page(after_id, batch_size, city, min_salary, max_salary)
+        yield from page
+        if len(page) < batch_size:
+            return
+        after_id = page[-1]["id"]
 
 
 # ──────────────────────────────────────────────────────────
@@ -30,8 +51,13 @@ def get_all_customers():
 # ──────────────────────────────────────────────────────────
 def get_customer_by_id(cid: int):
     """Return a customer by ID."""
-    customers = _load_customers()
-    return next((c for c in customers if c["id"] == cid), None)
+    return get_customer_store().get(cid)
+
+
+def get_customer_by_name(name: str):
+    """Return the first customer whose name matches exactly (case-insensitive)."""
+    matches = get_customer_store().find_by_name(name)
+    return matches[0] if matches else None
 
 
 # ──────────────────────────────────────────────────────────
@@ -39,24 +65,20 @@ def get_customer_by_id(cid: int):
 # ──────────────────────────────────────────────────────────
 def get_customer_kyc(name: str):
     """
-    Fetch customers whose name matches (case-insensitive).
-    Returns a LIST of matches (not a single dict).
+    Fetch customers whose name matches (case-insensitive substring).
+    Returns a LIST of matches (not a single dict), ranked exact → prefix
+    → substring by the store's trigram name index.
 
     VerificationAgent handles:
       - multiple matches → ask for ID
       - single match → proceed
     """
-    customers = _load_customers()
-
-    matches = [
-        cust for cust in customers
-        if name.lower() in cust["name"].lower()
-    ]
+    matches = get_customer_store().search_name(name)
 
-    # Add missing credit scores if needed
+    # Add missing credit scores if needed (the record is already in hand)
     for cust in matches:
         if not cust.get("credit_score"):
-            cust["credit_score"] = get_credit_score(cust["name"])
+            cust["credit_score"] = calculate_credit_score(cust)
 
     return matches
 
@@ -64,20 +86,6 @@ def get_customer_kyc(name: str):
 # ──────────────────────────────────────────────────────────
 # 4. SIGNUP / AUTH HELPERS
 # ──────────────────────────────────────────────────────────
-def _save_customers(customers: list):
-    """Write customers back to disk."""
-    with open(CUSTOMERS_PATH, "w") as f:
-        json.dump(customers, f, indent=2)
-
-
-def _next_customer_id(customers: list) -> int:
-    """Return next unique ID. New users start from 501 minimum."""
-    if not customers:
-        return 501
-    max_id = max((c.get("id", 0) for c in customers), default=0)
-    return max(max_id + 1, 501)
-
-
 def _compute_preapproved_limit(salary: int) -> int:
     """Simple rule-based pre-approved limit based on salary."""
     if salary < 50000:
@@ -100,18 +108,16 @@ def sign_up(name: str, age: int, city: str, phone: str, salary: int, email: str,
     """
     import hashlib
 
-    customers = _load_customers()
+    store = get_customer_store()
 
     # email uniqueness check
-    if any(c.get("email") and c["email"].lower() == email.lower() for c in customers):
+    if store.get_by_email(email):
         raise ValueError("Email already registered")
 
-    cid = _next_customer_id(customers)
-
     pw_hash = hashlib.sha256(password.encode("utf-8")).hexdigest()
 
     new_customer = {
-        "id": cid,
+        "id": None,
         "name": name,
         "age": age,
         "city": city,
@@ -127,8 +133,10 @@ def sign_up(name: str, age: int, city: str, phone: str, salary: int, email: str,
 
     new_customer["credit_score"] = calculate_credit_score(new_customer)
 
-    customers.append(new_customer)
-    _save_customers(customers)
+    # id assignment + uniqueness are re-checked atomically by the store
+    new_customer = store.insert(new_customer)
+    refresh_credit_score(new_customer)
+    _publish("upsert", new_customer)
 
     # return a copy without the password hash
     safe = dict(new_customer)
@@ -140,16 +148,12 @@ def authenticate(email: str, password: str) -> dict:
     """Authenticate a user by email + password. Returns customer dict (no password_hash) or None."""
     import hashlib
 
-    customers = _load_customers()
     pw_hash = hashlib.sha256(password.encode("utf-8")).hexdigest()
 
-    for c in customers:
-        if c.get("email") and c["email"].lower() == email.lower():
-            if c.get("password_hash") == pw_hash:
-                safe = dict(c)
-                safe.pop("password_hash", None)
-                return safe
-            return None
+    c = get_customer_store().get_by_email(email)
+    if c and c.get("password_hash") == pw_hash:
+        c.pop("password_hash", None)
+        return c
 
     return None
 
@@ -159,11 +163,60 @@ def authenticate(email: str, password: str) -> dict:
 # ──────────────────────────────────────────────────────────
 def update_customer_loans(cid: int):
     """Increment existing_loans for a customer and update credit_score."""
-    customers = _load_customers()
-    for c in customers:
-        if c["id"] == cid:
-            c["existing_loans"] += 1
-            c["credit_score"] = calculate_credit_score(c)
-            _save_customers(customers)
-            return True
-    return False
+    def _bump(c):
+        c["existing_loans"] += 1
+        c["credit_score"] = calculate_credit_score(c)
+
+    updated = get_customer_store().update(cid, _bump, op="loan_increment")
+    if updated is None:
+        # unknown id: nothing changed, so subscribers hear nothing
+        invalidate_credit_score(cid)
+        return False
+    refresh_credit_score(updated)
+    _publish("upsert", updated)
+    return True
+
+
+# ──────────────────────────────────────────────────────────
+# 6. BULK CREDIT SCORES
+# ──────────────────────────────────────────────────────────
+def get_credit_scores(ids: list) -> dict:
+    """Score the given customer ids in one vectorized pass → {id: score}."""
+    found = get_customer_store().get_many(ids)
+    customers = list(found.values())
+    scores = score_batch(customers)
+    return {c["id"]: int(s) for c, s in zip(customers, scores)}
+
+
+def rescore_all_customers(batch_size: int = 50000) -> int:
+    """
+    Recompute and persist `credit_score` for the whole book.
+    Scores are computed per batch with NumPy; only changed rows are written.
+    Returns the number of customers whose score changed.
+    """
+    store = get_customer_store()
+    changed = 0
+    batch = []
+    for c in iter_customers(batch_size=batch_size):
+        batch.append(c)
+        if len(batch) >= batch_size:
+            changed += _rescore(store, batch)
+            batch = []
+    if batch:
+        changed += _rescore(store, batch)
+    return changed
+
+
+def _rescore(store, customers: list) -> int:
+    scores = score_batch(customers)
+    updates = {
+        c["id"]: {"credit_score": int(s)}
+        for c, s in zip(customers, scores)
+        if c.get("credit_score") != int(s)
+    }
+    if not updates:
+        return 0
+    changed = store.set_fields(updates, op="credit_score")
+    for cid in updates:
+        invalidate_credit_score(cid)
+    return changed
@@ -0,0 +1,221 @@
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+JOURNAL_DIR = Path(__file__).resolve().parent.parent / "data" / "crm_journal"
+
+
+class CustomerJournal:
+    """
+    Append-only, group-committed journal of CRM mutations, shared by every
+    worker process.
+
+    - `append()` writes one op to the current segment straight away, so
+      other processes see it on their next `read_new()`; a background
+      flusher fsyncs every op that arrived within `flush_interval` seconds
+      together
+    - ops carry resulting field values, so replaying one twice is harmless
+    - the journal is split into numbered segments; `rotate()` seals the
+      current one so a snapshot can be written while new ops keep flowing
+      into the next segment
+    - `append()`, `rotate()` and `discard()` must be called under the
+      owner's cross-process lock (see CustomerRepository); reads need none
+
+    Op shapes:
+        {"op": "signup", "customer": {...}}
+        {"op": "loan_increment" | "credit_score" | "update", "id": 7, "fields": {...}}
+    """
+
+    def __init__(self, directory: Path = JOURNAL_DIR, flush_interval: float = 0.01):
+        self.dir = Path(directory)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.flush_interval = flush_interval
+
+        self._cond = threading.Condition()
+        self._unsynced = []          # events waiting for the next fsync
+        self._segment = self._last_segment_number() or 1
+        self._file = self._open(self._segment)
+        self._read_pos = (0, 0)      # (segment, byte offset) consumed by replay / read_new
+        self._ops_since_rotate = 0
+        self._closed = False
+
+        self._thread = threading.Thread(target=self._run, name="crm-journal-flusher", daemon=True)
+        self._thread.start()
+
+    # ──────────────────────────────────────────────────────
+    # SEGMENTS
+    # ──────────────────────────────────────────────────────
+    def _segment_path(self, n: int) -> Path:
+        return self.dir / f"segment-{n:08d}.log"
+
+    def _segment_numbers(self) -> list:
+        return sorted(int(p.stem.split("-")[1]) for p in self.dir.glob("segment-*.log"))
+
+    def _last_segment_number(self) -> int:
+        numbers = self._segment_numbers()
+        return numbers[-1] if numbers else 0
+
+    def _open(self, n: int):
+        self._check_tail = True
+        return open(self._segment_path(n), "ab")
+
+    def _repair_tail(self):
+        """A torn final write (crash mid-line) must not swallow the next op (lock held)."""
+        self._check_tail = False
+        if not self._file.tell():
+            return
+        with open(self._segment_path(self._segment), "rb") as r:
+            r.seek(-1, os.SEEK_END)
+            if r.read(1) != b"\n":
+                self._file.write(b"\n")
+
+    def _switch_to(self, n: int):
+        """Make segment `n` the append target (lock held): fsync + close the old one."""
+        self._sync_unsynced()
+        self._file.close()
+        self._segment = n
+        self._file = self._open(n)
+        self._ops_since_rotate = 0
+
+    def _follow_rotation(self):
+        # another process may have rotated since our last append
+        if self._segment_path(self._segment + 1).exists():
+            self._switch_to(self._last_segment_number())
+
+    @property
+    def ops_since_rotate(self) -> int:
+        return self._ops_since_rotate
+
+    def rotate(self) -> list:
+        """Seal the current segment; return the sealed segment numbers."""
+        with self._cond:
+            self._follow_rotation()
+            sealed = [n for n in self._segment_numbers() if n <= self._segment]
+            self._switch_to(self._segment + 1)
+            return sealed
+
+    def discard(self, segments: list):
+        """Delete sealed segments once a snapshot covering them is durable."""
+        for n in segments:
+            try:
+                self._segment_path(n).unlink()
+            except FileNotFoundError:
+                pass
+
+    # ──────────────────────────────────────────────────────
+    # READS
+    # ──────────────────────────────────────────────────────
+    def _read_segment(self, n: int, offset: int):
+        """Complete lines of segment `n` from `offset` → (ops, new offset)."""
+        try:
+            with open(self._segment_path(n), "rb") as f:
+                f.seek(offset)
+                data = f.read()
+        except FileNotFoundError:
+            return [], offset
+        # a line another process is writing right now ends without "\n" yet
+        end = data.rfind(b"\n") + 1
+        ops = []
+        for line in data[:end].splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                ops.append(json.loads(line))
+            except json.JSONDecodeError:
+                # torn write from a crashed process — it was never acknowledged
+                print(f"[WARN] Skipping corrupt journal line in segment {n}")
+        return ops, offset + end
+
+    def replay(self):
+        """Every journaled op, oldest segment first; remembers where it ended."""
+        self._read_pos = (0, 0)
+        return self.read_new()
+
+    def read_new(self):
+        """
+        Ops appended (by any process) since the last replay / read_new, or
+        None if the segment being read was compacted away meanwhile (the
+        caller must reload the snapshot and replay).
+        """
+        segment, offset = self._read_pos
+        if segment and not self._segment_path(segment).exists():
+            return None
+        numbers = [n for n in self._segment_numbers() if n >= segment]
+        ops = []
+        for n in numbers:
+            found, end = self._read_segment(n, offset if n == segment else 0)
+            ops.extend(found)
+            segment, offset = n, end
+        self._read_pos = (segment, offset)
+        return ops
+
+    def has_new(self) -> bool:
+        """Cheap check for ops from other processes (two stats)."""
+        segment, offset = self._read_pos
+        try:
+            if os.stat(self._segment_path(segment)).st_size > offset:
+                return True
+        except FileNotFoundError:
+            return True
+        return self._segment_path(segment + 1).exists()
+
+    # ──────────────────────────────────────────────────────
+    # GROUP COMMIT
+    # ──────────────────────────────────────────────────────
+    def append(self, op: dict) -> threading.Event:
+        """
+        Write `op` (visible to other processes at once); the returned event
+        is set once it has been fsynced. The caller must have consumed every
+        earlier op via `read_new()` under the same cross-process lock.
+        """
+        done = threading.Event()
+        line = (json.dumps(op, separators=(",", ":")) + "\n").encode("utf-8")
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("journal is closed")
+            self._follow_rotation()
+            if self._check_tail:
+                self._repair_tail()
+            self._file.write(line)
+            self._file.flush()
+            self._read_pos = (self._segment, self._file.tell())
+            self._unsynced.append(done)
+            self._ops_since_rotate += 1
+            self._cond.notify()
+        return done
+
+    def _sync_unsynced(self):
+        """fsync the current segment and release its waiters (caller holds the lock)."""
+        if not self._unsynced:
+            return
+        batch, self._unsynced = self._unsynced, []
+        os.fsync(self._file.fileno())
+        for done in batch:
+            done.set()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._unsynced and not self._closed:
+                    self._cond.wait()
+                if self._closed and not self._unsynced:
+                    return
+            # let concurrent writers join this batch
+            time.sleep(self.flush_interval)
+            with self._cond:
+                self._sync_unsynced()
+
+    def flush(self):
+        with self._cond:
+            self._sync_unsynced()
+
+    def close(self):
+        with self._cond:
+            self._sync_unsynced()
+            self._closed = True
+            self._cond.notify()
+        self._thread.join(timeout=5)
+        self._file.close()
@@ -0,0 +1,334 @@
+import bisect
+import json
+import os
+import threading
+from pathlib import Path
+
+from services.crm_journal import CustomerJournal
+from services.file_lock import FileLock
+from services.name_index import TrigramNameIndex, normalize_name
+
+# Path to CRM database
+CUSTOMERS_PATH = Path(__file__).resolve().parent.parent / "data" / "customers.json"
+
+# Compact the journal into customers.json after this many mutations.
+JOURNAL_COMPACT_OPS = int(os.getenv("CRM_JOURNAL_COMPACT_OPS", "1000"))
+
+_MISSING = object()
+
+
+def journal_enabled() -> bool:
+    """CRM_JOURNAL=0 makes every JSON-engine write rewrite customers.json."""
+    return os.getenv("CRM_JOURNAL", "1").strip().lower() not in ("0", "false", "no", "off")
+
+
+class CustomerRepository:
+    """
+    Process-wide, in-memory view of `customers.json`.
+
+    - parses the file once and keeps hash indexes by `id`,
+      lower-cased `email` and normalized name, plus a trigram index
+      for substring name search
+    - reloads only when the file's mtime/size changes on disk, and
+      otherwise just replays journal ops other workers appended
+    - hands out copies, so callers can annotate records freely
+    - with a journal, writes are appended to it (group-committed) and
+      folded into `customers.json` by a background compaction; without
+      one, every write rewrites the file
+    - writes, full reloads and compaction hold a cross-process lock file
+      next to `customers.json`, so several workers can share one CRM:
+      each writer first catches up on the others' ops, which keeps ids
+      and emails unique
+    """
+
+    def __init__(self, path: Path = CUSTOMERS_PATH, journal: CustomerJournal = None):
+        self.path = Path(path)
+        self.journal = journal
+        self._lock = threading.RLock()
+        self._xlock = FileLock(self.path.with_name(self.path.name + ".lock"))
+        self._stat = None
+        self._loaded = False
+        self._by_id = {}          # id → record (file order); records are replaced, never mutated
+        self._by_email = {}       # email → id
+        self._by_name = {}        # normalized name → [ids]
+        self._sorted_ids = []
+        self._name_index = TrigramNameIndex()
+        self._compacting = False
+
+    # ──────────────────────────────────────────────────────
+    # LOADING
+    # ──────────────────────────────────────────────────────
+    def _file_stat(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _refresh(self):
+        """Catch up with disk (caller holds `_lock`): journal tail, or a full reload."""
+        if self._loaded and self._file_stat() == self._stat:
+            if self.journal is None or not self.journal.has_new():
+                return
+            ops = self.journal.read_new()
+            if ops is not None:
+                for op in ops:
+                    self._apply(op)
+                return
+        self._reload()
+
+    def _reload(self):
+        """Re-parse the file and replay the whole journal."""
+        # a compaction elsewhere must not swap the snapshot / drop segments mid-read
+        with self._xlock:
+            stat = self._file_stat()
+            if stat is None:
+                print(f"[ERROR] customers.json not found at {self.path}")
+                customers = []
+            else:
+                with open(self.path, "r") as f:
+                    customers = json.load(f)
+            self._rebuild(customers)
+            if self.journal:
+                for op in self.journal.replay():
+                    self._apply(op)
+            self._stat = stat
+            self._loaded = True
+
+    def _rebuild(self, customers):
+        self._by_id = {}
+        self._by_email = {}
+        self._by_name = {}
+        self._name_index.clear()
+        for c in customers:
+            self._index(c)
+        self._sorted_ids = sorted(self._by_id)
+
+    def _index(self, c: dict):
+        self._by_id[c["id"]] = c
+        if c.get("email"):
+            self._by_email[c["email"].lower()] = c["id"]
+        self._by_name.setdefault(normalize_name(c.get("name", "")), []).append(c["id"])
+        self._name_index.add(c["id"], c.get("name", ""))
+
+    def _add(self, record: dict):
+        self._index(record)
+        if not self._sorted_ids or record["id"] > self._sorted_ids[-1]:
+            self._sorted_ids.append(record["id"])
+        else:
+            bisect.insort(self._sorted_ids, record["id"])
+
+    def _replace(self, old: dict, new: dict):
+        self._by_id[new["id"]] = new
+        if (old.get("name"), old.get("email")) != (new.get("name"), new.get("email")):
+            self._rebuild(list(self._by_id.values()))
+
+    def _apply(self, op: dict):
+        """Re-apply one journaled op (idempotent: ops carry resulting values)."""
+        if op["op"] == "signup":
+            if op["customer"]["id"] not in self._by_id:
+                self._add(op["customer"])
+            return
+        old = self._by_id.get(op["id"])
+        if old is not None:
+            self._replace(old, {**old, **op["fields"]})
+
+    # ──────────────────────────────────────────────────────
+    # PERSISTENCE
+    # ──────────────────────────────────────────────────────
+    def _write_tmp(self, customers: list) -> Path:
+        tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        with open(tmp, "w") as f:
+            json.dump(customers, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        return tmp
+
+    def _write_snapshot(self, customers: list):
+        """Atomically replace customers.json with `customers` (caller holds both locks)."""
+        os.replace(self._write_tmp(customers), self.path)
+        self._stat = self._file_stat()
+
+    def _commit(self, *ops: dict):
+        """Persist mutations (caller holds both locks); returns an fsync event or None."""
+        if self.journal is None:
+            self._write_snapshot(list(self._by_id.values()))
+            return None
+        for op in ops:
+            done = self.journal.append(op)
+        if self.journal.ops_since_rotate >= JOURNAL_COMPACT_OPS and not self._compacting:
+            self._compacting = True
+            threading.Thread(target=self.compact, name="crm-journal-compactor", daemon=True).start()
+        return done
+
+    def compact(self):
+        """Fold the journal into a fresh customers.json snapshot."""
+        try:
+            with self._lock, self._xlock:
+                self._refresh()
+                base = self._stat
+                sealed = self.journal.rotate()
+                # records are never mutated in place, so a shallow copy is a
+                # consistent snapshot that can be serialized outside the locks
+                customers = list(self._by_id.values())
+            tmp = self._write_tmp(customers)
+            with self._lock, self._xlock:
+                if self._file_stat() != base:
+                    # another worker compacted meanwhile and may already have
+                    # dropped segments newer than this snapshot
+                    tmp.unlink(missing_ok=True)
+                    print("[INFO] CRM journal already compacted by another worker")
+                    return
+                os.replace(tmp, self.path)
+                self._stat = self._file_stat()
+                self.journal.discard(sealed)
+            print(f"[INFO] Compacted CRM journal into snapshot ({len(customers)} customers)")
+        finally:
+            self._compacting = False
+
+    # ──────────────────────────────────────────────────────
+    # READS
+    # ──────────────────────────────────────────────────────
+    def all(self) -> list:
+        with self._lock:
+            self._refresh()
+            return [dict(c) for c in self._by_id.values()]
+
+    def get(self, cid: int):
+        with self._lock:
+            self._refresh()
+            c = self._by_id.get(cid)
+            return dict(c) if c else None
+
+    def get_by_email(self, email: str):
+        with self._lock:
+            self._refresh()
+            cid = self._by_email.get((email or "").lower())
+            return dict(self._by_id[cid]) if cid is not None else None
+
+    def find_by_name(self, name: str) -> list:
+        """Exact (case/whitespace-insensitive) name lookup."""
+        with self._lock:
+            self._refresh()
+            return [dict(self._by_id[i]) for i in self._by_name.get(normalize_name(name), [])]
+
+    def search_name(self, query: str, limit: int = None) -> list:
+        """Case-insensitive substring match on name, best matches first."""
+        with self._lock:
+            self._refresh()
+            ids = self._name_index.search(query, limit)
+            return [dict(self._by_id[i]) for i in ids]
+
+    def page(self, after_id: int = 0, limit: int = 100, city: str = None, min_salary: int = None, max_salary: int = None) -> list:
+        """Up to `limit` customers with id > `after_id` (id order), filtered."""
+        city = city.lower() if city else None
+        out = []
+        with self._lock:
+            self._refresh()
+            start = bisect.bisect_right(self._sorted_ids, after_id)
+            for cid in self._sorted_ids[start:]:
+                c = self._by_id[cid]
+                if city and (c.get("city") or "").lower() != city:
+                    continue
+                if min_salary is not None and c.get("salary", 0) < min_salary:
+                    continue
+                if max_salary is not None and c.get("salary", 0) > max_salary:
+                    continue
+                out.append(dict(c))
+                if len(out) >= limit:
+                    break
+        return out
+
+    def get_many(self, ids) -> dict:
+        """Return {id: record} for the ids that exist."""
+        with self._lock:
+            self._refresh()
+            return {i: dict(self._by_id[i]) for i in ids if i in self._by_id}
+
+    def next_id(self) -> int:
+        """Return next unique ID. New users start from 501 minimum (reserved only under `insert`'s locks)."""
+        with self._lock:
+            self._refresh()
+            max_id = self._sorted_ids[-1] if self._sorted_ids else 0
+            return max(max_id + 1, 501)
+
+    # ──────────────────────────────────────────────────────
+    # WRITES
+    # ──────────────────────────────────────────────────────
+    def insert(self, customer: dict) -> dict:
+        """Append a new customer; raises ValueError if the email exists."""
+        with self._lock, self._xlock:
+            self._refresh()
+            email = (customer.get("email") or "").lower()
+            if email and email in self._by_email:
+                raise ValueError("Email already registered")
+            record = dict(customer)
+            if record.get("id") is None:
+                record["id"] = self.next_id()
+            self._add(record)
+            done = self._commit({"op": "signup", "customer": record})
+        # wait for the group fsync outside the locks so writers batch up
+        if done:
+            done.wait()
+        return dict(record)
+
+    def update(self, cid: int, mutate, op: str = "update") -> dict:
+        """Apply `mutate(record)` to a copy of one customer and persist the change."""
+        with self._lock, self._xlock:
+            self._refresh()
+            old = self._by_id.get(cid)
+            if old is None:
+                return None
+            new = dict(old)
+            mutate(new)
+            fields = {k: v for k, v in new.items() if old.get(k, _MISSING) != v}
+            done = None
+            if fields:
+                self._replace(old, new)
+                done = self._commit({"op": op, "id": cid, "fields": fields})
+        if done:
+            done.wait()
+        return dict(new)
+
+    def set_fields(self, updates: dict, op: str = "update") -> int:
+        """Apply `{id: {field: value}}` as one batch; returns how many records changed."""
+        ops = []
+        with self._lock, self._xlock:
+            self._refresh()
+            for cid, fields in updates.items():
+                old = self._by_id.get(cid)
+                if old is None:
+                    continue
+                diff = {k: v for k, v in fields.items() if old.get(k, _MISSING) != v}
+                if diff:
+                    self._replace(old, {**old, **diff})
+                    ops.append({"op": op, "id": cid, "fields": diff})
+            done = self._commit(*ops) if ops else None
+        if done:
+            done.wait()
+        return len(ops)
+
+
+_repository = None
+_repository_lock = threading.Lock()
+
+
+def get_customer_store():
+    """
+    Return the shared customer store for this process.
+
+    STORAGE_ENGINE=sqlite selects the transactional SQLite backend;
+    anything else keeps the JSON-file repository (journaled unless
+    CRM_JOURNAL=0).
+    """
+    global _repository
+    if _repository is None:
+        with _repository_lock:
+            if _repository is None:
+                from services.sqlite_store import storage_engine, get_database, SQLiteCustomerStore
+
+                if storage_engine() == "sqlite":
+                    _repository = SQLiteCustomerStore(get_database())
+                else:
+                    _repository = CustomerRepository(journal=CustomerJournal() if journal_enabled() else None)
+    return _repository
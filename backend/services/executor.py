@@ -0,0 +1,31 @@
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# Bounded pool for the blocking parts of a turn (RAG search, OCR, credit
+# scoring, PDF generation, session-store and prompt-cache disk I/O). LLM calls don't use it:
+# they go through the async Mistral client on the event loop.
+AGENT_WORKERS = int(os.getenv("AGENT_WORKERS", "16"))
+
+_executor = None
+
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=AGENT_WORKERS, thread_name_prefix="agent")
+    return _executor
+
+
+async def run_blocking(fn, *args, **kwargs):
+    """Run `fn(*args, **kwargs)` on the agent pool without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), functools.partial(fn, *args, **kwargs))
+
+
+def shutdown_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
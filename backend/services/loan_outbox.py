@@ -0,0 +1,219 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+
+OUTBOX_PATH = Path(__file__).resolve().parent.parent / "data" / "loan_outbox.db"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS loan_outbox (
+    id               INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id          INTEGER NOT NULL,
+    loan             TEXT NOT NULL,
+    status           TEXT NOT NULL DEFAULT 'pending',   -- pending | delivered | failed
+    attempts         INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at  REAL NOT NULL,
+    created_at       REAL NOT NULL,
+    delivered_at     REAL,
+    last_error       TEXT,
+    idempotency_key  TEXT,
+    claimed_by       TEXT,
+    claimed_at       REAL
+);
+CREATE INDEX IF NOT EXISTS ix_loan_outbox_due ON loan_outbox (status, next_attempt_at);
+"""
+
+# columns added after the first release; ALTERed into older outbox files
+_LATER_COLUMNS = {"idempotency_key": "TEXT", "claimed_by": "TEXT", "claimed_at": "REAL"}
+
+
+class LoanOutbox:
+    """
+    Durable outbox for sanctioned loans headed to the Offer Mart.
+
+    - `enqueue()` records the loan in a local SQLite file and returns
+      immediately; the sanction response never waits on the Offer Mart
+    - a background worker delivers due entries in batches, either to
+      `offer_api.add_user_loan` (default) or to a remote Offer Mart
+      (OFFER_MART_URL), retrying with exponential backoff
+    - entries that keep failing are parked as `failed` after
+      `max_attempts`, never dropped
+    - several workers may share the file: each batch is claimed in one
+      `BEGIN IMMEDIATE` transaction, and a claim older than
+      `claim_timeout` (worker died mid-batch) can be taken over
+    - every entry carries an idempotency key that the Offer Mart dedupes
+      on, so a retry after an unacknowledged delivery stores nothing new
+    """
+
+    def __init__(self, path: Path = OUTBOX_PATH, remote_url: str = None, batch_size: int = 50,
+                 poll_interval: float = 2.0, max_attempts: int = 10, max_backoff: float = 300.0,
+                 claim_timeout: float = 60.0):
+        self.path = Path(path)
+        self.remote_url = remote_url.rstrip("/") if remote_url else None
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.max_backoff = max_backoff
+        self.claim_timeout = claim_timeout
+
+        self._local = threading.local()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._http = None
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = self._conn()
+        conn.executescript(_SCHEMA)
+        existing = {row[1] for row in conn.execute("PRAGMA table_info(loan_outbox)")}
+        for column, kind in _LATER_COLUMNS.items():
+            if column not in existing:
+                conn.execute(f"ALTER TABLE loan_outbox ADD COLUMN {column} {kind}")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    # ──────────────────────────────────────────────────────
+    # PRODUCER SIDE
+    # ──────────────────────────────────────────────────────
+    def enqueue(self, user_id: int, loan: dict) -> int:
+        now = time.time()
+        cur = self._conn().execute(
+            "INSERT INTO loan_outbox (user_id, loan, idempotency_key, next_attempt_at, created_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (user_id, json.dumps(loan), uuid.uuid4().hex, now, now),
+        )
+        self._wake.set()
+        return cur.lastrowid
+
+    def stats(self) -> dict:
+        rows = self._conn().execute("SELECT status, COUNT(*) FROM loan_outbox GROUP BY status").fetchall()
+        return {"pending": 0, "delivered": 0, "failed": 0, **dict(rows)}
+
+    # ──────────────────────────────────────────────────────
+    # DELIVERY
+    # ──────────────────────────────────────────────────────
+    def _deliver(self, user_id: int, loan: dict, idempotency_key: str):
+        if self.remote_url:
+            if self._http is None:
+                import httpx
+
+                self._http = httpx.Client(base_url=self.remote_url, timeout=httpx.Timeout(5.0))
+            response = self._http.post(
+                f"/offer-mart/user/{user_id}/loans", json=loan, headers={"Idempotency-Key": idempotency_key}
+            )
+            response.raise_for_status()
+            return
+
+        from services.offer_api import add_user_loan
+
+        add_user_loan(user_id, loan, idempotency_key)
+
+    def _claim(self) -> tuple:
+        """Atomically claim up to `batch_size` due entries → (claim token, rows)."""
+        conn = self._conn()
+        token = uuid.uuid4().hex
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "UPDATE loan_outbox SET claimed_by = ?, claimed_at = ? WHERE id IN ("
+                " SELECT id FROM loan_outbox WHERE status = 'pending' AND next_attempt_at <= ?"
+                " AND (claimed_by IS NULL OR claimed_at < ?) ORDER BY id LIMIT ?)",
+                (token, now, now, now - self.claim_timeout, self.batch_size),
+            )
+            rows = conn.execute(
+                "SELECT id, user_id, loan, attempts, idempotency_key FROM loan_outbox "
+                "WHERE claimed_by = ? ORDER BY id",
+                (token,),
+            ).fetchall()
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return token, rows
+
+    def deliver_due(self) -> int:
+        """Claim and deliver one batch of due entries; returns how many were delivered."""
+        conn = self._conn()
+        token, rows = self._claim()
+
+        delivered = 0
+        for outbox_id, user_id, loan, attempts, key in rows:
+            # rows written before idempotency keys existed fall back to a per-row key
+            key = key or f"loan-outbox-{outbox_id}"
+            try:
+                self._deliver(user_id, json.loads(loan), key)
+            except Exception as e:
+                attempts += 1
+                status = "failed" if attempts >= self.max_attempts else "pending"
+                backoff = min(self.max_backoff, 2 ** attempts)
+                conn.execute(
+                    "UPDATE loan_outbox SET attempts = ?, status = ?, next_attempt_at = ?, last_error = ?, "
+                    "claimed_by = NULL, claimed_at = NULL WHERE id = ? AND claimed_by = ?",
+                    (attempts, status, time.time() + backoff, f"{type(e).__name__}: {e}", outbox_id, token),
+                )
+                print(f"[WARN] Offer Mart delivery failed for outbox #{outbox_id} (attempt {attempts}): {e}")
+                continue
+            conn.execute(
+                "UPDATE loan_outbox SET status = 'delivered', attempts = ?, delivered_at = ?, "
+                "claimed_by = NULL, claimed_at = NULL WHERE id = ? AND claimed_by = ?",
+                (attempts + 1, time.time(), outbox_id, token),
+            )
+            delivered += 1
+
+        if delivered:
+            print(f"[INFO] Delivered {delivered} sanctioned loan(s) to Offer Mart")
+        return delivered
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                # keep draining while full batches are coming back
+                while self.deliver_due() >= self.batch_size and not self._stop.is_set():
+                    pass
+            except Exception as e:
+                print(f"[ERROR] Loan outbox worker: {e}")
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="loan-outbox", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=10)
+
+
+_outbox = None
+_outbox_lock = threading.Lock()
+
+
+def get_loan_outbox() -> LoanOutbox:
+    global _outbox
+    if _outbox is None:
+        with _outbox_lock:
+            if _outbox is None:
+                _outbox = LoanOutbox(
+                    remote_url=os.getenv("OFFER_MART_URL"),
+                    batch_size=int(os.getenv("OUTBOX_BATCH_SIZE", "50")),
+                    poll_interval=float(os.getenv("OUTBOX_POLL_INTERVAL", "2")),
+                    max_attempts=int(os.getenv("OUTBOX_MAX_ATTEMPTS", "10")),
+                    claim_timeout=float(os.getenv("OUTBOX_CLAIM_TIMEOUT", "60")),
+                )
+    return _outbox
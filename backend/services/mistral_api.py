@@ -1,13 +1,35 @@
+import asyncio
+import concurrent.futures
+import email.utils
+import json
 import os
-import requests
+import random
+import threading
+import time
+from collections import deque
+
+import httpx
 from dotenv import load_dotenv
 
 load_dotenv()
 
 API_KEY = os.getenv("MISTRAL_API_KEY")
-API_URL = "https://api.mistral.ai/v1/chat/completions"
+# MISTRAL_BASE_URL points the client elsewhere, e.g. scripts/mock_mistral.py
+BASE_URL = os.getenv("MISTRAL_BASE_URL", "https://api.mistral.ai").rstrip("/")
+API_URL = f"{BASE_URL}/v1/chat/completions"
+ERROR_MESSAGE = "⚠️ Error fetching response from Mistral API."
 
-def query_mistral(prompt: str):
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# How long a reply with a local fallback waits for the LLM (0 = template only).
+LLM_BUDGET = float(os.getenv("LLM_BUDGET_MS", "800")) / 1000
+
+
+class MistralError(Exception):
+    """Upstream call failed for good (after retries / past the deadline)."""
+
+
+def _request(prompt: str, stream: bool = False):
     headers = {
         "Authorization": f"Bearer {API_KEY}",
         "Content-Type": "application/json",
@@ -18,10 +40,459 @@ def query_mistral(prompt: str):
         "max_tokens": 300,
         "temperature": 0.7,
     }
+    if stream:
+        payload["stream"] = True
+    return headers, payload
+
+
+def _retry_after(response: httpx.Response):
+    """Seconds from a Retry-After header (delta-seconds or HTTP date), or None."""
+    value = response.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class MistralClient:
+    """
+    Pooled client for the Mistral chat-completions API.
+
+    - one `httpx.AsyncClient` (keep-alive pool) on a private event-loop
+      thread, shared by sync (`complete`), async (`complete_async`) and
+      streaming (`stream`) callers
+    - connect / read timeouts per attempt, plus an overall `deadline` per
+      call (queueing + retries included) so a hung upstream can't hold a
+      worker
+    - 429 / 5xx / transport errors are retried with full-jitter exponential
+      backoff; a Retry-After header takes precedence
+    - `max_concurrency` bounds calls in flight upstream
+    - `stats()` reports call/retry/error counters, latency percentiles and
+      token usage
+    """
+
+    def __init__(self, url: str = API_URL, connect_timeout: float = 3.0, read_timeout: float = 30.0,
+                 deadline: float = 60.0, max_retries: int = 3, backoff_base: float = 0.5,
+                 max_backoff: float = 8.0, max_concurrency: int = 32, max_connections: int = 100):
+        self.url = url
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.max_backoff = max_backoff
+        self.max_concurrency = max_concurrency
+        self.counters = {
+            "calls": 0, "successes": 0, "failures": 0, "retries": 0, "timeouts": 0,
+            "rate_limited": 0, "server_errors": 0, "prompt_tokens": 0, "completion_tokens": 0,
+        }
+        self._latencies = deque(maxlen=1000)
+        self._in_flight = 0
+
+        self._timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self._max_connections = max_connections
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="mistral-client", daemon=True)
+        self._thread.start()
+        self._client, self._semaphore = asyncio.run_coroutine_threadsafe(self._setup(), self._loop).result()
+
+    async def _setup(self):
+        client = httpx.AsyncClient(
+            timeout=self._timeout,
+            limits=httpx.Limits(max_connections=self._max_connections,
+                                max_keepalive_connections=self._max_connections),
+        )
+        return client, asyncio.Semaphore(self.max_concurrency)
+
+    # ──────────────────────────────────────────────────────
+    # RUNS ON THE CLIENT LOOP
+    # ──────────────────────────────────────────────────────
+    def _backoff(self, attempt: int, response: httpx.Response = None) -> float:
+        retry_after = _retry_after(response) if response is not None else None
+        if retry_after is not None:
+            return retry_after
+        return random.uniform(0, min(self.max_backoff, self.backoff_base * 2 ** attempt))
+
+    def _record_usage(self, usage: dict):
+        if usage:
+            self.counters["prompt_tokens"] += usage.get("prompt_tokens", 0)
+            self.counters["completion_tokens"] += usage.get("completion_tokens", 0)
+
+    async def _attempts(self, send, started: float):
+        """Call `send()` until it succeeds, retrying retryable failures within the deadline."""
+        attempt = 0
+        while True:
+            response = None
+            try:
+                return await send()
+            except httpx.HTTPStatusError as e:
+                response = e.response
+                if response.status_code == 429:
+                    self.counters["rate_limited"] += 1
+                elif response.status_code >= 500:
+                    self.counters["server_errors"] += 1
+                if response.status_code not in RETRY_STATUSES:
+                    raise MistralError(f"HTTP {response.status_code}") from e
+                error = f"HTTP {response.status_code}"
+            except httpx.TimeoutException as e:
+                self.counters["timeouts"] += 1
+                error = type(e).__name__
+            except httpx.TransportError as e:
+                error = type(e).__name__
+
+            delay = self._backoff(attempt, response)
+            remaining = self.deadline - (time.monotonic() - started)
+            if attempt >= self.max_retries or delay >= remaining:
+                raise MistralError(f"{error} after {attempt + 1} attempt(s)")
+            attempt += 1
+            self.counters["retries"] += 1
+            print(f"[WARN] Mistral {error}; retry {attempt}/{self.max_retries} in {delay:.2f}s")
+            await asyncio.sleep(delay)
+
+    async def _run(self, call):
+        """Bound `call(started)` by the semaphore, the deadline and the metrics."""
+        started = time.monotonic()
+        self.counters["calls"] += 1
+        try:
+            async with asyncio.timeout(self.deadline):
+                async with self._semaphore:
+                    self._in_flight += 1
+                    try:
+                        result = await call(started)
+                    finally:
+                        self._in_flight -= 1
+        except TimeoutError:
+            self.counters["timeouts"] += 1
+            self.counters["failures"] += 1
+            raise MistralError(f"deadline of {self.deadline}s exceeded")
+        except BaseException:
+            self.counters["failures"] += 1
+            raise
+        self.counters["successes"] += 1
+        self._latencies.append(time.monotonic() - started)
+        return result
+
+    async def _complete(self, prompt: str) -> str:
+        headers, payload = _request(prompt)
+
+        async def send():
+            response = await self._client.post(self.url, headers=headers, json=payload)
+            response.raise_for_status()
+            return response.json()
+
+        async def call(started):
+            body = await self._attempts(send, started)
+            self._record_usage(body.get("usage"))
+            return body["choices"][0]["message"]["content"]
+
+        return await self._run(call)
+
+    async def _stream(self, prompt: str, push):
+        """Stream deltas into `push(chunk)`; retries only before the first token."""
+        headers, payload = _request(prompt, stream=True)
+        sent = False
+
+        async def send():
+            nonlocal sent
+            try:
+                async with self._client.stream("POST", self.url, headers=headers, json=payload) as response:
+                    if response.status_code >= 400:
+                        await response.aread()
+                        response.raise_for_status()
+                    async for line in response.aiter_lines():
+                        if not line.startswith("data:"):
+                            continue
+                        data = line[5:].strip()
+                        if data == "[DONE]":
+                            break
+                        chunk = json.loads(data)
+                        self._record_usage(chunk.get("usage"))
+                        delta = chunk["choices"][0]["delta"].get("content")
+                        if delta:
+                            sent = True
+                            push(delta)
+            except httpx.HTTPError as e:
+                if sent:
+                    # a retry would repeat tokens the caller already has
+                    raise MistralError(f"stream interrupted: {type(e).__name__}") from e
+                raise
+
+        await self._run(lambda started: self._attempts(send, started))
+
+    # ──────────────────────────────────────────────────────
+    # PUBLIC API
+    # ──────────────────────────────────────────────────────
+    def complete(self, prompt: str) -> str:
+        """Blocking completion, safe to call from any worker thread."""
+        return asyncio.run_coroutine_threadsafe(self._complete(prompt), self._loop).result()
+
+    async def complete_async(self, prompt: str) -> str:
+        """Awaitable completion from another event loop (e.g. FastAPI's)."""
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(self._complete(prompt), self._loop))
+
+    async def stream(self, prompt: str):
+        """Async iterator over completion deltas, for the caller's event loop."""
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        done = object()
+
+        def push(item):
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+
+        async def produce():
+            try:
+                await self._stream(prompt, push)
+            finally:
+                push(done)
+
+        future = asyncio.run_coroutine_threadsafe(produce(), self._loop)
+        try:
+            while True:
+                item = await queue.get()
+                if item is done:
+                    break
+                yield item
+            future.result()   # surface MistralError / other failures
+        finally:
+            if not future.done():
+                future.cancel()
+
+    def submit(self, coro):
+        """Schedule `coro` on the client loop; returns a concurrent.futures.Future."""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def stats(self) -> dict:
+        latencies = sorted(self._latencies)
+
+        def pct(p):
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000, 1) if latencies else None
+
+        return {
+            **self.counters,
+            "in_flight": self._in_flight,
+            "max_concurrency": self.max_concurrency,
+            "latency_ms": {"p50": pct(0.5), "p95": pct(0.95), "p99": pct(0.99), "samples": len(latencies)},
+        }
+
+    def close(self):
+        asyncio.run_coroutine_threadsafe(self._client.aclose(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+_client = None
+_client_lock = threading.Lock()
+
 
-    response = requests.post(API_URL, headers=headers, json=payload)
+def get_mistral_client() -> MistralClient:
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = MistralClient(
+                    connect_timeout=float(os.getenv("MISTRAL_CONNECT_TIMEOUT", "3")),
+                    read_timeout=float(os.getenv("MISTRAL_TIMEOUT", "30")),
+                    deadline=float(os.getenv("MISTRAL_DEADLINE", "60")),
+                    max_retries=int(os.getenv("MISTRAL_MAX_RETRIES", "3")),
+                    max_concurrency=int(os.getenv("MISTRAL_MAX_CONCURRENCY", "32")),
+                    max_connections=int(os.getenv("MISTRAL_MAX_CONNECTIONS", "100")),
+                )
+    return _client
+
+
+def close_mistral_client():
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+
+
+# ──────────────────────────────────────────────────────
+# PROMPT CACHE
+# ──────────────────────────────────────────────────────
+_cache = None
+_cache_loaded = False
+
+
+def get_prompt_cache():
+    """Shared PromptCache (None when PROMPT_CACHE=0)."""
+    global _cache, _cache_loaded
+    if not _cache_loaded:
+        with _client_lock:
+            if not _cache_loaded:
+                from services.prompt_cache import prompt_cache_from_env
+
+                _cache = prompt_cache_from_env()
+                _cache_loaded = True
+    return _cache
+
+
+def _cache_key(prompt: str) -> str:
+    from services.prompt_cache import prompt_key
+
+    _, payload = _request(prompt)
+    return prompt_key(prompt, {k: v for k, v in payload.items() if k != "messages"})
+
+
+def _lookup(prompt: str):
+    """(cache, key, cached text or None); cache is None when disabled."""
+    cache = get_prompt_cache()
+    if cache is None:
+        return None, None, None
+    key = _cache_key(prompt)
+    return cache, key, cache.get(key)
+
+
+async def _lookup_async(prompt: str):
+    """`_lookup` that keeps the prompt cache's disk tier off the event loop."""
+    cache = get_prompt_cache()
+    if cache is None:
+        return None, None, None
+    key = _cache_key(prompt)
+    return cache, key, await cache.get_async(key)
+
+
+# ──────────────────────────────────────────────────────
+# AGENT-FACING HELPERS (cache first, fall back to ERROR_MESSAGE)
+# ──────────────────────────────────────────────────────
+def query_mistral(prompt: str):
+    cache, key, hit = _lookup(prompt)
+    if hit is not None:
+        return hit
     try:
-        return response.json()["choices"][0]["message"]["content"]
+        text = get_mistral_client().complete(prompt)
     except Exception as e:
-        print("Error from Mistral:", e, response.text)
-        return "⚠️ Error fetching response from Mistral API."
+        print(f"[ERROR] Mistral call failed: {type(e).__name__}: {e}")
+        return ERROR_MESSAGE
+    if cache:
+        cache.set(key, text)
+    return text
+
+
+async def query_mistral_async(prompt: str):
+    """Same contract as `query_mistral`, but never blocks the event loop."""
+    cache, key, hit = await _lookup_async(prompt)
+    if hit is not None:
+        return hit
+    try:
+        text = await get_mistral_client().complete_async(prompt)
+    except Exception as e:
+        print(f"[ERROR] Mistral call failed: {type(e).__name__}: {e}")
+        return ERROR_MESSAGE
+    if cache:
+        await cache.set_async(key, text)
+    return text
+
+
+async def stream_mistral(prompt: str):
+    """
+    Async iterator over the completion's text deltas as Mistral produces
+    them (`stream: true`, server-sent events). A cached completion comes
+    back as one chunk. Yields the usual error message if the call fails
+    before any token arrived.
+    """
+    cache, key, hit = await _lookup_async(prompt)
+    if hit is not None:
+        yield hit
+        return
+
+    parts = []
+    try:
+        async for delta in get_mistral_client().stream(prompt):
+            parts.append(delta)
+            yield delta
+    except Exception as e:
+        print(f"[ERROR] Mistral stream failed: {type(e).__name__}: {e}")
+        if not parts:
+            yield ERROR_MESSAGE
+        return
+    if cache and parts:
+        await cache.set_async(key, "".join(parts))
+
+
+# ──────────────────────────────────────────────────────
+# LATENCY-BUDGETED HELPERS (LLM text if it's in time, else the fallback)
+# ──────────────────────────────────────────────────────
+budget_counters = {"llm": 0, "fallback_timeout": 0, "fallback_error": 0, "template_only": 0}
+
+
+def _budget_outcome(text, fallback):
+    if text is None:
+        budget_counters["fallback_timeout"] += 1
+        return fallback
+    if text == ERROR_MESSAGE:
+        budget_counters["fallback_error"] += 1
+        return fallback
+    budget_counters["llm"] += 1
+    return text
+
+
+def query_mistral_within(prompt: str, fallback: str, budget: float = None):
+    """
+    Blocking `query_mistral` bounded by `budget` seconds (LLM_BUDGET by
+    default). A late call keeps running on the client loop so its answer
+    still lands in the prompt cache for the next identical prompt.
+    """
+    budget = LLM_BUDGET if budget is None else budget
+    if budget <= 0:
+        budget_counters["template_only"] += 1
+        return fallback
+    future = get_mistral_client().submit(query_mistral_async(prompt))
+    try:
+        text = future.result(timeout=budget)
+    except concurrent.futures.TimeoutError:
+        text = None
+    return _budget_outcome(text, fallback)
+
+
+async def query_mistral_within_async(prompt: str, fallback: str, budget: float = None):
+    """Awaitable `query_mistral_within`."""
+    budget = LLM_BUDGET if budget is None else budget
+    if budget <= 0:
+        budget_counters["template_only"] += 1
+        return fallback
+    future = asyncio.wrap_future(get_mistral_client().submit(query_mistral_async(prompt)))
+    try:
+        text = await asyncio.wait_for(asyncio.shield(future), budget)
+    except asyncio.TimeoutError:
+        text = None
+    return _budget_outcome(text, fallback)
+
+
+async def stream_mistral_within(prompt: str, fallback: str, budget: float = None):
+    """
+    `stream_mistral` whose first token must arrive within `budget`; otherwise
+    (or on error) the fallback is yielded as a single chunk and a background
+    completion warms the prompt cache.
+    """
+    budget = LLM_BUDGET if budget is None else budget
+    if budget <= 0:
+        budget_counters["template_only"] += 1
+        yield fallback
+        return
+
+    stream = stream_mistral(prompt)
+    try:
+        first = await asyncio.wait_for(anext(stream), budget)
+    except asyncio.TimeoutError:
+        first = None
+        get_mistral_client().submit(query_mistral_async(prompt))
+    except StopAsyncIteration:
+        first = None
+    if first is None or first == ERROR_MESSAGE:
+        await stream.aclose()
+        yield _budget_outcome(first, fallback)
+        return
+
+    budget_counters["llm"] += 1
+    yield first
+    async for delta in stream:
+        yield delta
+
+
+def budget_stats() -> dict:
+    return {"budget_ms": LLM_BUDGET * 1000, **budget_counters}
@@ -0,0 +1,129 @@
+import bisect
+import heapq
+import re
+import threading
+
+def normalize_name(name: str) -> str:
+    """Lower-case a name and collapse internal whitespace for index keys."""
+    return re.sub(r"\s+", " ", (name or "").strip()).lower()
+
+
+def _trigrams(text: str) -> set:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _short_grams(text: str) -> set:
+    """Every 1- and 2-character substring, for queries too short to carry a trigram."""
+    return set(text) | {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+def _rank(q: str, name: str, cid: int) -> tuple:
+    """Sort key: exact → prefix → word prefix → substring, then shorter names, then id."""
+    if name == q:
+        tier = 0
+    elif name.startswith(q):
+        tier = 1
+    elif (" " + q) in name:
+        tier = 2
+    else:
+        tier = 3
+    return (tier, len(name), cid)
+
+
+class TrigramNameIndex:
+    """
+    Inverted trigram index over customer names.
+
+    - `search()` answers case-insensitive substring queries by intersecting
+      the posting sets of the query's trigrams (smallest first) and then
+      verifying the few surviving candidates
+    - 1–2 character queries are answered from a separate 1/2-gram bucket
+      whose ranking is computed on first use and then kept sorted in
+      place by `add()` / `remove()`, so a limited query is a slice
+    - results are ranked: exact match → prefix → word prefix → substring,
+      then shorter names first, then by id
+    - `add()` / `remove()` update the index in place
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._names = {}     # id → normalized name
+        self._postings = {}  # trigram → set(ids)
+        self._short = {}     # 1/2-gram → set(ids)
+        self._ranked = {}    # 1/2-gram → sorted rank keys of its bucket (built on first query)
+
+    def __len__(self):
+        return len(self._names)
+
+    def clear(self):
+        with self._lock:
+            self._names = {}
+            self._postings = {}
+            self._short = {}
+            self._ranked = {}
+
+    def add(self, cid: int, name: str):
+        with self._lock:
+            if cid in self._names:
+                self.remove(cid)
+            norm = normalize_name(name)
+            self._names[cid] = norm
+            for g in _trigrams(norm):
+                self._postings.setdefault(g, set()).add(cid)
+            for g in _short_grams(norm):
+                self._short.setdefault(g, set()).add(cid)
+                ranked = self._ranked.get(g)
+                if ranked is not None:
+                    bisect.insort(ranked, _rank(g, norm, cid))
+
+    def remove(self, cid: int):
+        with self._lock:
+            norm = self._names.pop(cid, None)
+            if norm is None:
+                return
+            for g in _short_grams(norm):
+                ranked = self._ranked.get(g)
+                if ranked is not None:
+                    key = _rank(g, norm, cid)
+                    pos = bisect.bisect_left(ranked, key)
+                    if pos < len(ranked) and ranked[pos] == key:
+                        del ranked[pos]
+            for postings, grams in ((self._postings, _trigrams(norm)), (self._short, _short_grams(norm))):
+                for g in grams:
+                    ids = postings.get(g)
+                    if ids is not None:
+                        ids.discard(cid)
+                        if not ids:
+                            del postings[g]
+
+    def _rank(self, q: str, cid: int):
+        return _rank(q, self._names[cid], cid)
+
+    def search(self, query: str, limit: int = None) -> list:
+        """Return ids of names containing `query`, best matches first."""
+        q = normalize_name(query)
+        with self._lock:
+            grams = _trigrams(q)
+            if not grams and q:
+                # 1–2 character queries carry no trigram; their bucket is exact
+                ranked = self._ranked.get(q)
+                if ranked is None:
+                    ranked = self._ranked[q] = sorted(self._rank(q, i) for i in self._short.get(q, ()))
+                return [i for _, _, i in (ranked[:limit] if limit is not None else ranked)]
+
+            if grams:
+                postings = []
+                for g in grams:
+                    ids = self._postings.get(g)
+                    if not ids:
+                        return []
+                    postings.append(ids)
+                postings.sort(key=len)
+                candidates = postings[0].intersection(*postings[1:])
+            else:
+                candidates = self._names
+
+            hits = [i for i in candidates if q in self._names[i]]
+            if limit is not None:
+                return [i for _, _, i in heapq.nsmallest(limit, (self._rank(q, i) for i in hits))]
+            return [i for _, _, i in sorted(self._rank(q, i) for i in hits)]
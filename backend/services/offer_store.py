@@ -0,0 +1,157 @@
+import json
+import os
+import threading
+from pathlib import Path
+
+from services.file_lock import FileLock
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+DATA_DIR = BASE_DIR / "data"
+OFFERS_FILE = DATA_DIR / "offers.json"
+
+
+def _loan_seq(loan_id) -> int:
+    """Parse the numeric suffix of a `<user>_<n>` loan id (0 if absent)."""
+    try:
+        return int(str(loan_id).rsplit("_", 1)[1])
+    except (IndexError, ValueError):
+        return 0
+
+
+class JsonOfferStore:
+    """
+    In-memory, per-user index over `offers.json`.
+
+    - `get_user_loans` is a dict lookup by user id; reads never write
+    - the file is re-read only when its mtime/size changes
+    - loan ids come from a per-user counter (`next_loan_seq`) that is
+      persisted with the user, so ids are never reused
+    - an optional idempotency key per add is remembered with the user
+      (key → loan id, outside the loan itself), so a retried add returns
+      the loan stored the first time
+    - writes hold a cross-process lock file next to `offers.json`, re-read
+      the file if another worker changed it, and replace it atomically, so
+      several workers can share it. Each add still rewrites the whole file;
+      large books belong in the SQLite store (STORAGE_ENGINE=sqlite)
+    """
+
+    def __init__(self, path: Path = OFFERS_FILE):
+        self.path = Path(path)
+        self._lock = threading.RLock()
+        self._xlock = FileLock(self.path.with_name(self.path.name + ".lock"))
+        self._stat = None
+        self._loaded = False
+        self._users = {}   # user id → {"id", "loans", "next_loan_seq"}
+
+    def _file_stat(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _refresh(self):
+        stat = self._file_stat()
+        if self._loaded and stat == self._stat:
+            return
+        offers = []
+        if stat is not None:
+            with open(self.path, "r") as f:
+                offers = json.load(f)
+        users = {}
+        for user in offers:
+            # legacy `Loans` key is tolerated in memory; scripts/migrate_offers.py fixes the file
+            loans = user.get("loans", user.get("Loans", []))
+            seq = max((_loan_seq(l.get("id")) for l in loans), default=0) + 1
+            users[user["id"]] = {
+                "id": user["id"],
+                "loans": loans,
+                "next_loan_seq": max(user.get("next_loan_seq", 0), seq),
+                "idempotency_keys": user.get("idempotency_keys", {}),
+            }
+        self._users = users
+        self._stat = stat
+        self._loaded = True
+
+    def _flush(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(list(self._users.values()), f, indent=2)
+        os.replace(tmp, self.path)
+        self._stat = self._file_stat()
+
+    def get_user_loans(self, user_id: int) -> list:
+        with self._lock:
+            self._refresh()
+            user = self._users.get(user_id)
+            return [dict(l) for l in user["loans"]] if user else []
+
+    def add_user_loan(self, user_id: int, loan: dict, idempotency_key: str = None) -> dict:
+        loan = dict(loan)
+        with self._lock, self._xlock:
+            self._refresh()
+            user = self._users.get(user_id)
+            if user is None:
+                user = self._users[user_id] = {"id": user_id, "loans": [], "next_loan_seq": 1, "idempotency_keys": {}}
+            if idempotency_key in user["idempotency_keys"]:
+                loan_id = user["idempotency_keys"][idempotency_key]
+                existing = next((l for l in user["loans"] if l.get("id") == loan_id), None)
+                if existing is not None:
+                    return dict(existing)
+            loan["id"] = f"{user_id}_{user['next_loan_seq']}"
+            user["next_loan_seq"] += 1
+            user["loans"].append(loan)
+            if idempotency_key:
+                user["idempotency_keys"][idempotency_key] = loan["id"]
+            self._flush()
+        return dict(loan)
+
+
+def migrate_legacy_loans(path: Path = OFFERS_FILE) -> int:
+    """
+    One-off rewrite of offers.json: `Loans` → `loans`, ids for id-less
+    loans, and a persisted `next_loan_seq` per user. Returns users changed.
+    """
+    with open(path, "r") as f:
+        offers = json.load(f)
+
+    changed = 0
+    for user in offers:
+        before = json.dumps(user, sort_keys=True)
+        if "Loans" in user:
+            user["loans"] = user.get("loans", []) + user.pop("Loans")
+        loans = user.setdefault("loans", [])
+        seq = max((_loan_seq(l.get("id")) for l in loans), default=0) + 1
+        for loan in loans:
+            if not loan.get("id"):
+                loan["id"] = f"{user['id']}_{seq}"
+                seq += 1
+        user["next_loan_seq"] = max(user.get("next_loan_seq", 0), seq)
+        if json.dumps(user, sort_keys=True) != before:
+            changed += 1
+
+    tmp = Path(path).with_name(Path(path).name + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(offers, f, indent=2)
+    os.replace(tmp, path)
+    return changed
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_offer_store():
+    """JSON per-user index by default; SQLite when STORAGE_ENGINE=sqlite."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                from services.sqlite_store import storage_engine, get_database, SQLiteOfferStore
+
+                if storage_engine() == "sqlite":
+                    _store = SQLiteOfferStore(get_database())
+                else:
+                    _store = JsonOfferStore()
+    return _store
@@ -0,0 +1,156 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from services.cache import LRUCache
+from services.executor import run_blocking
+
+PROMPT_CACHE_PATH = Path(__file__).resolve().parent.parent / "data" / "prompt_cache.db"
+
+_MISSING = object()
+
+
+def prompt_key(prompt: str, params: dict) -> str:
+    """
+    sha256 over the whitespace-normalized prompt plus the model parameters,
+    so re-indented f-strings share an entry but a model/temperature change
+    does not.
+    """
+    normalized = re.sub(r"\s+", " ", prompt).strip()
+    blob = json.dumps({"prompt": normalized, "params": params}, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class PromptCache:
+    """
+    Two-tier cache for LLM completions.
+
+    - memory tier: `LRUCache` (bounded, TTL)
+    - optional disk tier: a SQLite file shared by workers and restarts;
+      disk hits are promoted into memory
+    - `stats()` reports per-tier hits and the overall hit rate
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 86400, path: Path = None):
+        self.ttl = ttl
+        self.memory = LRUCache(maxsize=maxsize, ttl=ttl)
+        self.path = Path(path) if path else None
+        self.counters = {"hits": 0, "memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        if self.path:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn().execute(
+                "CREATE TABLE IF NOT EXISTS prompt_cache ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+            )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, *names):
+        with self._lock:
+            for name in names:
+                self.counters[name] += 1
+
+    def _memory_get(self, key: str):
+        value = self.memory.get(key, _MISSING)
+        if value is not _MISSING:
+            self._count("hits", "memory_hits")
+        return value
+
+    def _disk_get(self, key: str):
+        """Disk-tier lookup (blocking); a hit is promoted into memory."""
+        if self.path:
+            row = self._conn().execute(
+                "SELECT value, expires_at FROM prompt_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row and (row[1] is None or row[1] > time.time()):
+                remaining = row[1] - time.time() if row[1] is not None else None
+                self.memory.set(key, row[0], ttl=remaining)
+                self._count("hits", "disk_hits")
+                return row[0]
+        self._count("misses")
+        return None
+
+    def _disk_put(self, key: str, value: str):
+        if self.path:
+            expires_at = time.time() + self.ttl if self.ttl is not None else None
+            self._conn().execute(
+                "INSERT OR REPLACE INTO prompt_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, expires_at),
+            )
+        self._count("stores")
+
+    def get(self, key: str):
+        value = self._memory_get(key)
+        return self._disk_get(key) if value is _MISSING else value
+
+    def set(self, key: str, value: str):
+        self.memory.set(key, value)
+        self._disk_put(key, value)
+
+    async def get_async(self, key: str):
+        """`get` for the event loop: memory hits stay inline, the disk tier runs on the agent pool."""
+        value = self._memory_get(key)
+        if value is not _MISSING:
+            return value
+        if not self.path:
+            self._count("misses")
+            return None
+        return await run_blocking(self._disk_get, key)
+
+    async def set_async(self, key: str, value: str):
+        self.memory.set(key, value)
+        if not self.path:
+            self._count("stores")
+            return
+        await run_blocking(self._disk_put, key, value)
+
+    def purge(self) -> int:
+        """Drop expired rows from the disk tier."""
+        if not self.path:
+            return 0
+        cur = self._conn().execute("DELETE FROM prompt_cache WHERE expires_at < ?", (time.time(),))
+        return cur.rowcount
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self.counters)
+        lookups = counters["hits"] + counters["misses"]
+        return {
+            **counters,
+            "hit_rate": round(counters["hits"] / lookups, 4) if lookups else 0.0,
+            "memory": self.memory.stats(),
+            "disk": str(self.path) if self.path else None,
+        }
+
+
+def prompt_cache_from_env():
+    """
+    PROMPT_CACHE=0 disables caching. PROMPT_CACHE_SIZE / PROMPT_CACHE_TTL
+    size the memory tier; PROMPT_CACHE_DISK=1 adds the SQLite tier
+    (PROMPT_CACHE_PATH overrides its file).
+    """
+    if os.getenv("PROMPT_CACHE", "1").strip().lower() in ("0", "false", "no", "off"):
+        return None
+    disk = os.getenv("PROMPT_CACHE_DISK", "0").strip().lower() not in ("0", "false", "no", "off")
+    cache = PromptCache(
+        maxsize=int(os.getenv("PROMPT_CACHE_SIZE", "1024")),
+        ttl=float(os.getenv("PROMPT_CACHE_TTL", "86400")),
+        path=Path(os.getenv("PROMPT_CACHE_PATH", str(PROMPT_CACHE_PATH))) if disk else None,
+    )
+    if cache.path:
+        cache.purge()
+    return cache
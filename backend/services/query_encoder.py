@@ -0,0 +1,145 @@
+import os
+import queue
+import re
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+from services.cache import LRUCache
+
+
+class QueryEncoder:
+    """
+    Micro-batching front end for query embeddings.
+
+    - concurrent `encode()` callers are collected for up to `max_wait_ms`
+      (or `max_batch` queries) and embedded in one `encode_batch` call on a
+      single worker thread
+    - recent query embeddings are kept in an `LRUCache` keyed by the
+      whitespace/case-normalized query; duplicates inside a batch are
+      embedded once
+    - `stats()` reports batch sizes, encode time and cache hits
+    """
+
+    def __init__(self, encode_batch, max_batch: int = 32, max_wait_ms: float = 5.0,
+                 cache_size: int = 4096):
+        self.encode_batch = encode_batch
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.cache = LRUCache(maxsize=cache_size) if cache_size > 0 else None
+        self._queue = queue.Queue()
+        self._worker = None
+        self._start_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self.counters = {"queries": 0, "batches": 0, "batched_queries": 0, "max_batch": 0,
+                         "encode_ms": 0.0, "errors": 0}
+        self._batch_sizes = {}
+
+    @staticmethod
+    def _key(query: str) -> str:
+        return re.sub(r"\s+", " ", query).strip().lower()
+
+    def _ensure_worker(self):
+        if self._worker is None:
+            with self._start_lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self._run, name="query-encoder", daemon=True)
+                    self._worker.start()
+
+    def encode(self, query: str, timeout: float = None) -> np.ndarray:
+        """One query → a (1, dim) float32 embedding."""
+        with self._lock:
+            self.counters["queries"] += 1
+        key = self._key(query)
+        if self.cache is not None:
+            vector = self.cache.get(key)
+            if vector is not None:
+                return vector
+        future = Future()
+        self._ensure_worker()
+        self._queue.put((key, query, future))
+        return future.result(timeout=timeout)
+
+    # ──────────────────────────────────────────────────────
+    # WORKER
+    # ──────────────────────────────────────────────────────
+    def _collect(self) -> list:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            # one forward pass per distinct query
+            unique = {}
+            for key, query, _ in batch:
+                unique.setdefault(key, query)
+            started = time.perf_counter()
+            try:
+                vectors = np.ascontiguousarray(self.encode_batch(list(unique.values())), dtype="float32")
+            except Exception as e:
+                print(f"[ERROR] Query encoding failed for a batch of {len(unique)}: {e}")
+                with self._lock:
+                    self.counters["errors"] += 1
+                for _, _, future in batch:
+                    future.set_exception(e)
+                continue
+            elapsed = time.perf_counter() - started
+
+            by_key = {}
+            for key, vector in zip(unique, vectors):
+                vector = vector.reshape(1, -1)
+                vector.setflags(write=False)   # shared by every caller and the cache
+                by_key[key] = vector
+                if self.cache is not None:
+                    self.cache.set(key, vector)
+            for key, _, future in batch:
+                future.set_result(by_key[key])
+            self._record(len(unique), elapsed)
+
+    def _record(self, size: int, elapsed: float):
+        with self._lock:
+            self.counters["batches"] += 1
+            self.counters["batched_queries"] += size
+            self.counters["max_batch"] = max(self.counters["max_batch"], size)
+            self.counters["encode_ms"] += elapsed * 1000
+            self._batch_sizes[size] = self._batch_sizes.get(size, 0) + 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self.counters)
+            sizes = dict(sorted(self._batch_sizes.items()))
+        batches = counters["batches"]
+        return {
+            **counters,
+            "encode_ms": round(counters["encode_ms"], 3),
+            "avg_batch": round(counters["batched_queries"] / batches, 2) if batches else 0.0,
+            "avg_encode_ms": round(counters["encode_ms"] / batches, 3) if batches else 0.0,
+            "batch_sizes": sizes,
+            "max_wait_ms": self.max_wait * 1000,
+            "cache": self.cache.stats() if self.cache is not None else None,
+        }
+
+
+def query_encoder_from_env(encode_batch) -> QueryEncoder:
+    """
+    RAG_BATCH_SIZE / RAG_BATCH_WAIT_MS shape the micro-batches;
+    RAG_QUERY_CACHE_SIZE=0 disables the query-embedding LRU.
+    """
+    return QueryEncoder(
+        encode_batch,
+        max_batch=int(os.getenv("RAG_BATCH_SIZE", "32")),
+        max_wait_ms=float(os.getenv("RAG_BATCH_WAIT_MS", "5")),
+        cache_size=int(os.getenv("RAG_QUERY_CACHE_SIZE", "4096")),
+    )
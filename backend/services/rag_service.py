@@ -1,61 +1,384 @@
+import hashlib
 import json
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+
 import numpy as np
 import faiss
-from sentence_transformers import SentenceTransformer
+
+from services.file_lock import FileLock
+from services.query_encoder import query_encoder_from_env
+from services.vector_index import (apply_search_params, build_index, code_size, describe, index_spec_from_env,
+                                   rebuild_index, supports_remove)
+
+MODEL_NAME = os.getenv("RAG_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+INDEX_DIR = Path(os.getenv("RAG_INDEX_DIR", Path(__file__).resolve().parent.parent / "data" / "rag_index"))
+# Minimum seconds between re-persisting an incrementally updated index.
+PERSIST_INTERVAL = float(os.getenv("RAG_PERSIST_INTERVAL", "60"))
+# Pending HNSW updates (see `_delta`) before the update thread rebuilds the index.
+DELTA_MAX = int(os.getenv("RAG_DELTA_MAX", "1000"))
+
+# Bump when chunk text or the on-disk layout changes.
+INDEX_FORMAT = 3
+
+# Policy facts live above every customer id in the ID-mapped index.
+POLICY_ID_BASE = 1 << 62
+POLICY_CHUNKS = [
+    "Credit score above 700 qualifies for instant approval.",
+    "Loans above 2× pre-approved limit require salary slip verification.",
+    "KYC must include phone, address, and PAN verification."
+]
+
+
+def customer_chunk(name, info: dict) -> str:
+    """Chunk text from the CRM record's own fields, so CRM writes change it."""
+    city = info.get("city", "Unknown")
+    pre_limit = info.get("preapproved_limit", "N/A")
+    loans = info.get("existing_loans", 0)
+    score = info.get("credit_score", "N/A")
+    return (
+        f"Customer {name} from {city} has a pre-approved limit of ₹{pre_limit}, "
+        f"{loans} existing loan(s) and a credit score of {score}."
+    )
+
 
 class RAGService:
-    def __init__(self, data_path: str):
-        self.model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
+    """
+    Customer/policy retrieval over an ID-mapped FAISS index (customer
+    id → chunk); flat, HNSW or IVF per `RAG_INDEX`, storing float32 or
+    quantized codes per `RAG_INDEX_CODEC` (services.vector_index).
+
+    - the index is persisted under `index_dir`, keyed by a hash of the
+      (id, chunk) pairs + model + index options; an unchanged customer
+      base loads it without encoding. Saving drops only older entries
+      built with the same model and index options, under a lock file, so
+      workers configured differently keep their own
+    - the SentenceTransformer is loaded lazily: only a rebuild, an update
+      or the first `retrieve()` pays for it
+    - `upsert_customer` / `remove_customer` change one chunk in place (one
+      embedding, no rebuild); `on_customer_change` feeds them from the CRM
+      write path on a background thread. HNSW cannot remove vectors, so
+      there updates land in a small exact `_delta` index and shadow the
+      stale entry; only that thread folds them in with a rebuild, once
+      `RAG_DELTA_MAX` accumulate. `persist()` never rebuilds: it saves
+      the delta and shadowed ids next to the main index
+    - `retrieve()` embeds queries through a micro-batching `QueryEncoder`
+      with an LRU of recent query embeddings
+    """
+
+    def __init__(self, data_path: str = None, model_name: str = MODEL_NAME, index_dir: Path = INDEX_DIR,
+                 records: list = None, index_spec: dict = None):
+        self.model_name = model_name
+        self.index_dir = Path(index_dir)
+        self.spec = index_spec or index_spec_from_env()
+        self._model = None
+        self._model_lock = threading.Lock()
+        self._lock = threading.Lock()        # guards index + chunks for search / swap
+        self._write_lock = threading.Lock()  # serializes mutations, rebuilds and persist
         self.index = None
-        self.text_chunks = []
-        self.load_data(data_path)
+        self._delta = None                   # HNSW only: exact index of updated vectors
+        self._shadowed = set()               # HNSW only: ids whose main-index vector is stale
+        self.chunks = {}                     # faiss id → chunk text
+        self._dirty = False
+        self._persisted_at = time.monotonic()
+        self._updates = None
+        self.encoder = query_encoder_from_env(self._encode)
+        if records is not None:
+            self.load_records(records)
+        elif data_path is not None:
+            self.load_data(data_path)
 
-    def load_data(self, path: str):
-        with open(path, "r") as f:
-            data = json.load(f)
+    @property
+    def model(self):
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    from sentence_transformers import SentenceTransformer
+
+                    self._model = SentenceTransformer(self.model_name)
+        return self._model
+
+    @property
+    def text_chunks(self) -> list:
+        return list(self.chunks.values())
 
-        chunks = []
+    def _encode(self, texts: list) -> np.ndarray:
+        return np.ascontiguousarray(self.model.encode(texts), dtype="float32")
+
+    # ──────────────────────────────────────────────────────
+    # CHUNKS
+    # ──────────────────────────────────────────────────────
+    def _build_chunks(self, data) -> dict:
+        chunks = {}
 
         # ✅ Support both list and dict formats
         if isinstance(data, list):
             # List of customer records
-            for customer in data:
-                name = customer.get("name", "Unknown")
-                city = customer.get("city", "Unknown")
-                pre_limit = customer.get("pre_approved_limit", "N/A")
-                requested = customer.get("requested_loan", "N/A")
-                chunks.append(
-                    f"Customer {name} from {city} has a pre-approved limit of ₹{pre_limit} "
-                    f"and requested a loan of ₹{requested}."
-                )
+            for pos, customer in enumerate(data, start=1):
+                chunks[int(customer.get("id") or pos)] = customer_chunk(customer.get("name", "Unknown"), customer)
 
         elif isinstance(data, dict):
             # Dictionary of name → details
-            for name, info in data.items():
-                city = info.get("city", "Unknown")
-                pre_limit = info.get("pre_approved_limit", "N/A")
-                requested = info.get("requested_loan", "N/A")
-                chunks.append(
-                    f"Customer {name} from {city} has a pre-approved limit of ₹{pre_limit} "
-                    f"and requested a loan of ₹{requested}."
-                )
+            for pos, (name, info) in enumerate(data.items(), start=1):
+                chunks[pos] = customer_chunk(name, info)
 
         # Add business/policy facts
-        chunks += [
-            "Credit score above 700 qualifies for instant approval.",
-            "Loans above 2× pre-approved limit require salary slip verification.",
-            "KYC must include phone, address, and PAN verification."
-        ]
+        for i, fact in enumerate(POLICY_CHUNKS):
+            chunks[POLICY_ID_BASE + i] = fact
+        return chunks
+
+    def _content_key(self) -> str:
+        digest = hashlib.sha256()
+        digest.update(f"{INDEX_FORMAT}\0{self.model_name}\0{describe(self.spec)}\0".encode("utf-8"))
+        for cid in sorted(self.chunks):
+            digest.update(f"{cid}\0{self.chunks[cid]}\0".encode("utf-8"))
+        return digest.hexdigest()[:32]
+
+    # ──────────────────────────────────────────────────────
+    # PERSISTED INDEX
+    # ──────────────────────────────────────────────────────
+    def _paths(self, key: str):
+        return (
+            self.index_dir / f"{key}.faiss",
+            self.index_dir / f"{key}.delta.faiss",
+            self.index_dir / f"{key}.json",
+        )
+
+    def _load_cached(self, key: str) -> bool:
+        index_path, delta_path, meta_path = self._paths(key)
+        count = len(self.chunks)
+        try:
+            with open(meta_path, "r") as f:
+                meta = json.load(f)
+            if meta.get("count") != count or meta.get("model") != self.model_name:
+                return False
+            # read into memory: the index takes incremental updates
+            index = faiss.read_index(str(index_path))
+            shadowed = set(meta.get("shadowed", ()))
+            delta = faiss.read_index(str(delta_path)) if shadowed else None
+        except (FileNotFoundError, ValueError, RuntimeError, json.JSONDecodeError) as e:
+            if not isinstance(e, FileNotFoundError):
+                print(f"[WARN] Ignoring unreadable RAG index {key}: {e}")
+            return False
+        if delta is None:
+            if index.ntotal != count:
+                return False
+        else:
+            live = set(faiss.vector_to_array(index.id_map).tolist()) - shadowed
+            live.update(faiss.vector_to_array(delta.id_map).tolist())
+            if live != set(self.chunks):
+                return False
+        apply_search_params(index, self.spec)
+        self.index, self._delta, self._shadowed = index, delta, shadowed
+        return True
 
-        self.text_chunks = chunks
+    def _save(self, key: str, index, delta=None, shadowed=()):
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        index_path, delta_path, meta_path = self._paths(key)
+        suffix = f".{os.getpid()}.tmp"
+
+        with FileLock(self.index_dir / ".lock"):
+            for target, source in ((index_path, index), (delta_path, delta if shadowed else None)):
+                if source is None:
+                    target.unlink(missing_ok=True)
+                    continue
+                tmp = target.with_name(target.name + suffix)
+                faiss.write_index(source, str(tmp))
+                os.replace(tmp, target)
+
+            # meta last: its presence marks a complete entry
+            tmp = meta_path.with_name(meta_path.name + suffix)
+            with open(tmp, "w") as f:
+                json.dump({"model": self.model_name, "count": len(self.chunks), "dim": int(index.d),
+                           "index": describe(self.spec), "format": INDEX_FORMAT,
+                           "shadowed": sorted(int(i) for i in shadowed)}, f)
+            os.replace(tmp, meta_path)
+            self._drop_superseded(key, meta_path.stat().st_mtime_ns)
+
+    def _drop_superseded(self, key: str, written_at: int):
+        """Delete entries older than `key` that this model + index options produced (lock held)."""
+        for path in self.index_dir.iterdir():
+            if path.name.startswith(key) or path.suffix not in (".faiss", ".npy", ".json"):
+                continue
+            try:
+                if path.stat().st_mtime_ns >= written_at:
+                    continue
+                meta_path = self.index_dir / (path.name.split(".", 1)[0] + ".json")
+                if meta_path.exists():
+                    with open(meta_path, "r") as f:
+                        meta = json.load(f)
+                    if (meta.get("model"), meta.get("index")) != (self.model_name, describe(self.spec)):
+                        continue   # another worker's configuration: not ours to delete
+                # (no meta: a save that crashed before completing; saves hold the lock)
+                path.unlink(missing_ok=True)
+            except (OSError, ValueError):
+                continue
+
+    def persist(self) -> bool:
+        """Write the current (incrementally updated) index to disk if it changed; never rebuilds."""
+        with self._write_lock:
+            if not self._dirty:
+                return False
+            key = self._content_key()
+            self._dirty = False
+            self._persisted_at = time.monotonic()
+            try:
+                self._save(key, self.index, self._delta, self._shadowed)
+            except OSError as e:
+                print(f"[WARN] Could not persist RAG index: {e}")
+                return False
+        return True
+
+    # ──────────────────────────────────────────────────────
+    # FULL LOAD
+    # ──────────────────────────────────────────────────────
+    def load_data(self, path: str):
+        with open(path, "r") as f:
+            self.load_records(json.load(f))
+
+    def load_records(self, data):
+        self.chunks = self._build_chunks(data)
+        key = self._content_key()
+
+        if self._load_cached(key):
+            print(f"✅ RAG index loaded from disk with {len(self.chunks)} entries ({key[:8]}).")
+            return
 
         # Build FAISS index
-        embeddings = self.model.encode(chunks)
-        self.index = faiss.IndexFlatL2(embeddings.shape[1])
-        self.index.add(np.array(embeddings).astype("float32"))
-        print(f"✅ RAG index built with {len(chunks)} entries.")
+        embeddings = self._encode(list(self.chunks.values()))
+        self.index = build_index(embeddings, self._ids(), self.spec)
+        try:
+            self._save(key, self.index)
+        except OSError as e:
+            print(f"[WARN] Could not persist RAG index: {e}")
+        print(f"✅ RAG index built with {len(self.chunks)} entries ({describe(self.spec)}).")
 
+    def _ids(self) -> np.ndarray:
+        return np.fromiter(self.chunks.keys(), dtype="int64", count=len(self.chunks))
+
+    # ──────────────────────────────────────────────────────
+    # INCREMENTAL UPDATES
+    # ──────────────────────────────────────────────────────
+    def upsert_customer(self, customer: dict) -> bool:
+        """(Re)index one customer's chunk; a no-op if its text is unchanged."""
+        cid = int(customer["id"])
+        text = customer_chunk(customer.get("name", "Unknown"), customer)
+        if self.chunks.get(cid) == text:
+            return False
+        vector = self._encode([text])
+        ids = np.array([cid], dtype="int64")
+        with self._write_lock:
+            with self._lock:
+                if supports_remove(self.index):
+                    self.index.remove_ids(ids)
+                    self.index.add_with_ids(vector, ids)
+                else:
+                    self._delta_put(cid, vector)
+                self.chunks[cid] = text
+                self._dirty = True
+        return True
+
+    def remove_customer(self, cid: int) -> bool:
+        ids = np.array([int(cid)], dtype="int64")
+        with self._write_lock:
+            with self._lock:
+                if self.chunks.pop(int(cid), None) is None:
+                    return False
+                if supports_remove(self.index):
+                    self.index.remove_ids(ids)
+                else:
+                    self._delta_put(int(cid), None)
+                self._dirty = True
+        return True
+
+    def _delta_put(self, cid: int, vector):
+        # the main-index entry (if any) stays in the graph but is ignored
+        self._shadowed.add(cid)
+        if self._delta is None:
+            self._delta = faiss.IndexIDMap2(faiss.IndexFlatL2(self.index.d))
+        ids = np.array([cid], dtype="int64")
+        self._delta.remove_ids(ids)
+        if vector is not None:
+            self._delta.add_with_ids(vector, ids)
+
+    def compact(self) -> bool:
+        """Rebuild the main index with the HNSW delta folded in; only the update thread calls this."""
+        with self._write_lock:
+            if self._delta is None:
+                return False
+            started = time.perf_counter()
+            with self._lock:
+                ids = self._ids()
+                in_delta = np.isin(ids, faiss.vector_to_array(self._delta.id_map))
+                vectors = np.empty((len(ids), self.index.d), dtype="float32")
+                vectors[~in_delta] = self.index.reconstruct_batch(ids[~in_delta])
+                vectors[in_delta] = self._delta.reconstruct_batch(ids[in_delta])
+            # searches keep using the old index + delta while the new one builds
+            index = rebuild_index(self.index, vectors, ids)
+            with self._lock:
+                self.index, self._delta, self._shadowed = index, None, set()
+                self._dirty = True
+        print(f"[INFO] RAG index rebuilt with {len(ids)} entries in {time.perf_counter() - started:.2f}s.")
+        return True
+
+    def on_customer_change(self, event: str, customer: dict):
+        """crm_api change-feed subscriber: applied on a background thread."""
+        if self._updates is None:
+            with self._model_lock:
+                if self._updates is None:
+                    self._updates = queue.Queue()
+                    threading.Thread(target=self._apply_updates, name="rag-updates", daemon=True).start()
+        self._updates.put((event, dict(customer)))
+
+    def _apply_updates(self):
+        while True:
+            event, customer = self._updates.get()
+            try:
+                if event == "remove":
+                    self.remove_customer(customer["id"])
+                else:
+                    self.upsert_customer(customer)
+            except Exception as e:
+                print(f"[ERROR] RAG update for customer {customer.get('id')} failed: {e}")
+            if not self._updates.empty():
+                continue
+            try:
+                if len(self._shadowed) >= DELTA_MAX:
+                    self.compact()
+                if time.monotonic() - self._persisted_at >= PERSIST_INTERVAL:
+                    self.persist()
+            except Exception as e:
+                print(f"[ERROR] RAG index maintenance failed: {e}")
+
+    # ──────────────────────────────────────────────────────
     def retrieve(self, query: str, k=3):
-        query_emb = self.model.encode([query])
-        D, I = self.index.search(np.array(query_emb).astype("float32"), k)
-        return [self.text_chunks[i] for i in I[0]]
+        query_emb = self.encoder.encode(query)
+        with self._lock:
+            return [self.chunks[i] for i in self._search(query_emb, k) if i in self.chunks]
+
+    def _search(self, query_emb: np.ndarray, k: int) -> list:
+        if self._delta is None:
+            D, I = self.index.search(query_emb, k)
+            return list(I[0])
+        # over-fetch past shadowed entries, then merge with the delta by distance
+        D, I = self.index.search(query_emb, k + len(self._shadowed))
+        hits = [(d, i) for d, i in zip(D[0], I[0]) if i != -1 and i not in self._shadowed]
+        if self._delta.ntotal:
+            D, I = self._delta.search(query_emb, k)
+            hits.extend((d, i) for d, i in zip(D[0], I[0]) if i != -1)
+        hits.sort()
+        return [i for _, i in hits[:k]]
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self.chunks),
+            "model_loaded": self._model is not None,
+            "index": describe(self.spec),
+            "bytes_per_vector": code_size(self.spec, self.index.d) if self.index is not None else None,
+            "pending_delta": len(self._shadowed),
+            "dirty": self._dirty,
+            "query_encoder": self.encoder.stats(),
+        }
@@ -1,22 +1,230 @@
 from agents.master_agent import MasterAgent
+from services.state_store import StaleRevisionError, state_store_from_env
+from collections import OrderedDict
 from typing import Dict
+import asyncio
+import os
+import sys
+import threading
+import time
 import uuid
 
+
+def _deep_size(obj, seen=None) -> int:
+    """Approximate retained size of plain containers (dict/list/tuple/set/str)."""
+    seen = seen if seen is not None else set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(_deep_size(k, seen) + _deep_size(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(_deep_size(v, seen) for v in obj)
+    return size
+
+
+def is_valid_session_id(session_id: str) -> bool:
+    """Session ids are server-issued uuid4 strings (canonical lowercase form)."""
+    try:
+        parsed = uuid.UUID(session_id, version=4)
+    except (ValueError, TypeError, AttributeError):
+        return False
+    return str(parsed) == session_id
+
+
+class Session:
+    def __init__(self, session_id: str, agent: MasterAgent, revision: int = 0):
+        self.id = session_id
+        self.agent = agent
+        self.revision = revision         # last state-store revision this copy reflects
+        self.lock = asyncio.Lock()       # one turn at a time per conversation
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.size = 0
+
+
 class SessionManager:
-    def __init__(self):
-        self.sessions: Dict[str, MasterAgent] = {}
+    """
+    Bounded registry of per-conversation MasterAgents.
+
+    - sessions are kept in LRU order; the least recently used one is
+      evicted once `max_sessions` or `max_memory_bytes` is exceeded
+    - sessions idle for longer than `idle_ttl` seconds expire
+    - memory is estimated from each session's conversation state plus a
+      fixed per-session overhead
+    - with a `state_store`, every turn's snapshot is saved there; a
+      session missing from (or stale in) this process is rebuilt from the
+      store, so any worker can resume any conversation
+    """
+
+    def __init__(self, agent_factory=MasterAgent, max_sessions: int = 1000, idle_ttl: float = 1800,
+                 max_memory_bytes: int = 256 * 1024 * 1024, session_overhead_bytes: int = 64 * 1024,
+                 state_store=None, agent_loader=MasterAgent.from_snapshot):
+        self.agent_factory = agent_factory
+        self.agent_loader = agent_loader
+        self.state_store = state_store
+        self._last_purge = time.monotonic()
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.max_memory_bytes = max_memory_bytes
+        self.session_overhead_bytes = session_overhead_bytes
+
+        self.sessions: Dict[str, Session] = OrderedDict()
+        self._lock = threading.Lock()
+        self._memory = 0
+        self.counters = {"created": 0, "restored": 0, "evicted": 0, "expired": 0, "reset": 0, "conflicts": 0}
+
+    # ------------------------------------------------------------------
+    def _measure(self, session: Session) -> int:
+        agent = session.agent
+        state = {
+            "state": agent.state,
+            "user_profile": agent.user_profile,
+            "sales": agent.sales.context,
+            "verify": agent.verify.temp_data,
+            "matches": agent.verify.matches,
+        }
+        return self.session_overhead_bytes + _deep_size(state)
+
+    def _drop(self, session_id: str, reason: str):
+        session = self.sessions.pop(session_id)
+        self._memory -= session.size
+        self.counters[reason] += 1
 
-    def get_agent(self) -> MasterAgent:
-        # if session_id not in self.sessions:
-        #     self.sessions[session_id] = 
-        
-        return MasterAgent()
-        # return self.sessions[session_id]
+    def _enforce_limits(self):
+        """Expire idle sessions, then evict LRU ones over the caps (lock held)."""
+        now = time.monotonic()
+        while self.sessions:
+            oldest = next(iter(self.sessions.values()))
+            if now - oldest.last_used <= self.idle_ttl:
+                break
+            self._drop(oldest.id, "expired")
+        while self.sessions and (
+            len(self.sessions) > self.max_sessions or self._memory > self.max_memory_bytes
+        ):
+            self._drop(next(iter(self.sessions)), "evicted")
+
+    def _load(self, session_id: str):
+        """(agent, revision) from the state store, or (None, 0)."""
+        if self.state_store is None or not session_id:
+            return None, 0
+        entry = self.state_store.load(session_id)
+        if not entry:
+            return None, 0
+        try:
+            return self.agent_loader(entry["snapshot"]), entry["revision"]
+        except (KeyError, ValueError) as e:
+            print(f"[WARN] Discarding unreadable session snapshot {session_id}: {e}")
+            return None, 0
+
+    def _purge_store(self):
+        if self.state_store is None or time.monotonic() - self._last_purge < 60:
+            return
+        self._last_purge = time.monotonic()
+        self.state_store.purge(self.idle_ttl)
+
+    # ------------------------------------------------------------------
+    def get_session(self, session_id: str = None) -> Session:
+        """
+        Return the live session for `session_id`, creating one if needed.
+        Raises ValueError for an id that is not a server-issued uuid4: ids
+        end up in store keys and upload file names.
+        """
+        if session_id and not is_valid_session_id(session_id):
+            raise ValueError("Invalid session id")
+        with self._lock:
+            self._enforce_limits()
+            session = self.sessions.get(session_id) if session_id else None
+            if session is not None:
+                session.last_used = time.monotonic()
+                self.sessions.move_to_end(session_id)
+
+        if session is not None:
+            # another worker may have advanced this conversation since
+            if self.state_store is not None and self.state_store.revision(session.id) > session.revision:
+                agent, revision = self._load(session.id)
+                if agent is not None:
+                    session.agent, session.revision = agent, revision
+                    self.counters["restored"] += 1
+            return session
+
+        # build / restore the agent outside the registry lock
+        self._purge_store()
+        agent, revision = self._load(session_id)
+        restored = agent is not None
+        session = Session(session_id or str(uuid.uuid4()), agent or self.agent_factory(), revision)
+        with self._lock:
+            existing = self.sessions.get(session.id)
+            if existing is not None:
+                return existing
+            session.size = self._measure(session)
+            self.sessions[session.id] = session
+            self._memory += session.size
+            self.counters["restored" if restored else "created"] += 1
+            self._enforce_limits()
+        return session
+
+    def touch(self, session: Session):
+        """
+        Persist a session after a turn, re-measure it and re-apply the memory cap.
+
+        The save is conditional on the revision this copy was loaded at; if
+        another worker saved a turn in between, this turn is dropped, the
+        session is reloaded from the store and StaleRevisionError is raised.
+        """
+        if self.state_store is not None:
+            try:
+                session.revision = self.state_store.save(
+                    session.id, session.agent.snapshot(), expected_revision=session.revision
+                )
+            except StaleRevisionError:
+                agent, revision = self._load(session.id)
+                session.agent, session.revision = agent or self.agent_factory(), revision
+                self.counters["conflicts"] += 1
+                raise
+        with self._lock:
+            if self.sessions.get(session.id) is not session:
+                return
+            size = self._measure(session)
+            self._memory += size - session.size
+            session.size = size
+            session.last_used = time.monotonic()
+            self.sessions.move_to_end(session.id)
+            self._enforce_limits()
+
+    def get_agent(self, session_id: str = None) -> MasterAgent:
+        return self.get_session(session_id).agent
 
     def create_session(self) -> str:
-        session_id = str(uuid.uuid4())
-        self.sessions[session_id] = MasterAgent()
-        return session_id
+        return self.get_session().id
 
     def reset_session(self, session_id: str):
-        self.sessions[session_id] = MasterAgent()
+        if session_id and not is_valid_session_id(session_id):
+            raise ValueError("Invalid session id")
+        with self._lock:
+            if session_id in self.sessions:
+                self._drop(session_id, "reset")
+        if self.state_store is not None:
+            self.state_store.delete(session_id)
+        return self.get_session(session_id).id
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "sessions": len(self.sessions),
+                "max_sessions": self.max_sessions,
+                "memory_bytes": self._memory,
+                "max_memory_bytes": self.max_memory_bytes,
+                "idle_ttl": self.idle_ttl,
+                **self.counters,
+            }
+
+
+def session_manager_from_env() -> SessionManager:
+    return SessionManager(
+        state_store=state_store_from_env(),
+        max_sessions=int(os.getenv("SESSION_MAX", "1000")),
+        idle_ttl=float(os.getenv("SESSION_IDLE_TTL", "1800")),
+        max_memory_bytes=int(float(os.getenv("SESSION_MAX_MEMORY_MB", "256")) * 1024 * 1024),
+    )
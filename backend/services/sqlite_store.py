@@ -0,0 +1,420 @@
+import json
+import os
+import sqlite3
+import threading
+from pathlib import Path
+
+from services.customer_store import CUSTOMERS_PATH
+from services.name_index import TrigramNameIndex, normalize_name
+from services.offer_store import OFFERS_FILE as OFFERS_PATH, _loan_seq
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+DB_PATH = BASE_DIR / "data" / "loan_assistant.db"
+
+
+def storage_engine() -> str:
+    """`json` (default) or `sqlite`, taken from the STORAGE_ENGINE env var."""
+    return os.getenv("STORAGE_ENGINE", "json").strip().lower()
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+
+CREATE TABLE IF NOT EXISTS customers (
+    id          INTEGER PRIMARY KEY,
+    name_norm   TEXT NOT NULL,
+    email_norm  TEXT UNIQUE,
+    city        TEXT,
+    salary      INTEGER,
+    doc         TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_customers_name ON customers (name_norm);
+-- NOCASE so `city = ? COLLATE NOCASE` filters can use it (replaces the BINARY ix_customers_city)
+DROP INDEX IF EXISTS ix_customers_city;
+CREATE INDEX IF NOT EXISTS ix_customers_city_nocase ON customers (city COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS ix_customers_salary ON customers (salary);
+
+-- every name change by any worker, so each process's trigram index can catch up
+CREATE TABLE IF NOT EXISTS customer_name_log (
+    seq          INTEGER PRIMARY KEY AUTOINCREMENT,
+    customer_id  INTEGER NOT NULL
+);
+CREATE TRIGGER IF NOT EXISTS trg_customers_name_insert AFTER INSERT ON customers
+BEGIN
+    INSERT INTO customer_name_log (customer_id) VALUES (NEW.id);
+END;
+CREATE TRIGGER IF NOT EXISTS trg_customers_name_update AFTER UPDATE OF name_norm ON customers
+WHEN OLD.name_norm IS NOT NEW.name_norm
+BEGIN
+    INSERT INTO customer_name_log (customer_id) VALUES (NEW.id);
+END;
+CREATE TRIGGER IF NOT EXISTS trg_customers_name_delete AFTER DELETE ON customers
+BEGIN
+    INSERT INTO customer_name_log (customer_id) VALUES (OLD.id);
+END;
+
+CREATE TABLE IF NOT EXISTS offer_users (
+    user_id   INTEGER PRIMARY KEY,
+    next_seq  INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS offer_loans (
+    loan_id  TEXT PRIMARY KEY,
+    user_id  INTEGER NOT NULL,
+    seq      INTEGER NOT NULL,
+    doc      TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_offer_loans_user ON offer_loans (user_id, seq);
+
+CREATE TABLE IF NOT EXISTS offer_idempotency (
+    user_id  INTEGER NOT NULL,
+    key      TEXT NOT NULL,
+    loan_id  TEXT NOT NULL,
+    PRIMARY KEY (user_id, key)
+);
+"""
+
+
+class SQLiteDatabase:
+    """
+    One SQLite file in WAL mode shared by the CRM and Offer Mart stores.
+
+    Each thread gets its own connection; writers use `BEGIN IMMEDIATE`
+    so read-modify-write cycles are serialized by SQLite itself. An empty
+    database is seeded once from `customers_path` / `offers_path`.
+    """
+
+    def __init__(self, path: Path = DB_PATH, customers_path: Path = CUSTOMERS_PATH, offers_path: Path = OFFERS_PATH):
+        self.path = Path(path)
+        self.customers_path = Path(customers_path)
+        self.offers_path = Path(offers_path)
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._ready = False
+
+    def connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        if not self._ready:
+            self._setup(conn)
+        return conn
+
+    def _setup(self, conn: sqlite3.Connection):
+        with self._init_lock:
+            if self._ready:
+                return
+            conn.executescript(_SCHEMA)
+            migrate_from_json(conn, self.customers_path, self.offers_path)
+            self._ready = True
+
+    def transaction(self):
+        return _Transaction(self.connect())
+
+
+class _Transaction:
+    """`with db.transaction() as conn:` → BEGIN IMMEDIATE … COMMIT/ROLLBACK."""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
+
+
+# ──────────────────────────────────────────────────────────
+# ONE-SHOT MIGRATION FROM THE JSON FILES
+# ──────────────────────────────────────────────────────────
+def migrate_from_json(conn: sqlite3.Connection, customers_path: Path = CUSTOMERS_PATH, offers_path: Path = OFFERS_PATH):
+    """Import customers.json / offers.json into an empty database (runs once)."""
+    done_sql = "SELECT value FROM meta WHERE key = 'migrated_from_json'"
+    if conn.execute(done_sql).fetchone():
+        return
+
+    conn.execute("BEGIN IMMEDIATE")
+    # workers starting together all saw an empty meta; only the first to
+    # take the write lock imports
+    if conn.execute(done_sql).fetchone():
+        conn.execute("ROLLBACK")
+        return
+    try:
+        customers = []
+        if Path(customers_path).exists():
+            with open(customers_path, "r") as f:
+                customers = json.load(f)
+        for c in customers:
+            _insert_customer_row(conn, c)
+
+        offers = []
+        if Path(offers_path).exists():
+            with open(offers_path, "r") as f:
+                offers = json.load(f)
+        for user in offers:
+            uid = user["id"]
+            loans = user.get("loans", user.get("Loans", []))
+            next_seq = max((_loan_seq(l.get("id")) for l in loans), default=0) + 1
+            for loan in loans:
+                loan = dict(loan)
+                if not loan.get("id"):
+                    loan["id"] = f"{uid}_{next_seq}"
+                    next_seq += 1
+                conn.execute(
+                    "INSERT OR IGNORE INTO offer_loans (loan_id, user_id, seq, doc) VALUES (?, ?, ?, ?)",
+                    (loan["id"], uid, _loan_seq(loan["id"]), json.dumps(loan)),
+                )
+            conn.execute(
+                "INSERT OR REPLACE INTO offer_users (user_id, next_seq) VALUES (?, ?)",
+                (uid, next_seq),
+            )
+
+        conn.execute("INSERT INTO meta (key, value) VALUES ('migrated_from_json', '1')")
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    print(f"[INFO] Migrated {len(customers)} customers and {len(offers)} offer users into SQLite")
+
+
+def _insert_customer_row(conn: sqlite3.Connection, c: dict):
+    email = c.get("email")
+    conn.execute(
+        "INSERT INTO customers (id, name_norm, email_norm, city, salary, doc) VALUES (?, ?, ?, ?, ?, ?)",
+        (
+            c["id"],
+            normalize_name(c.get("name", "")),
+            email.lower() if email else None,
+            c.get("city"),
+            c.get("salary"),
+            json.dumps(c),
+        ),
+    )
+
+
+# ──────────────────────────────────────────────────────────
+# CRM STORE
+# ──────────────────────────────────────────────────────────
+class SQLiteCustomerStore:
+    """SQLite implementation of the CustomerRepository interface."""
+
+    def __init__(self, db: SQLiteDatabase):
+        self.db = db
+        self._name_index = TrigramNameIndex()
+        self._name_log_seq = None     # last customer_name_log row applied (None = not loaded)
+        self._index_lock = threading.Lock()
+
+    def _rows(self, sql: str, params=()) -> list:
+        return [json.loads(r[0]) for r in self.db.connect().execute(sql, params)]
+
+    def _sync_name_index(self):
+        """Apply name inserts / renames / deletes since the last sync (including by other workers)."""
+        with self._index_lock:
+            conn = self.db.connect()
+            if self._name_log_seq is None:
+                # one read transaction, so the log position matches the rows loaded
+                conn.execute("BEGIN")
+                try:
+                    seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM customer_name_log").fetchone()[0]
+                    rows = conn.execute("SELECT id, name_norm FROM customers").fetchall()
+                finally:
+                    conn.execute("COMMIT")
+                self._name_index.clear()
+                for cid, name in rows:
+                    self._name_index.add(cid, name)
+                self._name_log_seq = seq
+                return
+            rows = conn.execute(
+                "SELECT l.seq, l.customer_id, c.name_norm FROM customer_name_log l "
+                "LEFT JOIN customers c ON c.id = l.customer_id WHERE l.seq > ? ORDER BY l.seq",
+                (self._name_log_seq,),
+            ).fetchall()
+            for seq, cid, name in rows:
+                if name is None:
+                    self._name_index.remove(cid)
+                else:
+                    self._name_index.add(cid, name)
+                self._name_log_seq = seq
+
+    def all(self) -> list:
+        return self._rows("SELECT doc FROM customers ORDER BY id")
+
+    def get(self, cid: int):
+        rows = self._rows("SELECT doc FROM customers WHERE id = ?", (cid,))
+        return rows[0] if rows else None
+
+    def get_by_email(self, email: str):
+        rows = self._rows("SELECT doc FROM customers WHERE email_norm = ?", ((email or "").lower(),))
+        return rows[0] if rows else None
+
+    def find_by_name(self, name: str) -> list:
+        return self._rows("SELECT doc FROM customers WHERE name_norm = ? ORDER BY id", (normalize_name(name),))
+
+    def get_many(self, ids) -> dict:
+        ids = list(ids)
+        docs = {}
+        conn = self.db.connect()
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            marks = ",".join("?" * len(chunk))
+            for cid, doc in conn.execute(f"SELECT id, doc FROM customers WHERE id IN ({marks})", chunk):
+                docs[cid] = json.loads(doc)
+        return docs
+
+    def search_name(self, query: str, limit: int = None) -> list:
+        self._sync_name_index()
+        ids = self._name_index.search(query, limit)
+        docs = self.get_many(ids)
+        return [docs[cid] for cid in ids if cid in docs]
+
+    def page(self, after_id: int = 0, limit: int = 100, city: str = None, min_salary: int = None, max_salary: int = None) -> list:
+        sql = "SELECT doc FROM customers WHERE id > ?"
+        params = [after_id]
+        if city:
+            sql += " AND city = ? COLLATE NOCASE"
+            params.append(city)
+        if min_salary is not None:
+            sql += " AND salary >= ?"
+            params.append(min_salary)
+        if max_salary is not None:
+            sql += " AND salary <= ?"
+            params.append(max_salary)
+        sql += " ORDER BY id LIMIT ?"
+        params.append(limit)
+        return self._rows(sql, params)
+
+    def next_id(self) -> int:
+        row = self.db.connect().execute("SELECT COALESCE(MAX(id), 0) FROM customers").fetchone()
+        return max(row[0] + 1, 501)
+
+    def insert(self, customer: dict) -> dict:
+        record = dict(customer)
+        with self.db.transaction() as conn:
+            email = record.get("email")
+            if email and conn.execute(
+                "SELECT 1 FROM customers WHERE email_norm = ?", (email.lower(),)
+            ).fetchone():
+                raise ValueError("Email already registered")
+            if record.get("id") is None:
+                row = conn.execute("SELECT COALESCE(MAX(id), 0) FROM customers").fetchone()
+                record["id"] = max(row[0] + 1, 501)
+            _insert_customer_row(conn, record)
+        # after COMMIT: a rolled-back insert (e.g. duplicate email) leaves no trace
+        self._index_names([record])
+        return dict(record)
+
+    def _write_row(self, conn: sqlite3.Connection, c: dict):
+        email = c.get("email")
+        conn.execute(
+            "UPDATE customers SET name_norm = ?, email_norm = ?, city = ?, salary = ?, doc = ? WHERE id = ?",
+            (
+                normalize_name(c.get("name", "")),
+                email.lower() if email else None,
+                c.get("city"),
+                c.get("salary"),
+                json.dumps(c),
+                c["id"],
+            ),
+        )
+
+    def _index_names(self, records):
+        """Reflect committed writes in the name index (never before COMMIT)."""
+        for c in records:
+            self._name_index.add(c["id"], c.get("name", ""))
+
+    def update(self, cid: int, mutate, op: str = "update") -> dict:
+        with self.db.transaction() as conn:
+            row = conn.execute("SELECT doc FROM customers WHERE id = ?", (cid,)).fetchone()
+            if row is None:
+                return None
+            c = json.loads(row[0])
+            mutate(c)
+            self._write_row(conn, c)
+        self._index_names([c])
+        return c
+
+    def set_fields(self, updates: dict, op: str = "update") -> int:
+        written = []
+        ids = list(updates)
+        with self.db.transaction() as conn:
+            for i in range(0, len(ids), 500):
+                chunk = ids[i:i + 500]
+                marks = ",".join("?" * len(chunk))
+                for cid, doc in conn.execute(f"SELECT id, doc FROM customers WHERE id IN ({marks})", chunk).fetchall():
+                    c = json.loads(doc)
+                    fields = updates[cid]
+                    if any(c.get(k) != v for k, v in fields.items()):
+                        c.update(fields)
+                        self._write_row(conn, c)
+                        written.append(c)
+        self._index_names(written)
+        return len(written)
+
+
+# ──────────────────────────────────────────────────────────
+# OFFER MART STORE
+# ──────────────────────────────────────────────────────────
+class SQLiteOfferStore:
+    """Per-user loan rows with an atomic per-user loan-id counter."""
+
+    def __init__(self, db: SQLiteDatabase):
+        self.db = db
+
+    def get_user_loans(self, user_id: int) -> list:
+        rows = self.db.connect().execute(
+            "SELECT doc FROM offer_loans WHERE user_id = ? ORDER BY seq", (user_id,)
+        )
+        return [json.loads(r[0]) for r in rows]
+
+    def add_user_loan(self, user_id: int, loan: dict, idempotency_key: str = None) -> dict:
+        loan = dict(loan)
+        with self.db.transaction() as conn:
+            if idempotency_key:
+                row = conn.execute(
+                    "SELECT l.doc FROM offer_idempotency i JOIN offer_loans l ON l.loan_id = i.loan_id "
+                    "WHERE i.user_id = ? AND i.key = ?",
+                    (user_id, idempotency_key),
+                ).fetchone()
+                if row:
+                    return json.loads(row[0])
+            row = conn.execute("SELECT next_seq FROM offer_users WHERE user_id = ?", (user_id,)).fetchone()
+            seq = row[0] if row else 1
+            conn.execute(
+                "INSERT OR REPLACE INTO offer_users (user_id, next_seq) VALUES (?, ?)",
+                (user_id, seq + 1),
+            )
+            loan["id"] = f"{user_id}_{seq}"
+            conn.execute(
+                "INSERT INTO offer_loans (loan_id, user_id, seq, doc) VALUES (?, ?, ?, ?)",
+                (loan["id"], user_id, seq, json.dumps(loan)),
+            )
+            if idempotency_key:
+                conn.execute(
+                    "INSERT INTO offer_idempotency (user_id, key, loan_id) VALUES (?, ?, ?)",
+                    (user_id, idempotency_key, loan["id"]),
+                )
+        return loan
+
+
+_db = None
+_db_lock = threading.Lock()
+
+
+def get_database() -> SQLiteDatabase:
+    global _db
+    if _db is None:
+        with _db_lock:
+            if _db is None:
+                _db = SQLiteDatabase(Path(os.getenv("SQLITE_DB_PATH", DB_PATH)))
+    return _db
@@ -0,0 +1,48 @@
+import threading
+from collections import defaultdict
+
+
+class StageMetrics:
+    """
+    Process-wide latency and transition counters for the MasterAgent
+    pipeline.
+
+    - `record()` is called once per dispatched (stage, event)
+    - latency is kept per (stage, event) as count / total / max
+    - transitions count every `from → to` stage change
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latency = defaultdict(lambda: {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+        self._transitions = defaultdict(int)
+
+    def record(self, stage: str, event: str, elapsed: float, next_stage: str = None):
+        ms = elapsed * 1000
+        with self._lock:
+            entry = self._latency[(stage, event)]
+            entry["count"] += 1
+            entry["total_ms"] += ms
+            entry["max_ms"] = max(entry["max_ms"], ms)
+            if next_stage and next_stage != stage:
+                self._transitions[f"{stage} → {next_stage}"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            stages = defaultdict(dict)
+            for (stage, event), e in self._latency.items():
+                stages[stage][event] = {
+                    "count": e["count"],
+                    "avg_ms": round(e["total_ms"] / e["count"], 3),
+                    "max_ms": round(e["max_ms"], 3),
+                    "total_ms": round(e["total_ms"], 3),
+                }
+            return {"stages": dict(stages), "transitions": dict(self._transitions)}
+
+    def reset(self):
+        with self._lock:
+            self._latency.clear()
+            self._transitions.clear()
+
+
+stage_metrics = StageMetrics()
@@ -0,0 +1,199 @@
+import hashlib
+import importlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from services.file_lock import FileLock
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+
+
+class StaleRevisionError(Exception):
+    """`save()` was given an expected revision that is no longer current."""
+
+    def __init__(self, session_id: str, expected: int, current: int):
+        super().__init__(f"session {session_id}: expected revision {expected}, store has {current}")
+        self.session_id, self.expected, self.current = session_id, expected, current
+
+
+class MemoryStateStore:
+    """
+    Process-local store (single worker, nothing survives a restart).
+
+    Every store keeps `{"revision": int, "snapshot": dict}` per session;
+    the revision grows by one on each save so a worker can tell whether
+    its in-memory copy of a session is stale. `save(..., expected_revision)`
+    is a compare-and-swap: it raises StaleRevisionError if another writer
+    saved in between.
+    """
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def revision(self, session_id: str) -> int:
+        entry = self._data.get(session_id)
+        return entry["revision"] if entry else 0
+
+    def load(self, session_id: str):
+        return self._data.get(session_id)
+
+    def save(self, session_id: str, snapshot: dict, expected_revision: int = None) -> int:
+        with self._lock:
+            current = self.revision(session_id)
+            if expected_revision is not None and current != expected_revision:
+                raise StaleRevisionError(session_id, expected_revision, current)
+            revision = current + 1
+            self._data[session_id] = {"revision": revision, "snapshot": snapshot, "updated_at": time.time()}
+            return revision
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._data.pop(session_id, None)
+
+    def purge(self, older_than: float) -> int:
+        cutoff = time.time() - older_than
+        with self._lock:
+            stale = [k for k, v in self._data.items() if v["updated_at"] < cutoff]
+            for k in stale:
+                del self._data[k]
+        return len(stale)
+
+
+class FileStateStore:
+    """
+    One JSON file per session under `directory` (shared disk across
+    workers), named by a hash of the session id. Saves are serialized
+    across processes by a directory lock file.
+    """
+
+    def __init__(self, directory: Path = DATA_DIR / "sessions"):
+        self.dir = Path(directory)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self._lock = FileLock(self.dir / ".lock")
+
+    def _path(self, session_id: str) -> Path:
+        if not session_id:
+            raise ValueError("empty session id")
+        return self.dir / f"{hashlib.sha256(session_id.encode('utf-8')).hexdigest()}.json"
+
+    def load(self, session_id: str):
+        try:
+            with open(self._path(session_id), "r") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def revision(self, session_id: str) -> int:
+        entry = self.load(session_id)
+        return entry["revision"] if entry else 0
+
+    def save(self, session_id: str, snapshot: dict, expected_revision: int = None) -> int:
+        path = self._path(session_id)
+        with self._lock:
+            current = self.revision(session_id)
+            if expected_revision is not None and current != expected_revision:
+                raise StaleRevisionError(session_id, expected_revision, current)
+            revision = current + 1
+            tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            with open(tmp, "w") as f:
+                json.dump({"revision": revision, "snapshot": snapshot}, f, separators=(",", ":"))
+            os.replace(tmp, path)
+        return revision
+
+    def delete(self, session_id: str):
+        try:
+            self._path(session_id).unlink()
+        except FileNotFoundError:
+            pass
+
+    def purge(self, older_than: float) -> int:
+        cutoff = time.time() - older_than
+        removed = 0
+        for p in self.dir.glob("*.json"):
+            if p.stat().st_mtime < cutoff:
+                p.unlink(missing_ok=True)
+                removed += 1
+        return removed
+
+
+class SQLiteStateStore:
+    """Sessions in one WAL-mode SQLite file; safe for several workers on one host."""
+
+    def __init__(self, path: Path = DATA_DIR / "sessions.db"):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._conn().execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " id TEXT PRIMARY KEY, revision INTEGER NOT NULL, snapshot TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    def revision(self, session_id: str) -> int:
+        row = self._conn().execute("SELECT revision FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        return row[0] if row else 0
+
+    def load(self, session_id: str):
+        row = self._conn().execute("SELECT revision, snapshot FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        return {"revision": row[0], "snapshot": json.loads(row[1])} if row else None
+
+    def save(self, session_id: str, snapshot: dict, expected_revision: int = None) -> int:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if expected_revision is not None:
+                row = conn.execute("SELECT revision FROM sessions WHERE id = ?", (session_id,)).fetchone()
+                current = row[0] if row else 0
+                if current != expected_revision:
+                    raise StaleRevisionError(session_id, expected_revision, current)
+            conn.execute(
+                "INSERT INTO sessions (id, revision, snapshot, updated_at) VALUES (?, 1, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET revision = revision + 1, snapshot = excluded.snapshot, "
+                "updated_at = excluded.updated_at",
+                (session_id, json.dumps(snapshot, separators=(",", ":")), time.time()),
+            )
+            revision = conn.execute("SELECT revision FROM sessions WHERE id = ?", (session_id,)).fetchone()[0]
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return revision
+
+    def delete(self, session_id: str):
+        self._conn().execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+    def purge(self, older_than: float) -> int:
+        cur = self._conn().execute("DELETE FROM sessions WHERE updated_at < ?", (time.time() - older_than,))
+        return cur.rowcount
+
+
+def state_store_from_env():
+    """
+    SESSION_STORE selects the backend:
+      sqlite (default) | file | memory | "package.module:ClassName"
+    SESSION_STORE_PATH overrides the sqlite file / file-store directory.
+    """
+    kind = os.getenv("SESSION_STORE", "sqlite").strip()
+    path = os.getenv("SESSION_STORE_PATH")
+    if kind == "memory":
+        return MemoryStateStore()
+    if kind == "file":
+        return FileStateStore(Path(path)) if path else FileStateStore()
+    if kind == "sqlite":
+        return SQLiteStateStore(Path(path)) if path else SQLiteStateStore()
+    module, _, name = kind.partition(":")
+    return getattr(importlib.import_module(module), name)()
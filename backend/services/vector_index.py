@@ -0,0 +1,161 @@
+import math
+import os
+
+import faiss
+import numpy as np
+
+INDEX_KINDS = ("flat", "hnsw", "ivf")
+CODECS = ("none", "sq8", "sq4", "pq")
+
+# IVF lists / PQ centroids need roughly this many training points each (faiss warns below 39).
+MIN_POINTS_PER_LIST = 39
+
+
+def index_spec_from_env() -> dict:
+    """
+    RAG_INDEX picks the index: flat (exact, default), hnsw or ivf.
+
+    - hnsw: RAG_HNSW_M (graph degree), RAG_HNSW_EF_CONSTRUCTION,
+      RAG_HNSW_EF_SEARCH
+    - ivf: RAG_IVF_NLIST (0 = ~4·√n lists), RAG_IVF_NPROBE (lists scanned
+      per query)
+
+    RAG_INDEX_CODEC picks how vectors are stored: none (float32, default),
+    sq8 / sq4 (8- / 4-bit scalar quantization, 4× / 8× smaller) or pq
+    (product quantization, RAG_PQ_M codes of RAG_PQ_NBITS bits each).
+    """
+    kind = os.getenv("RAG_INDEX", "flat").strip().lower()
+    if kind not in INDEX_KINDS:
+        print(f"[WARN] Unknown RAG_INDEX={kind!r}, using flat")
+        kind = "flat"
+    codec = os.getenv("RAG_INDEX_CODEC", "none").strip().lower()
+    if codec not in CODECS:
+        print(f"[WARN] Unknown RAG_INDEX_CODEC={codec!r}, using none")
+        codec = "none"
+    return {
+        "kind": kind,
+        "codec": codec,
+        "pq_m": int(os.getenv("RAG_PQ_M", "96")),
+        "pq_nbits": int(os.getenv("RAG_PQ_NBITS", "8")),
+        "hnsw_m": int(os.getenv("RAG_HNSW_M", "32")),
+        "ef_construction": int(os.getenv("RAG_HNSW_EF_CONSTRUCTION", "80")),
+        "ef_search": int(os.getenv("RAG_HNSW_EF_SEARCH", "64")),
+        "nlist": int(os.getenv("RAG_IVF_NLIST", "0")),
+        "nprobe": int(os.getenv("RAG_IVF_NPROBE", "16")),
+    }
+
+
+def describe(spec: dict) -> str:
+    """Build-time parameters only: a change here invalidates a persisted index."""
+    if spec["kind"] == "hnsw":
+        name = f"hnsw(M={spec['hnsw_m']},efc={spec['ef_construction']})"
+    elif spec["kind"] == "ivf":
+        name = f"ivf(nlist={spec['nlist'] or 'auto'})"
+    else:
+        name = "flat"
+    codec = spec.get("codec", "none")
+    if codec == "pq":
+        return f"{name},pq(m={spec['pq_m']},nbits={spec['pq_nbits']})"
+    return name if codec == "none" else f"{name},{codec}"
+
+
+def code_size(spec: dict, dim: int) -> int:
+    """Bytes stored per vector (excluding ids and graph links)."""
+    codec = spec.get("codec", "none")
+    if codec == "sq8":
+        return dim
+    if codec == "sq4":
+        return (dim + 1) // 2
+    if codec == "pq":
+        return (spec["pq_m"] * spec["pq_nbits"] + 7) // 8
+    return dim * 4
+
+
+def ivf_nlist(spec: dict, n: int) -> int:
+    nlist = spec["nlist"] or int(4 * math.sqrt(n))
+    return max(1, min(nlist, n // MIN_POINTS_PER_LIST))
+
+
+def build_index(vectors: np.ndarray, ids: np.ndarray, spec: dict):
+    """
+    Index `vectors` under the int64 `ids`.
+
+    - flat / hnsw are wrapped in `IndexIDMap2` (id → vector reconstruction)
+    - ivf is trained on `vectors` and keeps ids itself, with a hashtable
+      direct map so single ids can be removed and reconstructed
+    - a codec other than none stores quantized codes instead of float32;
+      its quantizer is trained on `vectors` too
+    """
+    n, dim = vectors.shape
+    kind = spec["kind"]
+    codec = spec.get("codec", "none")
+    if kind == "ivf" and n < MIN_POINTS_PER_LIST * 2:
+        print(f"[WARN] {n} vectors are too few to train IVF, using a flat index")
+        kind = "flat"
+    if codec == "pq":
+        if dim % spec["pq_m"]:
+            raise ValueError(f"RAG_PQ_M={spec['pq_m']} must divide the embedding size {dim}")
+        if n < MIN_POINTS_PER_LIST * 2 ** spec["pq_nbits"]:
+            print(f"[WARN] {n} vectors are too few to train PQ codebooks, using sq8")
+            codec = "sq8"
+    sq_type = {"sq8": faiss.ScalarQuantizer.QT_8bit, "sq4": faiss.ScalarQuantizer.QT_4bit}.get(codec)
+
+    if kind == "ivf":
+        quantizer, nlist = faiss.IndexFlatL2(dim), ivf_nlist(spec, n)
+        if codec == "pq":
+            index = faiss.IndexIVFPQ(quantizer, dim, nlist, spec["pq_m"], spec["pq_nbits"])
+        elif sq_type is not None:
+            index = faiss.IndexIVFScalarQuantizer(quantizer, dim, nlist, sq_type)
+        else:
+            index = faiss.IndexIVFFlat(quantizer, dim, nlist)
+        index.set_direct_map_type(faiss.DirectMap.Hashtable)
+    elif kind == "hnsw":
+        if codec == "pq":
+            base = faiss.IndexHNSWPQ(dim, spec["pq_m"], spec["hnsw_m"], spec["pq_nbits"])
+        elif sq_type is not None:
+            base = faiss.IndexHNSWSQ(dim, sq_type, spec["hnsw_m"])
+        else:
+            base = faiss.IndexHNSWFlat(dim, spec["hnsw_m"])
+        base.hnsw.efConstruction = spec["ef_construction"]
+        index = faiss.IndexIDMap2(base)
+    else:
+        if codec == "pq":
+            base = faiss.IndexPQ(dim, spec["pq_m"], spec["pq_nbits"])
+        elif sq_type is not None:
+            base = faiss.IndexScalarQuantizer(dim, sq_type)
+        else:
+            base = faiss.IndexFlatL2(dim)
+        index = faiss.IndexIDMap2(base)
+    if not index.is_trained:
+        index.train(vectors)
+    index.add_with_ids(vectors, ids)
+    apply_search_params(index, spec)
+    return index
+
+
+def rebuild_index(index, vectors: np.ndarray, ids: np.ndarray):
+    """
+    Same structure, trained quantizers and search params as `index`, new
+    contents. Re-encoding reconstructed (already quantized) vectors with the
+    same codebooks reproduces their codes, so rebuilds don't compound loss.
+    """
+    fresh = faiss.clone_index(index)
+    fresh.reset()
+    fresh.add_with_ids(vectors, ids)
+    return fresh
+
+
+def apply_search_params(index, spec: dict):
+    """Query-time knobs are not part of the persisted key; re-apply after a load."""
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.nprobe = min(spec["nprobe"], ivf.nlist)
+    base = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap2) else index
+    if isinstance(base, faiss.IndexHNSW):
+        base.hnsw.efSearch = spec["ef_search"]
+
+
+def supports_remove(index) -> bool:
+    """HNSW graphs cannot drop nodes; flat and IVF can."""
+    base = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap2) else index
+    return not isinstance(base, faiss.IndexHNSW)
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# tests import the backend packages (services, agents, ...) the way main.py does
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
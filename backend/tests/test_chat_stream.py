@@ -0,0 +1,68 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from services.session_manager import SessionManager
+
+
+class _StreamAgent:
+    """Stands in for MasterAgent: `script` is the list of events to stream."""
+
+    script = []
+
+    def __init__(self):
+        self.state = "greeting"
+        self.user_profile = {}
+        self.sales = type("S", (), {"context": {}})()
+        self.verify = type("V", (), {"temp_data": {}, "matches": {}})()
+
+    async def handle_message_stream(self, msg, user_profile=None):
+        for event in self.script:
+            if isinstance(event, Exception):
+                raise event
+            yield event
+
+
+def _events(body: str) -> list:
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(main, "sessions", SessionManager(agent_factory=_StreamAgent))
+    return TestClient(main.app)
+
+
+def _stream(client, script):
+    _StreamAgent.script = script
+    response = client.post("/chat/stream", json={"message": "education"})
+    assert response.status_code == 200
+    return _events(response.text)
+
+
+def test_stream_ends_with_done(client):
+    events = _stream(client, [
+        {"event": "delta", "text": "Hel"},
+        {"event": "delta", "text": "lo"},
+        {"event": "done", "response": {"response": "Hello", "stage": "kyc"}},
+    ])
+    assert [name for name, _ in events] == ["delta", "delta", "done"]
+    assert events[-1][1]["message"] == "Hello"
+    assert events[-1][1]["stage"] == "kyc"
+
+
+def test_stream_error_mid_stream_sends_error_event(client):
+    events = _stream(client, [{"event": "delta", "text": "Hel"}, RuntimeError("LLM went away")])
+    assert [name for name, _ in events] == ["delta", "error"]
+    assert events[-1][1]["session_id"]
+
+
+def test_stream_without_final_event_sends_error_event(client):
+    events = _stream(client, [{"event": "delta", "text": "Hel"}])
+    assert [name for name, _ in events] == ["delta", "error"]
@@ -0,0 +1,75 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+import main
+from services.session_manager import SessionManager
+from services.state_store import MemoryStateStore
+
+
+class _SlowAgent:
+    """Stands in for MasterAgent: each turn yields to the loop, snapshots are slow."""
+
+    def __init__(self, turns: int = 0):
+        self.turns = turns
+        self.state = {}
+        self.user_profile = {}
+        self.sales = type("S", (), {"context": {}})()
+        self.verify = type("V", (), {"temp_data": {}, "matches": {}})()
+
+    async def handle_message_async(self, msg, user_profile=None):
+        await asyncio.sleep(0.01)
+        self.turns += 1
+        return {"response": f"turn {self.turns}", "stage": "sales"}
+
+    def snapshot(self) -> dict:
+        turns = self.turns
+        time.sleep(0.02)   # a second turn must not run while this one is persisted
+        return {"turns": turns, "checked": self.turns}
+
+    @classmethod
+    def from_snapshot(cls, snap: dict):
+        return cls(snap["turns"])
+
+
+class _RecordingStore(MemoryStateStore):
+    def __init__(self):
+        super().__init__()
+        self.saved = []
+
+    def save(self, session_id, snapshot, expected_revision=None):
+        revision = super().save(session_id, snapshot, expected_revision)
+        self.saved.append((revision, snapshot))
+        return revision
+
+
+@pytest.fixture
+def store(monkeypatch):
+    store = _RecordingStore()
+    monkeypatch.setattr(main, "sessions", SessionManager(
+        agent_factory=_SlowAgent, agent_loader=_SlowAgent.from_snapshot, state_store=store))
+    return store
+
+
+async def _post(client, session_id, message):
+    return await client.post("/chat", json={"message": message, "session_id": session_id})
+
+
+def test_concurrent_turns_on_one_session_both_persist(store):
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            first = await client.post("/chat", json={"message": "hi"})
+            session_id = first.json()["session_id"]
+            start = store.revision(session_id)
+            responses = await asyncio.gather(_post(client, session_id, "a"), _post(client, session_id, "b"))
+            return session_id, start, responses
+
+    session_id, start, responses = asyncio.run(run())
+    assert [r.status_code for r in responses] == [200, 200]
+    assert sorted(r.json()["message"] for r in responses) == ["turn 2", "turn 3"]
+
+    # each turn saved its own, untorn snapshot: revisions n+1 and n+2
+    assert store.saved[-2:] == [(start + 1, {"turns": 2, "checked": 2}), (start + 2, {"turns": 3, "checked": 3})]
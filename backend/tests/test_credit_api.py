@@ -0,0 +1,67 @@
+import pytest
+
+import services.credit_api as credit_api
+
+
+class _FakeBureau:
+    def __init__(self, score, is_fallback):
+        self.result = (score, is_fallback)
+        self.calls = 0
+
+    def lookup(self, customer):
+        self.calls += 1
+        return self.result
+
+
+class _FakeStore:
+    def get(self, cid):
+        return {"id": cid, "name": "Asha Rao", "salary": 50000, "existing_loans": 0}
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache(monkeypatch):
+    monkeypatch.setattr(credit_api, "_credit_cache", credit_api.LRUCache(maxsize=100, ttl=3600))
+    monkeypatch.setattr(credit_api, "get_customer_store", lambda: _FakeStore())
+
+
+def _use_bureau(monkeypatch, bureau):
+    monkeypatch.setattr(credit_api, "get_bureau_client", lambda: bureau)
+
+
+def test_bureau_scores_are_cached_for_the_full_ttl(monkeypatch):
+    bureau = _FakeBureau(812, is_fallback=False)
+    _use_bureau(monkeypatch, bureau)
+
+    assert credit_api.get_credit_score_by_id(1) == 812
+    assert credit_api.get_credit_score_by_id(1) == 812
+    assert bureau.calls == 1
+
+
+def test_fallback_scores_expire_quickly(monkeypatch):
+    bureau = _FakeBureau(700, is_fallback=True)
+    _use_bureau(monkeypatch, bureau)
+    monkeypatch.setattr(credit_api, "CREDIT_FALLBACK_TTL", 0)
+
+    credit_api.get_credit_score_by_id(1)
+    bureau.result = (812, False)  # bureau recovered
+    assert credit_api.get_credit_score_by_id(1) == 812
+    assert bureau.calls == 2
+
+
+def test_refresh_defers_to_the_bureau_when_enabled(monkeypatch):
+    bureau = _FakeBureau(812, is_fallback=False)
+    _use_bureau(monkeypatch, bureau)
+    credit_api.get_credit_score_by_id(1)
+
+    assert credit_api.refresh_credit_score(_FakeStore().get(1)) is None
+    assert credit_api.get_credit_score_by_id(1) == 812
+    assert bureau.calls == 2
+
+
+def test_refresh_caches_local_score_without_bureau(monkeypatch):
+    _use_bureau(monkeypatch, None)
+    customer = _FakeStore().get(1)
+
+    score = credit_api.refresh_credit_score(customer)
+    assert score == credit_api.calculate_credit_score(customer)
+    assert credit_api._credit_cache.get(1) == score
@@ -0,0 +1,111 @@
+import json
+
+import pytest
+
+from services.crm_journal import CustomerJournal
+from services.customer_store import CustomerRepository
+
+SEED = [
+    {"id": 1, "name": "Asha Rao", "email": "asha@example.com", "city": "Pune", "salary": 50000},
+    {"id": 2, "name": "Vikram Iyer", "email": "vikram@example.com", "city": "Chennai", "salary": 80000},
+]
+
+
+@pytest.fixture
+def crm(tmp_path):
+    """Factory for repositories sharing one customers.json + journal, like separate workers."""
+    path = tmp_path / "customers.json"
+    path.write_text(json.dumps(SEED))
+    repos = []
+
+    def worker():
+        repo = CustomerRepository(path, CustomerJournal(tmp_path / "journal", flush_interval=0))
+        repos.append(repo)
+        return repo
+
+    yield worker
+    for repo in repos:
+        repo.journal.close()
+
+
+def _signup(repo, name):
+    return repo.insert({"name": name, "email": f"{name.lower()}@example.com", "city": "Delhi"})
+
+
+def test_writes_from_one_worker_are_visible_to_another(crm):
+    a, b = crm(), crm()
+    assert len(b.all()) == 2
+
+    _signup(a, "Neha")
+    a.update(1, lambda c: c.update(city="Mumbai"))
+
+    assert b.get_by_email("neha@example.com")["name"] == "Neha"
+    assert b.get(1)["city"] == "Mumbai"
+    assert [c["name"] for c in b.search_name("neh")] == ["Neha"]
+
+
+def test_ids_and_emails_stay_unique_across_workers(crm):
+    a, b = crm(), crm()
+    a.all(), b.all()  # both loaded before either writes
+
+    ids = [_signup(a, "Neha")["id"], _signup(b, "Kabir")["id"], _signup(a, "Meera")["id"]]
+    assert len(set(ids)) == 3
+
+    with pytest.raises(ValueError):
+        _signup(b, "Neha")
+
+
+def test_compaction_keeps_other_workers_writes(crm, tmp_path):
+    a, b = crm(), crm()
+    _signup(a, "Neha")
+    _signup(b, "Kabir")
+
+    a.compact()
+    _signup(b, "Meera")  # lands in the segment opened by a's rotation
+
+    on_disk = {c["name"] for c in json.loads((tmp_path / "customers.json").read_text())}
+    assert {"Neha", "Kabir"} <= on_disk
+    for repo in (a, b, crm()):
+        assert {c["name"] for c in repo.all()} == {"Asha Rao", "Vikram Iyer", "Neha", "Kabir", "Meera"}
+
+
+def test_stale_compaction_does_not_overwrite_a_newer_snapshot(crm, tmp_path):
+    a, b = crm(), crm()
+    _signup(a, "Neha")
+    write_tmp = a._write_tmp
+
+    def racing_write_tmp(customers):
+        # b signs someone up and compacts while a serializes its snapshot
+        _signup(b, "Kabir")
+        b.compact()
+        return write_tmp(customers)
+
+    a._write_tmp = racing_write_tmp
+    a.compact()
+
+    on_disk = {c["name"] for c in json.loads((tmp_path / "customers.json").read_text())}
+    assert "Kabir" in on_disk
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_restart_replays_journal(crm):
+    a = crm()
+    _signup(a, "Neha")
+    a.set_fields({1: {"credit_score": 780}}, op="credit_score")
+    a.journal.close()
+
+    fresh = crm()
+    assert fresh.get(1)["credit_score"] == 780
+    assert fresh.get_by_email("neha@example.com") is not None
+
+
+def test_torn_journal_line_is_skipped(crm, tmp_path):
+    a = crm()
+    _signup(a, "Neha")
+    a.journal.close()
+    with open(sorted((tmp_path / "journal").glob("segment-*.log"))[-1], "ab") as f:
+        f.write(b'{"op":"signup","cust')
+
+    b = crm()
+    _signup(b, "Kabir")
+    assert {c["name"] for c in crm().all()} >= {"Neha", "Kabir"}
@@ -0,0 +1,58 @@
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import routers.crm as crm_router
+from services.sqlite_store import SQLiteCustomerStore, SQLiteDatabase
+
+CUSTOMERS = [{"id": i, "name": f"Customer {i}", "city": "Pune" if i % 2 else "Delhi", "salary": 1000 * i}
+             for i in range(1, 8)]
+
+
+@pytest.fixture
+def client(monkeypatch):
+    def iter_customers(cursor, city, min_salary, max_salary, batch_size=500):
+        return (c for c in CUSTOMERS if c["id"] > cursor and (not city or c["city"].lower() == city.lower()))
+
+    monkeypatch.setattr(crm_router, "iter_customers", iter_customers)
+    app = FastAPI()
+    app.include_router(crm_router.router)
+    return TestClient(app)
+
+
+def test_default_listing_is_a_plain_list_of_everything(client):
+    response = client.get("/crm/customers", params={"fields": "id,name"})
+    assert response.json() == [{"id": c["id"], "name": c["name"]} for c in CUSTOMERS]
+    assert "x-next-cursor" not in response.headers
+
+
+def test_pages_carry_the_cursor_in_a_header(client):
+    seen, cursor = [], 0
+    while True:
+        response = client.get("/crm/customers", params={"limit": 3, "cursor": cursor, "fields": "id"})
+        seen += [c["id"] for c in response.json()]
+        if "x-next-cursor" not in response.headers:
+            break
+        cursor = int(response.headers["x-next-cursor"])
+    assert seen == [c["id"] for c in CUSTOMERS]
+
+
+def test_ndjson_page(client):
+    response = client.get("/crm/customers", params={"limit": 2, "format": "ndjson", "city": "pune", "fields": "id"})
+    assert [json.loads(line)["id"] for line in response.text.splitlines()] == [1, 3]
+    assert response.headers["x-next-cursor"] == "3"
+
+
+def test_sqlite_city_filter_uses_the_nocase_index(tmp_path):
+    seed = tmp_path / "customers.json"
+    seed.write_text(json.dumps([
+        {"id": 1, "name": "Asha", "email": "asha@example.com", "city": "PUNE"},
+        {"id": 2, "name": "Vikram", "email": "vikram@example.com", "city": "Chennai"},
+    ]))
+    store = SQLiteCustomerStore(SQLiteDatabase(tmp_path / "crm.db", seed, tmp_path / "offers.json"))
+    plan = " ".join(row[-1] for row in store.db.connect().execute(
+        "EXPLAIN QUERY PLAN SELECT doc FROM customers WHERE city = ? COLLATE NOCASE", ("pune",)))
+    assert "ix_customers_city_nocase" in plan
+    assert [c["name"] for c in store.page(city="pune")] == ["Asha"]
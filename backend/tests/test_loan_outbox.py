@@ -0,0 +1,129 @@
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import services.offer_store as offer_store
+from services.loan_outbox import LoanOutbox
+from services.offer_store import JsonOfferStore
+
+LOAN = {
+    "name": "Home Loan", "type": "home", "amount": 500000.0, "interest_rate": 9.5,
+    "tenure_months": 120, "status": "sanctioned",
+}
+
+
+@pytest.fixture
+def offers(tmp_path, monkeypatch):
+    store = JsonOfferStore(tmp_path / "offers.json")
+    monkeypatch.setattr(offer_store, "_store", store)
+    return store
+
+
+@pytest.fixture
+def outbox(tmp_path):
+    return LoanOutbox(tmp_path / "outbox.db")
+
+
+def _status(outbox, outbox_id):
+    return outbox._conn().execute(
+        "SELECT status, attempts, claimed_by FROM loan_outbox WHERE id = ?", (outbox_id,)
+    ).fetchone()
+
+
+def test_delivers_loan_without_outbox_bookkeeping(offers, outbox):
+    outbox_id = outbox.enqueue(7, LOAN)
+    assert outbox.deliver_due() == 1
+
+    [stored] = offers.get_user_loans(7)
+    assert stored == {**LOAN, "id": "7_1"}
+    assert _status(outbox, outbox_id) == ("delivered", 1, None)
+
+
+def test_redelivery_after_lost_ack_does_not_duplicate(offers, outbox):
+    outbox_id = outbox.enqueue(7, LOAN)
+    outbox.deliver_due()
+    # the worker died before recording the delivery: the row is pending again
+    outbox._conn().execute("UPDATE loan_outbox SET status = 'pending' WHERE id = ?", (outbox_id,))
+
+    assert outbox.deliver_due() == 1
+    assert len(offers.get_user_loans(7)) == 1
+
+
+def test_failed_delivery_is_retried_with_backoff(offers, outbox, monkeypatch):
+    import services.offer_api as offer_api
+
+    real_add = offer_api.add_user_loan
+    calls = []
+
+    def flaky_add(user_id, loan, idempotency_key=None):
+        calls.append(idempotency_key)
+        if len(calls) == 1:
+            raise ConnectionError("offer mart down")
+        return real_add(user_id, loan, idempotency_key)
+
+    monkeypatch.setattr(offer_api, "add_user_loan", flaky_add)
+    outbox_id = outbox.enqueue(7, LOAN)
+
+    assert outbox.deliver_due() == 0
+    assert _status(outbox, outbox_id) == ("pending", 1, None)
+    assert outbox.deliver_due() == 0  # backing off
+
+    outbox._conn().execute("UPDATE loan_outbox SET next_attempt_at = 0 WHERE id = ?", (outbox_id,))
+    assert outbox.deliver_due() == 1
+    assert calls[0] == calls[1]  # same idempotency key on the retry
+    assert len(offers.get_user_loans(7)) == 1
+
+
+def test_workers_never_claim_the_same_rows(offers, outbox, tmp_path):
+    other = LoanOutbox(tmp_path / "outbox.db", claim_timeout=60)
+    for _ in range(3):
+        outbox.enqueue(7, LOAN)
+
+    _, mine = outbox._claim()
+    _, theirs = other._claim()
+    assert len(mine) == 3 and theirs == []
+
+    # a claim that outlived claim_timeout (worker died) can be taken over
+    other.claim_timeout = 0
+    time.sleep(0.01)
+    _, taken = other._claim()
+    assert len(taken) == 3
+
+
+def test_offer_mart_endpoint_dedupes_on_idempotency_key(offers):
+    from routers.offer_mart import router
+
+    app = FastAPI()
+    app.include_router(router)
+    client = TestClient(app)
+
+    first = client.post("/offer-mart/user/7/loans", json=LOAN, headers={"Idempotency-Key": "abc"})
+    again = client.post("/offer-mart/user/7/loans", json=LOAN, headers={"Idempotency-Key": "abc"})
+    other = client.post("/offer-mart/user/7/loans", json=LOAN)
+
+    assert first.json()["loan"]["id"] == again.json()["loan"]["id"] == "7_1"
+    assert other.json()["loan"]["id"] == "7_2"
+    assert len(offers.get_user_loans(7)) == 2
+
+
+def test_json_offer_store_is_safe_across_workers(tmp_path):
+    import threading
+
+    path = tmp_path / "offers.json"
+    workers = [JsonOfferStore(path), JsonOfferStore(path)]
+
+    def add_many(store, worker, n):
+        for i in range(n):
+            store.add_user_loan(7, dict(LOAN), idempotency_key=f"{worker}-{i}")
+
+    threads = [threading.Thread(target=add_many, args=(workers[w % 2], w, 25)) for w in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    loans = JsonOfferStore(path).get_user_loans(7)
+    assert len(loans) == 100
+    assert len({l["id"] for l in loans}) == 100
@@ -0,0 +1,53 @@
+from services.name_index import TrigramNameIndex
+from services.sqlite_store import SQLiteCustomerStore, SQLiteDatabase
+
+
+def test_short_queries_use_the_gram_bucket():
+    index = TrigramNameIndex()
+    for cid, name in enumerate(["Asha Rao", "Vikram Iyer", "Ravi Das", "Om"], start=1):
+        index.add(cid, name)
+
+    assert index.search("ra") == [3, 1, 2]  # prefix before word-prefix before substring
+    assert index.search("Om") == [4]
+    assert index.search("q") == []
+    index.remove(3)
+    assert index.search("ra") == [1, 2]
+    assert "ra" in index._short and 3 not in index._short["ra"]
+
+
+def test_sqlite_index_follows_other_workers_renames(tmp_path):
+    path, seed = tmp_path / "crm.db", tmp_path / "customers.json"
+    seed.write_text("[]")
+    ours = SQLiteCustomerStore(SQLiteDatabase(path, seed, tmp_path / "offers.json"))
+    theirs = SQLiteCustomerStore(SQLiteDatabase(path, seed, tmp_path / "offers.json"))
+
+    record = ours.insert({"name": "Zubin Mehta", "email": "zubin@example.com"})
+    assert [c["id"] for c in ours.search_name("zubin")] == [record["id"]]
+
+    theirs.update(record["id"], lambda c: c.update(name="Zara Mehta"))
+    assert ours.search_name("zubin") == []
+    assert [c["id"] for c in ours.search_name("zara")] == [record["id"]]
+
+    theirs.insert({"name": "Zubin Shah", "email": "shah@example.com"})
+    assert [c["name"] for c in ours.search_name("zubin")] == ["Zubin Shah"]
+
+
+def test_short_query_ranking_stays_sorted_through_writes():
+    index = TrigramNameIndex()
+    index.add(1, "Asha Rao")
+    index.add(2, "Ravi Das")
+    assert index.search("ra", limit=1) == [2]
+    assert "ra" in index._ranked
+
+    index.add(3, "Ra")          # exact match outranks every prefix
+    index.add(4, "Om Iyer")     # no "ra"
+    assert index.search("ra") == [3, 2, 1]
+    index.add(2, "Tara Das")    # rename: prefix → substring
+    assert index.search("ra") == [3, 1, 2]
+
+    index.remove(3)
+    assert index.search("ra", limit=5) == [1, 2]
+    fresh = TrigramNameIndex()
+    for cid, name in index._names.items():
+        fresh.add(cid, name)
+    assert fresh.search("ra") == index.search("ra")
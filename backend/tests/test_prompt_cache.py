@@ -0,0 +1,34 @@
+import asyncio
+import threading
+
+from services.prompt_cache import PromptCache
+
+
+def test_async_disk_tier_runs_off_the_event_loop(tmp_path, monkeypatch):
+    writer = PromptCache(path=tmp_path / "prompt_cache.db")
+    writer.set("k", "cached answer")
+
+    cache = PromptCache(path=tmp_path / "prompt_cache.db")
+    threads = []
+    for name in ("_disk_get", "_disk_put"):
+        real = getattr(cache, name)
+
+        def spy(*args, _real=real):
+            threads.append(threading.get_ident())
+            return _real(*args)
+
+        monkeypatch.setattr(cache, name, spy)
+
+    async def turn():
+        hit = await cache.get_async("k")        # memory miss → disk hit
+        again = await cache.get_async("k")      # promoted: served from memory
+        miss = await cache.get_async("other")
+        await cache.set_async("other", "fresh")
+        return threading.get_ident(), hit, again, miss
+
+    loop_thread, hit, again, miss = asyncio.run(turn())
+    assert (hit, again, miss) == ("cached answer", "cached answer", None)
+    assert len(threads) == 3 and loop_thread not in threads
+    assert writer.get("other") == "fresh"
+    stats = cache.stats()
+    assert (stats["memory_hits"], stats["disk_hits"], stats["misses"], stats["stores"]) == (1, 1, 1, 1)
@@ -0,0 +1,159 @@
+import hashlib
+import json
+
+import numpy as np
+import pytest
+
+from services.rag_service import RAGService
+from services.vector_index import index_spec_from_env
+
+CUSTOMERS = [
+    {"id": 1, "name": "Asha Rao", "city": "Pune", "preapproved_limit": 200000},
+    {"id": 2, "name": "Vikram Iyer", "city": "Chennai", "preapproved_limit": 500000},
+    {"id": 3, "name": "Ravi Das", "city": "Kolkata", "preapproved_limit": 300000},
+]
+
+
+class FakeEncoderRAG(RAGService):
+    """Deterministic per-text vectors instead of a SentenceTransformer."""
+
+    encoded = 0
+
+    def _encode(self, texts):
+        FakeEncoderRAG.encoded += len(texts)
+        rows = []
+        for text in texts:
+            seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+            rows.append(np.random.default_rng(seed).standard_normal(16))
+        return np.ascontiguousarray(rows, dtype="float32")
+
+
+FLAT = dict(index_spec_from_env(), kind="flat", codec="none")
+HNSW = dict(FLAT, kind="hnsw")
+
+
+@pytest.fixture
+def index_dir(tmp_path):
+    return tmp_path / "rag_index"
+
+
+def _entries(index_dir):
+    return sorted(p.name for p in index_dir.iterdir() if p.suffix in (".faiss", ".json"))
+
+
+def test_unchanged_customers_reload_without_encoding(index_dir):
+    FakeEncoderRAG(index_dir=index_dir, records=CUSTOMERS, index_spec=FLAT)
+    FakeEncoderRAG.encoded = 0
+
+    reloaded = FakeEncoderRAG(index_dir=index_dir, records=CUSTOMERS, index_spec=FLAT)
+    assert FakeEncoderRAG.encoded == 0
+    assert reloaded.index.ntotal == len(CUSTOMERS) + 3  # + policy chunks
+    assert not list(index_dir.glob("*.npy"))
+
+
+def test_save_keeps_entries_of_other_configurations(index_dir):
+    FakeEncoderRAG(index_dir=index_dir, records=CUSTOMERS, index_spec=HNSW)
+    hnsw_entries = _entries(index_dir)
+
+    FakeEncoderRAG(index_dir=index_dir, records=CUSTOMERS, index_spec=FLAT)
+    assert set(hnsw_entries) < set(_entries(index_dir))
+
+
+def test_save_drops_older_entries_of_the_same_configuration(index_dir):
+    FakeEncoderRAG(index_dir=index_dir, records=CUSTOMERS, index_spec=FLAT)
+    first = _entries(index_dir)
+
+    FakeEncoderRAG(index_dir=index_dir, records=CUSTOMERS[:2], index_spec=FLAT)
+    second = _entries(index_dir)
+    assert len(second) == 2 and not set(first) & set(second)
+    meta = json.loads(next(index_dir.glob("*.json")).read_text())
+    assert meta["count"] == 2 + 3
+
+
+@pytest.mark.parametrize("spec", [FLAT, HNSW], ids=["flat", "hnsw"])
+def test_crm_update_changes_the_chunk_and_survives_reload(index_dir, spec):
+    rag = FakeEncoderRAG(index_dir=index_dir, records=CUSTOMERS, index_spec=spec)
+    before = rag.chunks[1]
+
+    # what update_customer_loans publishes after a sanction
+    updated = {**CUSTOMERS[0], "existing_loans": 1, "credit_score": 725}
+    assert rag.upsert_customer(updated)
+    assert rag.chunks[1] != before and "1 existing loan(s)" in rag.chunks[1]
+    assert rag.retrieve(rag.chunks[1], k=1) == [rag.chunks[1]]
+    assert not rag.upsert_customer(updated)  # same text → no-op
+
+    assert rag.persist()
+    FakeEncoderRAG.encoded = 0
+    reloaded = FakeEncoderRAG(index_dir=index_dir, records=[updated] + CUSTOMERS[1:], index_spec=spec)
+    assert FakeEncoderRAG.encoded == 0
+    assert reloaded.chunks[1] == rag.chunks[1]
+    assert reloaded.retrieve(rag.chunks[1], k=1) == [rag.chunks[1]]
+
+
+def test_removed_customer_is_not_retrieved(index_dir):
+    rag = FakeEncoderRAG(index_dir=index_dir, records=CUSTOMERS, index_spec=HNSW)
+    text = rag.chunks[2]
+    assert rag.remove_customer(2)
+    assert text not in rag.retrieve(text, k=3)
+
+
+def _bump(customer, loans):
+    return {**customer, "existing_loans": loans}
+
+
+def test_hnsw_persist_saves_the_delta_without_rebuilding(index_dir):
+    rag = FakeEncoderRAG(index_dir=index_dir, records=CUSTOMERS, index_spec=HNSW)
+    main_index = rag.index
+    updated = [_bump(c, 2) for c in CUSTOMERS[:2]]
+    for c in updated:
+        rag.upsert_customer(c)
+    rag.remove_customer(3)
+
+    assert rag.persist()
+    assert rag.index is main_index and rag.stats()["pending_delta"] == 3
+
+    reloaded = FakeEncoderRAG(index_dir=index_dir, records=updated, index_spec=HNSW)
+    assert reloaded.stats()["pending_delta"] == 3
+    for c in updated:
+        text = reloaded.chunks[c["id"]]
+        assert reloaded.retrieve(text, k=1) == [text]
+
+
+def test_update_thread_compacts_once_the_delta_is_full(index_dir, monkeypatch):
+    import time
+
+    import services.rag_service as rag_service
+
+    monkeypatch.setattr(rag_service, "DELTA_MAX", 2)
+    monkeypatch.setattr(rag_service, "PERSIST_INTERVAL", 3600)
+    rag = FakeEncoderRAG(index_dir=index_dir, records=CUSTOMERS, index_spec=HNSW)
+
+    rag.upsert_customer(_bump(CUSTOMERS[0], 1))
+    rag.upsert_customer(_bump(CUSTOMERS[1], 1))
+    assert rag.stats()["pending_delta"] == 2  # direct calls never rebuild
+
+    rag.on_customer_change("upsert", _bump(CUSTOMERS[2], 1))
+    deadline = time.monotonic() + 5
+    while rag.stats()["pending_delta"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert rag.stats()["pending_delta"] == 0
+    text = rag.chunks[3]
+    assert rag.retrieve(text, k=1) == [text]
+
+
+def test_loan_update_feed_skips_unknown_customers(tmp_path, monkeypatch):
+    import services.credit_api as credit_api
+    import services.crm_api as crm_api
+    from services.customer_store import CustomerRepository
+
+    path = tmp_path / "customers.json"
+    path.write_text(json.dumps([{**CUSTOMERS[0], "existing_loans": 0, "salary": 50000}]))
+    monkeypatch.setattr(crm_api, "get_customer_store", lambda: CustomerRepository(path))
+    monkeypatch.setattr(credit_api, "get_bureau_client", lambda: None)
+    events = []
+    monkeypatch.setattr(crm_api, "_subscribers", [lambda event, c: events.append((event, c["id"]))])
+
+    assert crm_api.update_customer_loans(999) is False
+    assert events == []
+    assert crm_api.update_customer_loans(1) is True
+    assert events == [("upsert", 1)]
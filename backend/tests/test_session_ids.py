@@ -0,0 +1,55 @@
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from services.session_manager import SessionManager, is_valid_session_id
+
+
+class _UploadAgent:
+    def __init__(self):
+        self.state = "greeting"
+        self.user_profile = {}
+        self.sales = type("S", (), {"context": {}})()
+        self.verify = type("V", (), {"temp_data": {}, "matches": {}})()
+        self.uploads = []
+
+    def handle_file_upload(self, path):
+        self.uploads.append(path)
+        return {"response": "ok", "path": path}
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    monkeypatch.setattr(main, "sessions", SessionManager(agent_factory=_UploadAgent))
+    monkeypatch.setattr(main, "UPLOAD_DIR", tmp_path)
+    return TestClient(main.app)
+
+
+@pytest.mark.parametrize("session_id", ["../../etc/x", "abc", str(uuid.uuid4()).upper(), str(uuid.uuid1())])
+def test_rejects_non_uuid4_ids(session_id):
+    assert not is_valid_session_id(session_id)
+    with pytest.raises(ValueError):
+        SessionManager(agent_factory=_UploadAgent).get_session(session_id)
+
+
+def test_upload_with_traversal_id_is_rejected(client, tmp_path):
+    response = client.post("/upload-pan", files={"file": ("pan.png", b"x")},
+                           headers={"X-Session-Id": "../../etc/x"})
+    assert response.status_code == 400
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_upload_stays_inside_upload_dir(client, tmp_path):
+    session_id = str(uuid.uuid4())
+    response = client.post("/upload-pan", files={"file": ("../../evil name.png", b"x")},
+                           data={"session_id": session_id})
+    assert response.status_code == 200
+    [written] = list(tmp_path.iterdir())
+    assert written.name == f"{session_id}_evil_name.png"
+
+
+def test_new_session_gets_server_issued_id(client):
+    response = client.post("/upload-pan", files={"file": ("pan.png", b"x")})
+    assert is_valid_session_id(response.json()["session_id"])
@@ -0,0 +1,89 @@
+import json
+
+import pytest
+
+import agents.sales_agent as sales_agent
+from agents.master_agent import MasterAgent
+from services.session_manager import SessionManager
+from services.state_store import FileStateStore, MemoryStateStore, SQLiteStateStore, StaleRevisionError
+
+
+@pytest.fixture(autouse=True)
+def no_rag(monkeypatch):
+    # snapshots never include the shared RAG index; don't build it
+    monkeypatch.setattr(sales_agent, "get_rag_service", lambda: None)
+
+
+def _agent_mid_conversation() -> MasterAgent:
+    agent = MasterAgent()
+    agent.state.update({"stage": "kyc", "customer_name": "Asha Rao", "loan_amount": 250000, "tenure": 3})
+    agent.user_profile = {"id": 7, "name": "Asha Rao"}
+    agent.sales.stage = "confirm"
+    agent.sales.context.update({"amount": 250000, "tenure": 3, "purpose": "education", "name": "Asha Rao"})
+    agent.verify.temp_data.update({"name": "Asha Rao", "pan_valid": True})
+    return agent
+
+
+def test_snapshot_round_trip_through_json():
+    agent = _agent_mid_conversation()
+    snap = json.loads(json.dumps(agent.snapshot()))
+    restored = MasterAgent.from_snapshot(snap)
+    assert restored.snapshot() == agent.snapshot()
+    assert restored.state["stage"] == "kyc"
+    assert restored.sales.context["purpose"] == "education"
+    assert restored.verify.temp_data["pan_valid"] is True
+
+
+def test_newer_snapshot_version_is_rejected():
+    snap = _agent_mid_conversation().snapshot()
+    snap["version"] += 1
+    with pytest.raises(ValueError):
+        MasterAgent.from_snapshot(snap)
+
+
+@pytest.fixture(params=["memory", "file", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemoryStateStore()
+    if request.param == "file":
+        return FileStateStore(tmp_path / "sessions")
+    return SQLiteStateStore(tmp_path / "sessions.db")
+
+
+def test_another_worker_resumes_the_conversation(store):
+    worker_a, worker_b = SessionManager(state_store=store), SessionManager(state_store=store)
+    session = worker_a.get_session()
+    session.agent = _agent_mid_conversation()
+    worker_a.touch(session)
+
+    resumed = worker_b.get_session(session.id)
+    assert resumed.revision == 1
+    assert resumed.agent.snapshot() == session.agent.snapshot()
+
+
+def test_concurrent_turns_conflict_instead_of_overwriting(store):
+    worker_a, worker_b = SessionManager(state_store=store), SessionManager(state_store=store)
+    session_a = worker_a.get_session()
+    worker_a.touch(session_a)
+    session_b = worker_b.get_session(session_a.id)
+
+    session_b.agent.state["loan_amount"] = 111
+    worker_b.touch(session_b)
+    session_a.agent.state["loan_amount"] = 222
+    with pytest.raises(StaleRevisionError):
+        worker_a.touch(session_a)
+
+    # A's copy was reloaded from the store: B's turn survived
+    assert session_a.revision == 2
+    assert session_a.agent.state["loan_amount"] == 111
+    assert store.load(session_a.id)["snapshot"]["state"]["loan_amount"] == 111
+
+
+def test_file_store_ids_do_not_collide(tmp_path):
+    store = FileStateStore(tmp_path)
+    store.save("a/b", {"n": 1})
+    store.save("a_b", {"n": 2})
+    assert store.load("a/b")["snapshot"] == {"n": 1}
+    assert store.load("a_b")["snapshot"] == {"n": 2}
+    with pytest.raises(ValueError):
+        store.save("", {"n": 3})
@@ -0,0 +1,66 @@
+import json
+import sqlite3
+
+import pytest
+
+from services.sqlite_store import _SCHEMA, SQLiteCustomerStore, SQLiteDatabase, migrate_from_json
+
+
+def _seed(tmp_path):
+    customers = tmp_path / "customers.json"
+    customers.write_text(json.dumps([
+        {"id": 1, "name": "Asha Rao", "email": "asha@example.com", "city": "Pune", "salary": 50000},
+        {"id": 2, "name": "Vikram Iyer", "email": "vikram@example.com", "city": "Chennai", "salary": 80000},
+    ]))
+    offers = tmp_path / "offers.json"
+    offers.write_text(json.dumps([{"id": 1, "loans": [{"id": "1_1", "name": "Home Loan"}]}]))
+    return customers, offers
+
+
+def _connect(path):
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+class _SlowWorker:
+    """Connection proxy: another worker runs `before_lock` just before this one's BEGIN IMMEDIATE."""
+
+    def __init__(self, conn, before_lock):
+        self.conn, self.before_lock = conn, before_lock
+
+    def execute(self, sql, *args):
+        if sql.startswith("BEGIN IMMEDIATE") and self.before_lock:
+            self.before_lock, run = None, self.before_lock
+            run()
+        return self.conn.execute(sql, *args)
+
+
+def test_migration_runs_once_when_workers_start_together(tmp_path):
+    customers, offers = _seed(tmp_path)
+    db = tmp_path / "crm.db"
+    first, second = _connect(db), _connect(db)
+
+    # `second` sees an empty meta, then `first` imports before `second` gets the write lock
+    migrate_from_json(_SlowWorker(second, lambda: migrate_from_json(first, customers, offers)), customers, offers)
+    migrate_from_json(second, customers, offers)
+
+    assert second.execute("SELECT COUNT(*) FROM customers").fetchone()[0] == 2
+    assert second.execute("SELECT COUNT(*) FROM offer_loans").fetchone()[0] == 1
+    assert not second.in_transaction
+
+
+def test_rolled_back_writes_stay_out_of_the_name_index(tmp_path):
+    customers, offers = _seed(tmp_path)
+    store = SQLiteCustomerStore(SQLiteDatabase(tmp_path / "crm.db", customers, offers))
+    store.search_name("asha")  # load the index
+
+    # row 1's rename is written, then row 2's email clash rolls the batch back
+    with pytest.raises(sqlite3.IntegrityError):
+        store.set_fields({1: {"name": "Zed Quinn"}, 2: {"email": "asha@example.com"}})
+    with pytest.raises(ValueError):
+        store.insert({"name": "Zed Quinn", "email": "asha@example.com"})
+
+    assert store.search_name("zed") == []
+    assert [c["id"] for c in store.search_name("asha")] == [1]
+    assert 1 in store._name_index._names and "zed quinn" not in store._name_index._names.values()
@@ -3,6 +3,25 @@
 export const API_BASE =
   import.meta.env.VITE_API_BASE_URL || "http://localhost:8000";
 
+/* -----------------------------
+   Chat session
+----------------------------- */
+// The backend keys each conversation by a session id it hands back on
+// the first reply; we echo it on every chat/upload request.
+const SESSION_KEY = "chatSessionId";
+
+function sessionHeaders() {
+  const id =
+    typeof window !== "undefined" ? sessionStorage.getItem(SESSION_KEY) : null;
+  return id ? { "X-Session-Id": id } : {};
+}
+
+function rememberSession(data) {
+  if (data && data.session_id && typeof window !== "undefined") {
+    sessionStorage.setItem(SESSION_KEY, data.session_id);
+  }
+}
+
 /* -----------------------------
    Chat
 ----------------------------- */
@@ -13,7 +32,7 @@ export async function sendMessage(message) {
 
   const res = await fetch(`${API_BASE}/chat`, {
     method: "POST",
-    headers: { "Content-Type": "application/json" },
+    headers: { "Content-Type": "application/json", ...sessionHeaders() },
     body: JSON.stringify({
       message,
       customer,
@@ -26,6 +45,7 @@ export async function sendMessage(message) {
     throw new Error(data.detail || "Failed to send message");
   }
 
+  rememberSession(data);
   return data;
 }
 
@@ -39,11 +59,13 @@ export async function uploadSalarySlip(file) {
 
   const res = await fetch(`${API_BASE}/upload-salary-slip`, {
     method: "POST",
+    headers: sessionHeaders(),
     body: formData,
   });
 
   const data = await res.json();
   if (!res.ok) throw new Error(data.detail || "Upload failed");
+  rememberSession(data);
   return data;
 }
 
@@ -53,11 +75,13 @@ export async function uploadPan(file) {
 
   const res = await fetch(`${API_BASE}/upload-pan`, {
     method: "POST",
+    headers: sessionHeaders(),
     body: formData,
   });
 
   const data = await res.json();
   if (!res.ok) throw new Error(data.detail || "Upload failed");
+  rememberSession(data);
   return data;
 }
 
@@ -67,11 +91,13 @@ export async function uploadAadhaar(file) {
 
   const res = await fetch(`${API_BASE}/upload-aadhaar`, {
     method: "POST",
+    headers: sessionHeaders(),
     body: formData,
   });
 
   const data = await res.json();
   if (!res.ok) throw new Error(data.detail || "Upload failed");
+  rememberSession(data);
   return data;
 }
 